@@ -0,0 +1,34 @@
+<?php
+
+use Illuminate\Database\Migrations\Migration;
+use Illuminate\Database\Schema\Blueprint;
+use Illuminate\Support\Facades\Schema;
+
+return new class extends Migration
+{
+    /**
+     * Run the migrations.
+     *
+     * Hash do conteúdo de cada linha importada, por tabela e chave natural,
+     * usado pelo modo delta do importador (dataImport) para enviar apenas
+     * as linhas novas ou alteradas.
+     */
+    public function up(): void
+    {
+        Schema::create('import_row_hashes', function (Blueprint $table) {
+            $table->string('table_name', 64);
+            $table->string('natural_key', 64);
+            $table->char('row_hash', 32);
+
+            $table->primary(['table_name', 'natural_key']);
+        });
+    }
+
+    /**
+     * Reverse the migrations.
+     */
+    public function down(): void
+    {
+        Schema::dropIfExists('import_row_hashes');
+    }
+};
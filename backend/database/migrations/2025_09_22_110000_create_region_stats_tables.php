@@ -0,0 +1,52 @@
+<?php
+
+use Illuminate\Database\Migrations\Migration;
+use Illuminate\Database\Schema\Blueprint;
+use Illuminate\Support\Facades\Schema;
+
+return new class extends Migration
+{
+    /**
+     * Run the migrations.
+     *
+     * region_stats guarda os agregados por cidade e por estado calculados pela
+     * etapa de materialização do importador (dataImport): uma linha por
+     * (escopo, região, métrica, dimensão), lida pela API com a chave primária.
+     * stats_dirty_regions registra as regiões alteradas por uma importação
+     * incremental (--delta) ainda não recalculadas.
+     */
+    public function up(): void
+    {
+        Schema::create('region_stats', function (Blueprint $table) {
+            // 'city' (region_id = cities.id) ou 'state' (region_id = states.codigo_uf)
+            $table->string('scope', 8);
+            $table->unsignedBigInteger('region_id');
+            // patients, patients_insured, patients_gender, patients_cid, doctors,
+            // doctors_specialty, hospitals, beds
+            $table->string('metric', 32);
+            // Valor da dimensão (gênero, id do CID, especialidade) ou '' para totais
+            $table->string('dimension', 191)->default('');
+            $table->unsignedBigInteger('value');
+            $table->timestamps();
+
+            $table->primary(['scope', 'region_id', 'metric', 'dimension']);
+        });
+
+        Schema::create('stats_dirty_regions', function (Blueprint $table) {
+            $table->string('table_name', 64);
+            // Valor da coluna city da linha alterada (para doctors, o código IBGE)
+            $table->string('region_value', 64);
+
+            $table->primary(['table_name', 'region_value']);
+        });
+    }
+
+    /**
+     * Reverse the migrations.
+     */
+    public function down(): void
+    {
+        Schema::dropIfExists('stats_dirty_regions');
+        Schema::dropIfExists('region_stats');
+    }
+};
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Atribuição de pacientes aos hospitais mais próximos (tabela patient_hospital)
+
+Pacientes e hospitais são localizados pelas coordenadas da cidade, então o
+resultado só depende do par (cidade, CID): os k hospitais mais próximos são
+calculados uma vez por par, em paralelo, e depois expandidos para os pacientes.
+
+Autor: Sistema de Importação
+Data: Setembro 2025
+"""
+
+import math
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = EARTH_RADIUS_KM * math.pi / 180
+
+# Abaixo deste número de hospitais a busca compara todos, sem usar as células
+BRUTE_FORCE_LIMIT = 256
+
+# Chave do par (cidade, CID) quando não há filtro por especialidade ou o paciente não tem CID
+NO_CID = 0
+
+
+def haversine_km(latitude, longitude, latitudes, longitudes):
+    """Distância em km de um ponto a um vetor de pontos (fórmula de haversine vetorizada)"""
+    lat1 = math.radians(latitude)
+    lat2 = np.radians(latitudes)
+    half_dlat = (lat2 - lat1) / 2
+    half_dlon = np.radians(longitudes - longitude) / 2
+    a = np.sin(half_dlat) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin(half_dlon) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+class HospitalGrid:
+    def __init__(self, positions, latitudes, longitudes, cell_degrees):
+        """
+        Índice espacial em grade: hospitais agrupados em células de cell_degrees graus
+
+        Args:
+            positions (ndarray): Posição de cada hospital nos vetores do trabalhador
+            latitudes (ndarray): Latitude de cada hospital
+            longitudes (ndarray): Longitude de cada hospital
+            cell_degrees (float): Lado da célula em graus
+        """
+        self.cell_degrees = cell_degrees
+        rows = np.floor(latitudes / cell_degrees).astype(np.int64)
+        cols = np.floor(longitudes / cell_degrees).astype(np.int64)
+        order = np.lexsort((cols, rows))
+
+        self.positions = positions[order]
+        self.latitudes = latitudes[order]
+        self.longitudes = longitudes[order]
+
+        # Cada célula aponta para uma fatia contínua dos vetores ordenados
+        keys, starts, counts = np.unique(
+            np.stack((rows[order], cols[order]), axis=1), axis=0, return_index=True, return_counts=True
+        )
+        self.cells = {
+            (row, col): (start, start + count)
+            for (row, col), start, count in zip(keys.tolist(), starts.tolist(), counts.tolist())
+        }
+
+    def __len__(self):
+        return len(self.positions)
+
+    def _candidates(self, latitude, longitude, radius_km):
+        """Índices dos hospitais nas células do retângulo que contém o círculo de radius_km"""
+        lat_radius = radius_km / KM_PER_DEGREE
+        cos_lat = math.cos(math.radians(min(89.9, abs(latitude) + lat_radius)))
+        lon_radius = min(180.0, lat_radius / max(cos_lat, 0.01))
+
+        row_range = range(
+            math.floor((latitude - lat_radius) / self.cell_degrees),
+            math.floor((latitude + lat_radius) / self.cell_degrees) + 1
+        )
+        col_range = range(
+            math.floor((longitude - lon_radius) / self.cell_degrees),
+            math.floor((longitude + lon_radius) / self.cell_degrees) + 1
+        )
+
+        if len(row_range) * len(col_range) > len(self.cells):
+            slices = [bounds for (row, col), bounds in self.cells.items() if row in row_range and col in col_range]
+        else:
+            slices = [self.cells[key] for key in ((row, col) for row in row_range for col in col_range)
+                      if key in self.cells]
+        if not slices:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate([np.arange(start, end) for start, end in slices])
+
+    def nearest(self, latitude, longitude, k):
+        """
+        Os k hospitais mais próximos do ponto
+
+        A busca amplia o raio até encontrar k candidatos e, se a k-ésima distância
+        passar do raio consultado, refaz a consulta com esse raio para garantir
+        que nenhum hospital mais próximo ficou fora das células.
+
+        Returns:
+            tuple: (posições dos hospitais, distâncias em km), do mais próximo ao mais distante
+        """
+        if len(self) <= max(k, BRUTE_FORCE_LIMIT):
+            candidates = np.arange(len(self))
+        else:
+            radius_km = self.cell_degrees * KM_PER_DEGREE
+            while True:
+                candidates = self._candidates(latitude, longitude, radius_km)
+                if len(candidates) >= k:
+                    distances = haversine_km(
+                        latitude, longitude, self.latitudes[candidates], self.longitudes[candidates]
+                    )
+                    kth_distance = np.partition(distances, k - 1)[k - 1]
+                    if kth_distance > radius_km:
+                        candidates = self._candidates(latitude, longitude, kth_distance)
+                    break
+                radius_km *= 2
+
+        distances = haversine_km(latitude, longitude, self.latitudes[candidates], self.longitudes[candidates])
+        if len(candidates) > k:
+            top = np.argpartition(distances, k - 1)[:k]
+        else:
+            top = np.arange(len(candidates))
+        top = top[np.argsort(distances[top], kind='stable')]
+        return self.positions[candidates[top]], distances[top]
+
+
+# Estado de cada processo trabalhador, definido por init_assignment_worker
+_worker_state = {}
+
+
+def init_assignment_worker(hospital_ids, latitudes, longitudes, hospital_cities, cid_hospitals, k, cell_degrees):
+    """
+    Inicializa o processo trabalhador com os hospitais e o filtro por CID
+
+    Args:
+        hospital_ids (ndarray): Id de cada hospital
+        latitudes (ndarray): Latitude da cidade de cada hospital
+        longitudes (ndarray): Longitude da cidade de cada hospital
+        hospital_cities (ndarray): Id da cidade de cada hospital
+        cid_hospitals (dict): id do CID -> posições dos hospitais com especialidade compatível
+        k (int): Hospitais por paciente
+        cell_degrees (float): Lado da célula da grade em graus
+    """
+    _worker_state.update({
+        'hospital_ids': hospital_ids,
+        'latitudes': latitudes,
+        'longitudes': longitudes,
+        'hospital_cities': hospital_cities,
+        'cid_hospitals': cid_hospitals,
+        'k': k,
+        'cell_degrees': cell_degrees,
+        'grids': {}
+    })
+
+
+def _grid_for(cid_id):
+    """Grade dos hospitais compatíveis com o CID (todos os hospitais para NO_CID ou CID sem compatíveis)"""
+    positions = _worker_state['cid_hospitals'].get(cid_id)
+    key = cid_id if positions is not None and len(positions) else NO_CID
+    grids = _worker_state['grids']
+    if key not in grids:
+        if key == NO_CID:
+            positions = np.arange(len(_worker_state['hospital_ids']))
+        grids[key] = HospitalGrid(
+            positions,
+            _worker_state['latitudes'][positions],
+            _worker_state['longitudes'][positions],
+            _worker_state['cell_degrees']
+        )
+    return grids[key], key != cid_id
+
+
+def compute_assignments(pairs):
+    """
+    Calcula os k hospitais mais próximos de cada par (cidade, CID)
+
+    Args:
+        pairs (list): Tuplas (id da cidade, latitude, longitude, id do CID ou NO_CID)
+
+    Returns:
+        tuple: (dict de colunas city, cid_id, hospital_id, distance_km, same_city,
+            número de pares sem hospital compatível que usaram todos os hospitais)
+    """
+    if not pairs:
+        return {}, 0
+
+    k = _worker_state['k']
+    hospital_ids = _worker_state['hospital_ids']
+    hospital_cities = _worker_state['hospital_cities']
+    cities, cids, positions, distances = [], [], [], []
+    fallbacks = 0
+
+    for city_id, latitude, longitude, cid_id in pairs:
+        grid, fallback = _grid_for(cid_id)
+        fallbacks += fallback
+        nearest, nearest_distances = grid.nearest(latitude, longitude, k)
+        cities.append(np.full(len(nearest), city_id, dtype=np.int64))
+        cids.append(np.full(len(nearest), cid_id, dtype=np.int64))
+        positions.append(nearest)
+        distances.append(nearest_distances)
+
+    cities = np.concatenate(cities)
+    positions = np.concatenate(positions)
+    return {
+        'city': cities,
+        'cid_id': np.concatenate(cids),
+        'hospital_id': hospital_ids[positions],
+        'distance_km': np.round(np.concatenate(distances), 2),
+        'same_city': hospital_cities[positions] == cities
+    }, fallbacks
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Gravação assíncrona: vários INSERT multi-linha em andamento ao mesmo tempo
+
+Com o banco em outro host, o tempo de cada lote é dominado pela ida e volta
+na rede. O AsyncBatchWriter mantém até N statements em andamento em um pool
+aiomysql de N conexões, em um laço asyncio próprio; as transformações dos
+import_* continuam as mesmas, só o gravador muda.
+
+Autor: Sistema de Importação
+Data: Setembro 2025
+"""
+
+import asyncio
+import logging
+import sys
+import threading
+import time
+
+import pymysql
+
+from batch_sizing import AdaptiveBatchSizer
+from connections import BULK_SESSION_SETTINGS
+
+
+def require_aiomysql():
+    """Importa o aiomysql, encerrando com erro se o pacote não estiver instalado"""
+    try:
+        import aiomysql
+    except ImportError:
+        logging.error("A gravação assíncrona (--async-batches) requer o pacote aiomysql: pip install -r requirements.txt")
+        sys.exit(1)
+    return aiomysql
+
+
+def _quantile(values, fraction):
+    """Quantil de uma lista já ordenada (0 se vazia)"""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+class AsyncBatchWriter:
+    # write() só retorna depois que os statements do lote foram confirmados, cada um na sua conexão
+    commits_on_write = True
+
+    def __init__(self, importer, spec, batch_size=None, in_flight=4):
+        """
+        Grava os INSERT multi-linha montados por importer.iter_value_statements com
+        até in_flight statements em andamento, cada um em uma conexão do pool
+
+        O laço asyncio roda em uma thread do gravador. write() monta os statements
+        na thread da etapa e aguarda uma vaga no semáforo antes de entregar cada um:
+        com in_flight statements em andamento, a leitura da origem espera. Cada
+        statement é confirmado na sua conexão (commit_every não se aplica), e
+        write() aguarda os statements do lote antes de retornar, então o
+        checkpoint e os hashes do delta gravados depois dele valem para linhas
+        já confirmadas. A concorrência vem dos statements de um mesmo lote.
+
+        Args:
+            importer (DatabaseImporter): Importador conectado (configurações, escape e métricas)
+            spec (TableSpec): Tabela de destino
+            batch_size (int): Linhas do primeiro statement (None = BATCH_SIZE)
+            in_flight (int): Statements em andamento ao mesmo tempo (e conexões do pool)
+        """
+        self.importer = importer
+        self.spec = spec
+        self.sizer = AdaptiveBatchSizer(batch_size)
+        self.in_flight_limit = max(1, in_flight)
+        self.count = 0
+        self.errors = []
+        self.latencies = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.busy_seconds = 0.0
+        self.started_at = None
+        self.closed = False
+        self.aiomysql = require_aiomysql()
+
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name=f"{spec.table}-async", daemon=True)
+        self.thread.start()
+        try:
+            self._call(self._open())
+        except BaseException:
+            self._stop_loop()
+            raise
+
+    def _call(self, coroutine):
+        """Executa a corrotina no laço do gravador e aguarda o resultado"""
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
+
+    def _stop_loop(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+    async def _open(self):
+        """Cria o semáforo e o pool, aplicando os ajustes de sessão em cada conexão"""
+        importer = self.importer
+        self.semaphore = asyncio.Semaphore(self.in_flight_limit)
+        self.tasks = set()
+        self.pool = await self.aiomysql.create_pool(
+            host=importer.host, port=importer.port, user=importer.user, password=importer.password,
+            db=importer.database, charset='utf8mb4', autocommit=False,
+            minsize=self.in_flight_limit, maxsize=self.in_flight_limit
+        )
+        if importer.bulk_session:
+            connections = [await self.pool.acquire() for _ in range(self.in_flight_limit)]
+            try:
+                for connection in connections:
+                    async with connection.cursor() as cursor:
+                        for statement in BULK_SESSION_SETTINGS:
+                            try:
+                                await cursor.execute(statement)
+                            except (pymysql.err.OperationalError, pymysql.err.InternalError) as e:
+                                logging.warning(f"Ajuste de sessão ignorado ({statement}): {e}")
+            finally:
+                for connection in connections:
+                    self.pool.release(connection)
+
+    async def _submit(self, statement, rows, limited_by_bytes):
+        """Aguarda uma vaga no semáforo e inicia o statement sem esperar a resposta"""
+        await self.semaphore.acquire()
+        task = self.loop.create_task(self._execute(statement, rows, limited_by_bytes))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def _execute(self, statement, rows, limited_by_bytes):
+        """Executa e confirma um statement em uma conexão do pool, liberando a vaga ao final"""
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        started_at = time.perf_counter()
+        try:
+            async with self.pool.acquire() as connection:
+                async with connection.cursor() as cursor:
+                    affected = await cursor.execute(statement)
+                await connection.commit()
+            seconds = time.perf_counter() - started_at
+            self.latencies.append(seconds)
+            self.busy_seconds += seconds
+            self.count += rows
+            self.importer.metrics.record_statement(self.spec.table, rows, affected, seconds)
+            self.sizer.record(rows, seconds, limited_by_bytes)
+        except Exception as e:
+            self.errors.append(e)
+        finally:
+            self.in_flight -= 1
+            self.semaphore.release()
+
+    async def _wait(self):
+        """Aguarda os statements em andamento"""
+        if self.tasks:
+            await asyncio.gather(*self.tasks)
+
+    async def _drain(self):
+        """Aguarda os statements em andamento e fecha o pool"""
+        await self._wait()
+        self.pool.close()
+        await self.pool.wait_closed()
+
+    def _check_errors(self):
+        """Repassa a primeira falha de um statement, com a exceção original como causa"""
+        if self.errors:
+            error = self.errors[0]
+            raise RuntimeError(f"Falha na gravação assíncrona de {self.spec.table}: {error!r}") from error
+
+    def write(self, rows):
+        """
+        Monta os statements das linhas e os entrega ao laço, aguardando vaga para
+        cada um; retorna quando todos estão confirmados
+        """
+        self._check_errors()
+        if self.started_at is None:
+            self.started_at = time.perf_counter()
+        for statement, count, limited_by_bytes in self.importer.iter_value_statements(self.spec, rows, self.sizer):
+            self._call(self._submit(statement, count, limited_by_bytes))
+            self._check_errors()
+        self._call(self._wait())
+        self._check_errors()
+
+    def close(self):
+        """Aguarda os statements em andamento, fecha o pool e registra o relatório"""
+        if self.closed:
+            return self.count
+        self.closed = True
+        try:
+            self._call(self._drain())
+        finally:
+            self._stop_loop()
+        self._check_errors()
+        self.log_report()
+        self.sizer.log_report(self.spec.table, self.importer.max_statement_bytes())
+        return self.count
+
+    def discard(self):
+        """Aguarda os statements já iniciados e fecha o pool sem gravar mais nada"""
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            self._call(self._drain())
+        finally:
+            self._stop_loop()
+
+    def log_report(self):
+        """Concorrência alcançada (média e máxima) e latência por statement"""
+        if not self.latencies:
+            return
+        elapsed = time.perf_counter() - self.started_at
+        latencies = sorted(self.latencies)
+        logging.info(
+            f"{self.spec.table} async: {len(latencies)} statements, {self.count} linhas em {elapsed:.1f}s "
+            f"({self.count / elapsed if elapsed else 0:.0f} linhas/s); concorrência média "
+            f"{self.busy_seconds / elapsed if elapsed else 0:.1f} de {self.in_flight_limit} "
+            f"(máxima {self.max_in_flight}); latência por statement p50 {_quantile(latencies, 0.5):.3f}s, "
+            f"p95 {_quantile(latencies, 0.95):.3f}s, máxima {latencies[-1]:.3f}s"
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+        return False
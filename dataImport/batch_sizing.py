@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Ajuste adaptativo do número de linhas por statement INSERT multi-linha
+Autor: Sistema de Importação
+Data: Setembro 2025
+"""
+
+import logging
+
+from config import BATCH_SIZE, MIN_BATCH_SIZE, MAX_BATCH_SIZE, BATCH_TARGET_SECONDS
+
+
+class AdaptiveBatchSizer:
+    def __init__(self, initial=None, minimum=MIN_BATCH_SIZE, maximum=MAX_BATCH_SIZE,
+                 target_seconds=BATCH_TARGET_SECONDS):
+        """
+        Escolhe quantas linhas enviar por statement a partir das medições anteriores
+
+        Subida de encosta: enquanto a vazão (linhas/s) não piora o tamanho continua
+        mudando na mesma direção; se piora, a direção se inverte. Statements mais
+        lentos que target_seconds reduzem o tamanho pela metade, independentemente
+        da vazão, para limitar o tempo de cada transação.
+
+        Args:
+            initial (int): Tamanho inicial (None = BATCH_SIZE)
+            minimum (int): Menor tamanho permitido
+            maximum (int): Maior tamanho permitido
+            target_seconds (float): Latência máxima desejada por statement
+        """
+        self.minimum = minimum
+        self.maximum = maximum
+        self.target_seconds = target_seconds
+        self.size = self._clamp(initial or BATCH_SIZE)
+        self.initial = self.size
+        self.growing = True
+        self.last_rate = None
+        self.statements = 0
+        self.rows = 0
+        self.seconds = 0.0
+        self.sizes = [self.size]
+
+    def _clamp(self, size):
+        return max(self.minimum, min(self.maximum, int(size)))
+
+    def record(self, rows, seconds, limited_by_bytes=False):
+        """
+        Registra um statement executado e ajusta o tamanho do próximo
+
+        Args:
+            rows (int): Linhas enviadas no statement
+            seconds (float): Tempo de execução
+            limited_by_bytes (bool): Se o statement foi cortado pelo limite de bytes
+                (nesse caso o tamanho não cresce, pois o limite continuaria valendo)
+        """
+        self.statements += 1
+        self.rows += rows
+        self.seconds += seconds
+        rate = rows / seconds if seconds > 0 else None
+
+        if seconds > self.target_seconds:
+            new_size = self.size // 2
+            self.growing = False
+        elif rate is None or limited_by_bytes or rows < self.size:
+            # Statement parcial (fim dos dados ou limite de bytes): medição não comparável
+            return
+        else:
+            if self.last_rate is not None and rate < self.last_rate:
+                self.growing = not self.growing
+            new_size = self.size * 3 // 2 if self.growing else self.size * 2 // 3
+        self.last_rate = rate
+
+        new_size = self._clamp(new_size)
+        if new_size != self.size:
+            logging.debug(f"Tamanho de lote {self.size} -> {new_size} ({rate or 0:.0f} linhas/s em {seconds:.2f}s)")
+            self.size = new_size
+            self.sizes.append(new_size)
+
+    def log_report(self, table, max_bytes):
+        """Registra os tamanhos de lote escolhidos para a tabela"""
+        if not self.statements:
+            return
+        rate = self.rows / self.seconds if self.seconds else 0
+        logging.info(
+            f"{table}: {self.statements} statements, {self.rows} linhas, tamanho de lote {self.initial} -> "
+            f"{self.size} (mín {min(self.sizes)}, máx {max(self.sizes)}), {rate:.0f} linhas/s, "
+            f"limite de {max_bytes / (1024 * 1024):.1f} MB por statement"
+        )
@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark ponta a ponta do importador
+
+Executa as etapas do main.py (uma por vez) e o CidSpecialtyPopulator sobre um
+diretório gerado por benchmark_data.py e registra, por etapa, o tempo, as
+linhas/s, o pico de memória (RSS) e as idas ao banco medidas pelos contadores
+de SHOW GLOBAL STATUS. O resultado é gravado em JSON e pode ser comparado com
+o JSON de uma execução anterior.
+
+Uso:
+    python benchmark_data.py --scale 10k --output-dir bench_10k
+    python benchmark.py --data-dir bench_10k --output atual.json --baseline anterior.json [opções do main.py]
+
+O banco usado deve ser descartável: as tabelas são gravadas como em uma
+importação normal.
+
+Autor: Sistema de Importação
+Data: Setembro 2025
+"""
+
+import argparse
+import json
+import logging
+import os
+import resource
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+
+import pymysql
+
+from config import DB_HOST, DB_PORT, DB_USER, DB_PASSWORD, DB_NAME
+from benchmark_data import MANIFEST_FILE
+from connections import ConnectionPool
+from lookups import LookupCache
+from metrics import ImportMetrics, current_rss
+from main import DatabaseImporter, parse_args, source_files, importer_settings_from_args, register_stages
+from populate_cid_specialty import CidSpecialtyPopulator
+from scheduler import StageScheduler
+
+# Contadores de SHOW GLOBAL STATUS registrados por etapa
+STATUS_COUNTERS = ('Questions', 'Com_select', 'Com_insert', 'Com_update', 'Com_delete', 'Com_commit',
+                   'Bytes_received', 'Bytes_sent')
+
+# Intervalo de amostragem do RSS, em segundos
+RSS_SAMPLE_INTERVAL = 0.05
+
+
+def max_rss(who):
+    """Pico de RSS em bytes informado por getrusage (KB no Linux, bytes no macOS)"""
+    value = resource.getrusage(who).ru_maxrss
+    return value if sys.platform == 'darwin' else value * 1024
+
+
+class PeakRssSampler:
+    def __init__(self, interval=RSS_SAMPLE_INTERVAL):
+        """
+        Amostra o RSS em uma thread enquanto a etapa roda
+
+        O ru_maxrss do processo só cresce, então depois da primeira etapa pesada ele
+        não mostra o pico das seguintes; a amostragem mede o pico de cada etapa.
+        """
+        self.interval = interval
+        self.peak = 0
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def _sample(self):
+        while not self.stopped.wait(self.interval):
+            self.peak = max(self.peak, current_rss() or 0)
+
+    def __enter__(self):
+        self.peak = current_rss() or 0
+        self.thread = threading.Thread(target=self._sample, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stopped.set()
+        self.thread.join()
+        self.peak = max(self.peak, current_rss() or 0)
+
+
+class StatusCounters:
+    def __init__(self, settings):
+        """
+        Lê os contadores globais do servidor por uma conexão própria
+
+        Os contadores são globais: o banco deve estar dedicado ao benchmark para que
+        as diferenças correspondam às idas ao banco da etapa. As consultas de leitura
+        dos próprios contadores são descontadas.
+        """
+        self.connection = None
+        try:
+            self.connection = pymysql.connect(
+                host=settings['host'], port=settings['port'], user=settings['user'],
+                password=settings['password'], database=settings['database'], charset='utf8mb4'
+            )
+        except Exception as e:
+            logging.warning(f"Contadores do servidor indisponíveis: {e}")
+
+    def read(self):
+        """Valores atuais dos contadores (vazio se não for possível lê-los)"""
+        if self.connection is None:
+            return {}
+        try:
+            with self.connection.cursor() as cursor:
+                names = ', '.join(f"'{name}'" for name in STATUS_COUNTERS)
+                cursor.execute(f"SHOW GLOBAL STATUS WHERE Variable_name IN ({names})")
+                return {name: int(value) for name, value in cursor.fetchall()}
+        except Exception as e:
+            logging.warning(f"Erro ao ler contadores do servidor: {e}")
+            return {}
+
+    def delta(self, before, after):
+        """Diferença entre duas leituras, sem a consulta de leitura do próprio contador"""
+        delta = {name: after[name] - before[name] for name in after if name in before}
+        if 'Questions' in delta:
+            delta['Questions'] -= 1
+        return delta
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+
+
+class StageProbe:
+    def __init__(self, counters):
+        """Envolve as etapas do agendador para medir cada uma"""
+        self.counters = counters
+        self.results = {}
+
+    def wrap(self, name, run):
+        """Retorna run medido, gravando o resultado em self.results[name]"""
+        def measured(importer):
+            before = self.counters.read()
+            started_at = time.perf_counter()
+            with PeakRssSampler() as sampler:
+                result = run(importer)
+            seconds = time.perf_counter() - started_at
+            rows = result if isinstance(result, int) and not isinstance(result, bool) else None
+            self.results[name] = {
+                'seconds': seconds,
+                'rows': rows,
+                'rows_per_second': rows / seconds if rows is not None and seconds else None,
+                'peak_rss_mb': sampler.peak / (1024 * 1024),
+                'db': self.counters.delta(before, self.counters.read())
+            }
+            return result
+        return measured
+
+
+def run_cid_specialty(settings, data_dir):
+    """
+    Executa o CidSpecialtyPopulator, que lê o CSV de relacionamentos do diretório atual
+
+    Returns:
+        int: Linhas do CSV de relacionamentos
+    """
+    csv_path = os.path.join(data_dir, 'relacionamento_hospitais_especialidades_cid.csv')
+    populator = CidSpecialtyPopulator(
+        host=settings['host'], port=settings['port'], user=settings['user'],
+        password=settings['password'], database=settings['database']
+    )
+    previous_dir = os.getcwd()
+    os.chdir(data_dir)
+    try:
+        if not populator.run():
+            raise RuntimeError("Falha ao popular cid_specialty")
+    finally:
+        os.chdir(previous_dir)
+    with open(csv_path, encoding='utf-8') as csv_file:
+        return sum(1 for _ in csv_file) - 1
+
+
+def git_commit():
+    """Commit atual do repositório (None fora de um repositório git)"""
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmark(data_dir, args, settings):
+    """
+    Executa todas as etapas sobre os arquivos de data_dir
+
+    Args:
+        data_dir (str): Diretório gerado por benchmark_data.py
+        args (Namespace): Opções do main.py
+        settings (dict): Parâmetros do DatabaseImporter
+
+    Returns:
+        dict: Resultados por etapa e total
+    """
+    counters = StatusCounters(settings)
+    probe = StageProbe(counters)
+
+    # Uma etapa por vez, para que tempo, memória e contadores de cada uma não se misturem
+    pool = ConnectionPool(DatabaseImporter(**settings).open_connection, 1)
+    lookups = LookupCache()
+    metrics = ImportMetrics(args.metrics_file, args.metrics_prometheus)
+    scheduler = StageScheduler(
+        lambda: DatabaseImporter(**settings, pool=pool, lookups=lookups), max_parallel=1, metrics=metrics
+    )
+    register_stages(scheduler, source_files(data_dir), args)
+    scheduler.add(
+        'cid_especialidade', lambda importer: run_cid_specialty(settings, data_dir),
+        depends_on=('cid10', 'especialidades')
+    )
+    for stage in scheduler.stages.values():
+        stage.run = probe.wrap(stage.name, stage.run)
+
+    before = counters.read()
+    started_at = time.perf_counter()
+    try:
+        scheduler.run()
+    finally:
+        pool.close()
+        metrics.close()
+    seconds = time.perf_counter() - started_at
+
+    # Divisão do tempo de cada etapa em leitura, transformação, mapeamentos e banco
+    for name, result in probe.results.items():
+        if name in metrics.stages:
+            result['metrics'] = metrics.stages[name].snapshot()
+    total_db = counters.delta(before, counters.read())
+    counters.close()
+
+    return {
+        'stages': probe.results,
+        'total': {
+            'seconds': seconds,
+            'peak_rss_mb': max_rss(resource.RUSAGE_SELF) / (1024 * 1024),
+            'children_peak_rss_mb': max_rss(resource.RUSAGE_CHILDREN) / (1024 * 1024),
+            'db': total_db
+        }
+    }
+
+
+def _change(current, baseline):
+    """Variação percentual formatada (vazio se não houver base)"""
+    if current is None or not baseline:
+        return ''
+    return f"{(current - baseline) / baseline * 100:+.1f}%"
+
+
+def print_report(results, baseline=None):
+    """Tabela por etapa, com a variação em relação à execução de base"""
+    baseline_stages = (baseline or {}).get('stages', {})
+    print(f"{'etapa':<18} {'segundos':>9} {'Δ':>8} {'linhas/s':>11} {'Δ':>8} {'RSS MB':>8} {'Δ':>8} "
+          f"{'consultas':>10} {'Δ':>8}")
+    rows = list(results['stages'].items()) + [('total', results['total'])]
+    for name, stage in rows:
+        base = baseline['total'] if name == 'total' and baseline else baseline_stages.get(name, {})
+        rate = stage.get('rows_per_second')
+        queries = stage['db'].get('Questions')
+        print(
+            f"{name:<18} {stage['seconds']:>9.2f} {_change(stage['seconds'], base.get('seconds')):>8} "
+            f"{rate or 0:>11.0f} {_change(rate, base.get('rows_per_second')):>8} "
+            f"{stage['peak_rss_mb']:>8.1f} {_change(stage['peak_rss_mb'], base.get('peak_rss_mb')):>8} "
+            f"{queries if queries is not None else '-':>10} "
+            f"{_change(queries, base.get('db', {}).get('Questions')):>8}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Benchmark do importador sobre arquivos gerados por benchmark_data.py '
+                    '(as demais opções são repassadas ao main.py)'
+    )
+    parser.add_argument('--data-dir', required=True, help='Diretório com os arquivos de entrada')
+    parser.add_argument('--output', help='Arquivo JSON com os resultados (padrão: benchmark_<data>.json)')
+    parser.add_argument('--baseline', help='JSON de uma execução anterior para comparação')
+    parser.add_argument('--host', default=DB_HOST)
+    parser.add_argument('--port', type=int, default=DB_PORT)
+    parser.add_argument('--user', default=DB_USER)
+    parser.add_argument('--password', default=DB_PASSWORD)
+    parser.add_argument('--database', default=DB_NAME)
+    options, importer_argv = parser.parse_known_args()
+
+    data_dir = os.path.abspath(options.data_dir)
+    if not os.path.isdir(data_dir):
+        logging.error(f"Diretório não encontrado: {data_dir}")
+        sys.exit(1)
+
+    args = parse_args(importer_argv)
+    args.stage_workers = 1
+    settings = importer_settings_from_args(args, data_dir)
+    settings.update(
+        host=options.host, port=options.port, user=options.user,
+        password=options.password, database=options.database
+    )
+
+    manifest_path = os.path.join(data_dir, MANIFEST_FILE)
+    manifest = None
+    if os.path.exists(manifest_path):
+        with open(manifest_path, encoding='utf-8') as manifest_file:
+            manifest = json.load(manifest_file)
+
+    baseline = None
+    if options.baseline:
+        if not os.path.exists(options.baseline):
+            logging.error(f"Arquivo de base não encontrado: {options.baseline}")
+            sys.exit(1)
+        with open(options.baseline, encoding='utf-8') as baseline_file:
+            baseline = json.load(baseline_file)
+
+    try:
+        results = run_benchmark(data_dir, args, settings)
+    except Exception as e:
+        logging.error(f"Erro durante o benchmark: {e}")
+        sys.exit(1)
+
+    report = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'data': manifest,
+        'options': {name: value for name, value in vars(args).items()},
+        **results
+    }
+    output = options.output or f"benchmark_{datetime.now():%Y%m%d_%H%M%S}.json"
+    with open(output, 'w', encoding='utf-8') as output_file:
+        json.dump(report, output_file, indent=2, ensure_ascii=False)
+
+    print_report(report, baseline)
+    logging.info(f"Resultados gravados em {output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Gerador determinístico dos arquivos de entrada do importador para benchmarks
+
+Gera estados.csv, municipios.csv, hospitais.csv, medicos.csv, pacientes.xml,
+tabela CID-10.xlsx e relacionamento_hospitais_especialidades_cid.csv em escala
+configurável, sem depender de dados de produção. A mesma escala e a mesma
+semente produzem sempre os mesmos arquivos.
+
+Uso:
+    python benchmark_data.py --scale 10k --output-dir bench_10k
+
+Autor: Sistema de Importação
+Data: Setembro 2025
+"""
+
+import argparse
+import json
+import logging
+import os
+import time
+
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+
+# Número de registros de cada arquivo por escala
+SCALES = {
+    '10k': {'patients': 10_000, 'cities': 500, 'hospitals': 200, 'doctors': 2_000, 'cids': 2_000},
+    '1m': {'patients': 1_000_000, 'cities': 5_570, 'hospitals': 3_000, 'doctors': 100_000, 'cids': 12_000},
+    '20m': {'patients': 20_000_000, 'cities': 5_570, 'hospitals': 7_000, 'doctors': 500_000, 'cids': 12_000},
+}
+
+# (codigo_uf, uf, nome, latitude, longitude, região) das 27 unidades da federação
+STATES = (
+    (11, 'RO', 'Rondônia', -10.83, -63.34, 'Norte'),
+    (12, 'AC', 'Acre', -8.77, -70.55, 'Norte'),
+    (13, 'AM', 'Amazonas', -3.47, -65.10, 'Norte'),
+    (14, 'RR', 'Roraima', 1.99, -61.33, 'Norte'),
+    (15, 'PA', 'Pará', -3.79, -52.48, 'Norte'),
+    (16, 'AP', 'Amapá', 1.41, -51.77, 'Norte'),
+    (17, 'TO', 'Tocantins', -9.46, -48.26, 'Norte'),
+    (21, 'MA', 'Maranhão', -5.42, -45.44, 'Nordeste'),
+    (22, 'PI', 'Piauí', -6.60, -42.28, 'Nordeste'),
+    (23, 'CE', 'Ceará', -5.20, -39.53, 'Nordeste'),
+    (24, 'RN', 'Rio Grande do Norte', -5.81, -36.59, 'Nordeste'),
+    (25, 'PB', 'Paraíba', -7.28, -36.72, 'Nordeste'),
+    (26, 'PE', 'Pernambuco', -8.38, -37.86, 'Nordeste'),
+    (27, 'AL', 'Alagoas', -9.62, -36.82, 'Nordeste'),
+    (28, 'SE', 'Sergipe', -10.57, -37.45, 'Nordeste'),
+    (29, 'BA', 'Bahia', -13.29, -41.71, 'Nordeste'),
+    (31, 'MG', 'Minas Gerais', -18.10, -44.38, 'Sudeste'),
+    (32, 'ES', 'Espírito Santo', -19.19, -40.34, 'Sudeste'),
+    (33, 'RJ', 'Rio de Janeiro', -22.25, -42.66, 'Sudeste'),
+    (35, 'SP', 'São Paulo', -22.19, -48.79, 'Sudeste'),
+    (41, 'PR', 'Paraná', -24.89, -51.55, 'Sul'),
+    (42, 'SC', 'Santa Catarina', -27.45, -50.95, 'Sul'),
+    (43, 'RS', 'Rio Grande do Sul', -30.17, -53.50, 'Sul'),
+    (50, 'MS', 'Mato Grosso do Sul', -20.51, -54.54, 'Centro-Oeste'),
+    (51, 'MT', 'Mato Grosso', -12.64, -55.42, 'Centro-Oeste'),
+    (52, 'GO', 'Goiás', -15.98, -49.86, 'Centro-Oeste'),
+    (53, 'DF', 'Distrito Federal', -15.83, -47.86, 'Centro-Oeste'),
+)
+
+SPECIALTIES = (
+    'Cardiologia', 'Pediatria', 'Ortopedia', 'Neurologia', 'Oncologia', 'Dermatologia', 'Ginecologia',
+    'Obstetrícia', 'Psiquiatria', 'Urologia', 'Oftalmologia', 'Otorrinolaringologia', 'Endocrinologia',
+    'Gastroenterologia', 'Pneumologia', 'Nefrologia', 'Reumatologia', 'Infectologia', 'Hematologia',
+    'Geriatria', 'Clínica Médica', 'Cirurgia Geral', 'Anestesiologia', 'Medicina Intensiva'
+)
+
+FIRST_NAMES = (
+    'Ana', 'Maria', 'João', 'José', 'Pedro', 'Paulo', 'Lucas', 'Mariana', 'Juliana', 'Carlos', 'Fernanda',
+    'Gabriel', 'Beatriz', 'Rafael', 'Camila', 'Bruno', 'Larissa', 'Felipe', 'Patrícia', 'Rodrigo'
+)
+
+SURNAMES = (
+    'Silva', 'Santos', 'Oliveira', 'Souza', 'Rodrigues', 'Ferreira', 'Alves', 'Pereira', 'Lima', 'Gomes',
+    'Costa', 'Ribeiro', 'Martins', 'Carvalho', 'Almeida', 'Lopes', 'Soares', 'Fernandes', 'Vieira', 'Barbosa'
+)
+
+# Multiplicador primo com 10^9 que espalha os CPFs sem repetição
+CPF_MULTIPLIER = 7_919_333
+
+PATIENT_TEMPLATE = (
+    "  <Paciente>\n    <Codigo>%s</Codigo>\n    <CPF>%s</CPF>\n    <Genero>%s</Genero>\n"
+    "    <Cod_municipio>%d</Cod_municipio>\n    <Bairro>%s</Bairro>\n    <Convenio>%s</Convenio>\n"
+    "    <CID-10>%s</CID-10>\n    <Nome_Completo>%s</Nome_Completo>\n  </Paciente>\n"
+)
+
+MANIFEST_FILE = 'benchmark_manifest.json'
+
+
+def cpf_numbers(indexes, seed):
+    """
+    CPFs válidos e distintos para os índices informados
+
+    Os 9 primeiros dígitos são uma permutação de 0..10^9-1 e os dígitos
+    verificadores são calculados de forma vetorizada.
+
+    Returns:
+        ndarray: CPFs como inteiros de 11 dígitos
+    """
+    base = (indexes.astype(np.int64) * CPF_MULTIPLIER + seed * 1_000_003 + 100_000_000) % 1_000_000_000
+    digits = np.stack([base // 10 ** (8 - position) % 10 for position in range(9)], axis=1)
+    first = (digits @ np.arange(10, 1, -1)) * 10 % 11 % 10
+    second = (digits @ np.arange(11, 2, -1) + first * 2) * 10 % 11 % 10
+    return base * 100 + first * 10 + second
+
+
+def cid_codes(count):
+    """Códigos CID-10 (categorias A00..Z99 e depois subcategorias A00.0..), sempre incluindo R69"""
+    categories = [f"{letter}{number:02d}" for letter in 'ABCDEFGHIJKLMNOPQRSTUVWXYZ' for number in range(100)]
+    codes = categories[:count]
+    codes += [f"{code}.{sub}" for sub in range(10) for code in categories][:max(0, count - len(codes))]
+    if 'R69' not in codes:
+        codes[-1] = 'R69'
+    return codes
+
+
+class BenchmarkDataGenerator:
+    def __init__(self, output_dir, scale='10k', seed=42, invalid_fraction=0.0, chunk_size=100_000):
+        """
+        Gera os arquivos de entrada em output_dir
+
+        Args:
+            output_dir (str): Diretório de saída (criado se não existir)
+            scale (str): Chave de SCALES
+            seed (int): Semente do gerador aleatório
+            invalid_fraction (float): Fração dos pacientes com CPF inválido, CPF repetido
+                ou cidade desconhecida (exercita a validação)
+            chunk_size (int): Pacientes gerados e gravados por bloco
+        """
+        self.output_dir = output_dir
+        self.scale = scale
+        self.sizes = SCALES[scale]
+        self.seed = seed
+        self.invalid_fraction = invalid_fraction
+        self.chunk_size = chunk_size
+        self.rng = np.random.default_rng(seed)
+        self.cities = None
+        self.cids = None
+
+    def path(self, name):
+        return os.path.join(self.output_dir, name)
+
+    def write_states(self):
+        df = pd.DataFrame(STATES, columns=['codigo_uf', 'uf', 'nome', 'latitude', 'longitude', 'regiao'])
+        df.to_csv(self.path('estados.csv'), index=False)
+        return len(df)
+
+    def write_cities(self):
+        count = self.sizes['cities']
+        states = np.array([state[0] for state in STATES])
+        centers = np.array([(state[3], state[4]) for state in STATES])
+        state_index = np.arange(count) % len(STATES)
+        sequence = np.arange(count) // len(STATES)
+
+        # A primeira cidade de cada estado é a capital; população com cauda longa
+        population = np.round(self.rng.lognormal(9.5, 1.3, count)).astype(np.int64) + 800
+        population[sequence == 0] *= 50
+        self.cities = pd.DataFrame({
+            'codigo_ibge': states[state_index] * 100000 + sequence * 10 + 1,
+            'nome': [f"Cidade {index}" for index in range(count)],
+            'latitude': np.round(centers[state_index, 0] + self.rng.normal(0, 1.5, count), 6),
+            'longitude': np.round(centers[state_index, 1] + self.rng.normal(0, 1.5, count), 6),
+            'capital': (sequence == 0).astype(int),
+            'codigo_uf': states[state_index],
+            'siafi_id': 1000 + np.arange(count),
+            'ddd': self.rng.integers(11, 100, count),
+            'fuso_horario': 'America/Sao_Paulo',
+            'populacao': population
+        })
+        self.cities.to_csv(self.path('municipios.csv'), index=False)
+        return count
+
+    def pick_cities(self, count):
+        """Códigos IBGE sorteados com peso pela população"""
+        weights = self.cities['populacao'].to_numpy(dtype=np.float64)
+        return self.rng.choice(self.cities['codigo_ibge'].to_numpy(), size=count, p=weights / weights.sum())
+
+    def pick_names(self, count):
+        first = self.rng.choice(FIRST_NAMES, count)
+        middle = self.rng.choice(SURNAMES, count)
+        last = self.rng.choice(SURNAMES, count)
+        return [f"{a} {b} {c}" for a, b, c in zip(first.tolist(), middle.tolist(), last.tolist())]
+
+    def write_hospitals(self):
+        count = self.sizes['hospitals']
+        specialties_count = self.rng.integers(1, 6, count)
+        specialties = [
+            ';'.join(self.rng.choice(SPECIALTIES, size, replace=False).tolist()) for size in specialties_count.tolist()
+        ]
+        pd.DataFrame({
+            'codigo': [f"H{index:06d}" for index in range(count)],
+            'nome': [f"Hospital {index}" for index in range(count)],
+            'cidade': self.pick_cities(count),
+            'bairro': [f"Bairro {number}" for number in self.rng.integers(1, 200, count).tolist()],
+            'especialidades': specialties,
+            'leitos_totais': self.rng.integers(10, 800, count)
+        }).to_csv(self.path('hospitais.csv'), index=False)
+        return count
+
+    def write_doctors(self):
+        count = self.sizes['doctors']
+        pd.DataFrame({
+            'codigo': [f"M{index:07d}" for index in range(count)],
+            'nome_completo': self.pick_names(count),
+            'especialidade': self.rng.choice(SPECIALTIES, count),
+            'cidade': self.pick_cities(count)
+        }).to_csv(self.path('medicos.csv'), index=False)
+        return count
+
+    def write_cids(self):
+        self.cids = cid_codes(self.sizes['cids'])
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet('CID-10')
+        sheet.append(['Descrição'])
+        chapter = None
+        for code in self.cids:
+            if code[0] != chapter:
+                chapter = code[0]
+                sheet.append([f"Capítulo {chapter}"])
+            sheet.append([f"{code} - Doença {code}"])
+        sheet.append(['Total'])
+        workbook.save(self.path('tabela CID-10.xlsx'))
+        return len(self.cids)
+
+    def write_relationships(self):
+        """Cada especialidade ligada a um conjunto fixo de CIDs, em uma linha por hospital e especialidade"""
+        cids = np.array(self.cids)
+        linked = {
+            specialty: ';'.join(self.rng.choice(cids, min(len(cids), 20), replace=False).tolist())
+            for specialty in SPECIALTIES
+        }
+        hospitals = pd.read_csv(self.path('hospitais.csv'), usecols=['codigo', 'especialidades'], dtype=str)
+        rows = [
+            (hospital, specialty, linked[specialty])
+            for hospital, specialties in zip(hospitals['codigo'], hospitals['especialidades'])
+            for specialty in specialties.split(';')
+        ]
+        pd.DataFrame(rows, columns=['hospital', 'especialidade', 'cid_codigo']).to_csv(
+            self.path('relacionamento_hospitais_especialidades_cid.csv'), index=False
+        )
+        return len(rows)
+
+    def write_patients(self):
+        """Grava o pacientes.xml em blocos, sem manter os registros em memória"""
+        count = self.sizes['patients']
+        cids = np.array(self.cids)
+        with open(self.path('pacientes.xml'), 'w', encoding='utf-8') as file:
+            file.write('<?xml version="1.0" encoding="UTF-8"?>\n<Pacientes>\n')
+            for start in range(0, count, self.chunk_size):
+                indexes = np.arange(start, min(count, start + self.chunk_size))
+                size = len(indexes)
+                cpfs = cpf_numbers(indexes, self.seed)
+                cities = self.pick_cities(size)
+
+                if self.invalid_fraction:
+                    kind = np.where(self.rng.random(size) < self.invalid_fraction, self.rng.integers(1, 4, size), 0)
+                    cpfs = np.where(kind == 1, cpfs + 1 - (cpfs % 10 == 9) * 10, cpfs)
+                    previous = cpf_numbers(np.maximum(indexes - 1, 0), self.seed)
+                    cpfs = np.where((kind == 2) & (indexes > 0), previous, cpfs)
+                    cities = np.where(kind == 3, 9_999_999, cities)
+
+                records = zip(
+                    [f"P{index:09d}" for index in indexes.tolist()],
+                    [f"{cpf:011d}" for cpf in cpfs.tolist()],
+                    self.rng.choice(('M', 'F'), size).tolist(),
+                    cities.tolist(),
+                    [f"Bairro {number}" for number in self.rng.integers(1, 200, size).tolist()],
+                    self.rng.choice(('SIM', 'NAO'), size, p=(0.3, 0.7)).tolist(),
+                    self.rng.choice(cids, size).tolist(),
+                    self.pick_names(size)
+                )
+                file.write(''.join(PATIENT_TEMPLATE % record for record in records))
+            file.write('</Pacientes>\n')
+        return count
+
+    def run(self):
+        """
+        Gera todos os arquivos e o manifesto com a escala, a semente e as contagens
+
+        Returns:
+            dict: Manifesto gravado em MANIFEST_FILE
+        """
+        os.makedirs(self.output_dir, exist_ok=True)
+        started_at = time.perf_counter()
+        counts = {}
+        for name, write in (
+            ('estados', self.write_states),
+            ('municipios', self.write_cities),
+            ('hospitais', self.write_hospitals),
+            ('medicos', self.write_doctors),
+            ('cid10', self.write_cids),
+            ('relacionamentos', self.write_relationships),
+            ('pacientes', self.write_patients),
+        ):
+            step_started_at = time.perf_counter()
+            counts[name] = write()
+            logging.info(f"{name}: {counts[name]} registros em {time.perf_counter() - step_started_at:.1f}s")
+
+        manifest = {
+            'scale': self.scale,
+            'seed': self.seed,
+            'invalid_fraction': self.invalid_fraction,
+            'counts': counts,
+            'seconds': round(time.perf_counter() - started_at, 2)
+        }
+        with open(self.path(MANIFEST_FILE), 'w', encoding='utf-8') as file:
+            json.dump(manifest, file, indent=2)
+        return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Gera arquivos de entrada sintéticos para benchmarks do importador')
+    parser.add_argument('--scale', choices=tuple(SCALES), default='10k', help='Número de pacientes e demais registros')
+    parser.add_argument('--output-dir', required=True, help='Diretório onde os arquivos são gravados')
+    parser.add_argument('--seed', type=int, default=42, help='Semente do gerador (mesma semente, mesmos arquivos)')
+    parser.add_argument(
+        '--invalid-fraction', type=float, default=0.0,
+        help='Fração dos pacientes com CPF inválido, CPF repetido ou cidade desconhecida'
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    manifest = BenchmarkDataGenerator(args.output_dir, args.scale, args.seed, args.invalid_fraction).run()
+    logging.info(f"Arquivos gerados em {args.output_dir} em {manifest['seconds']:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
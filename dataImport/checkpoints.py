@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Checkpoints de importação para retomar após falha ou interrupção
+Autor: Sistema de Importação
+Data: Setembro 2025
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+
+SAMPLE_SIZE = 1 << 20
+
+
+def file_fingerprint(file_path):
+    """
+    Identifica a versão de um arquivo de origem: tamanho, mtime e sha256 do
+    primeiro e do último MB (ler o arquivo inteiro custaria tanto quanto importá-lo)
+
+    Returns:
+        dict: Impressão digital do arquivo
+    """
+    stat = os.stat(file_path)
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as handle:
+        digest.update(handle.read(SAMPLE_SIZE))
+        if stat.st_size > SAMPLE_SIZE:
+            handle.seek(max(SAMPLE_SIZE, stat.st_size - SAMPLE_SIZE))
+            digest.update(handle.read(SAMPLE_SIZE))
+
+    return {
+        'size': stat.st_size,
+        'mtime': int(stat.st_mtime),
+        'sha256': digest.hexdigest()
+    }
+
+
+class CheckpointStore:
+    def __init__(self, directory):
+        """
+        Guarda um arquivo JSON por fonte (ou faixa de fonte) importada
+
+        Cada checkpoint registra a impressão digital do arquivo de origem, quantos
+        registros já foram confirmados no banco e a chave do último registro.
+        Um arquivo por chave permite que processos paralelos gravem sem conflito.
+
+        Args:
+            directory (str): Diretório dos checkpoints
+        """
+        self.directory = directory
+        self._fingerprints = {}
+
+    def _path(self, key):
+        safe_key = re.sub(r'[^A-Za-z0-9_.-]+', '_', key)
+        return os.path.join(self.directory, f"{safe_key}.json")
+
+    def _fingerprint(self, source_path):
+        if source_path not in self._fingerprints:
+            self._fingerprints[source_path] = file_fingerprint(source_path)
+        return self._fingerprints[source_path]
+
+    def load(self, key, source_path):
+        """
+        Retorna o checkpoint da chave, ou None se não existir ou se o arquivo
+        de origem mudou desde que foi gravado
+        """
+        try:
+            with open(self._path(key), 'r', encoding='utf-8') as handle:
+                checkpoint = json.load(handle)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+        if checkpoint.get('fingerprint') != self._fingerprint(source_path):
+            logging.warning(f"Checkpoint de {key} ignorado: o arquivo de origem foi alterado")
+            return None
+        return checkpoint
+
+    def save(self, key, source_path, records, last_key=None, completed=False):
+        """
+        Grava o checkpoint de forma atômica (arquivo temporário + rename)
+
+        Args:
+            key (str): Identificador da fonte
+            source_path (str): Arquivo de origem
+            records (int): Registros da fonte já confirmados no banco
+            last_key (str): Chave natural do último registro confirmado
+            completed (bool): Se a fonte foi importada por completo
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        checkpoint = {
+            'key': key,
+            'source': os.path.abspath(source_path),
+            'fingerprint': self._fingerprint(source_path),
+            'records': records,
+            'last_key': last_key,
+            'completed': completed
+        }
+
+        handle, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(handle, 'w', encoding='utf-8') as temp_file:
+            json.dump(checkpoint, temp_file)
+        os.replace(temp_path, self._path(key))
+
+    def clear(self, key):
+        """Remove o checkpoint da chave"""
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
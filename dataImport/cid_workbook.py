@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Leitura em streaming da tabela CID-10 (xlsx)
+
+A planilha é aberta com openpyxl em modo read_only e percorrida linha a linha
+com iter_rows(values_only=True): só a primeira coluna é lida e cada célula é
+interpretada assim que chega, sem montar o DataFrame da planilha inteira.
+
+Autor: Sistema de Importação
+Data: Setembro 2025
+"""
+
+from openpyxl import load_workbook
+
+
+def parse_cid_cell(value):
+    """
+    Interpreta a primeira coluna de uma linha da planilha
+
+    Linhas vazias, de capítulo ("Capítulo ...") ou de total ("Total") são ignoradas;
+    as demais precisam estar no formato "A00 - Descrição".
+
+    Returns:
+        tuple: (código, descrição), ou None se a linha não descreve um CID
+    """
+    if value is None:
+        return None
+    cell_value = str(value).strip()
+    if not cell_value or cell_value.startswith('Capítulo') or cell_value.startswith('Total'):
+        return None
+    if ' - ' not in cell_value:
+        return None
+
+    # Divide apenas na primeira ocorrência
+    cid_code, cid_name = cell_value.split(' - ', 1)
+    cid_code = cid_code.strip()
+    cid_name = cid_name.strip()
+    if not cid_code or not cid_name:
+        return None
+    return cid_code, cid_name
+
+
+def iter_cid_records(excel_file_path, sheet_name=None):
+    """
+    Percorre os CIDs da planilha
+
+    A primeira linha é o cabeçalho, como no pd.read_excel usado antes.
+
+    Args:
+        excel_file_path (str): Caminho da tabela CID-10
+        sheet_name (str): Planilha (None = primeira)
+
+    Yields:
+        tuple: (código, descrição)
+    """
+    workbook = load_workbook(excel_file_path, read_only=True, data_only=True)
+    try:
+        sheet = workbook[sheet_name] if sheet_name else workbook.worksheets[0]
+        for row in sheet.iter_rows(min_row=2, max_col=1, values_only=True):
+            record = parse_cid_cell(row[0] if row else None)
+            if record:
+                yield record
+    finally:
+        workbook.close()
@@ -4,7 +4,8 @@ DB_USER = 'laravel'
 DB_PASSWORD = 'secret'         
 DB_NAME = 'laravel'   
 
-BATCH_SIZE = 100         
+# Linhas do primeiro INSERT multi-linha de cada tabela (depois ajustado pelo AdaptiveBatchSizer)
+BATCH_SIZE = 1000
 LOG_LEVEL = 'INFO'       
 
 
@@ -13,4 +14,85 @@ TABLE_HOSPITAIS = 'hospitals'
 TABLE_MEDICOS = 'doctors'
 TABLE_MUNICIPIOS = 'cities'
 TABLE_PACIENTES = 'patients'
-TABLE_CID10 = 'cids'
\ No newline at end of file
+TABLE_CID10 = 'cids'
+
+# Modo de carga: 'batch' (INSERT multi-linha em lotes) ou 'bulk' (LOAD DATA LOCAL INFILE + upsert)
+LOAD_MODE = 'batch'
+
+# Gravação assíncrona (aiomysql): statements em andamento ao mesmo tempo, um por conexão (0 = desativada)
+ASYNC_BATCHES = 0
+
+# Processos usados na importação do pacientes.xml (1 = sequencial)
+XML_WORKERS = 1
+
+# Modo pipeline: threads gravadoras (0 = desativado) e limite de lotes prontos na fila
+PIPELINE_WRITERS = 0
+PIPELINE_QUEUE_SIZE = 4
+
+# Backend de parsing do pacientes.xml: 'etree', 'lxml' ou 'expat'
+XML_PARSER = 'lxml'
+
+# Linhas lidas por bloco dos arquivos CSV
+CSV_CHUNK_SIZE = 50000
+
+# Diretório (relativo ao main.py) dos checkpoints usados por --resume
+CHECKPOINT_DIR = '.import_checkpoints'
+
+# Diretório (relativo ao main.py) do cache dos arquivos de origem já interpretados (só com --source-cache)
+SOURCE_CACHE_DIR = '.import_cache'
+
+# Limites do cache de origens: tamanho total, idade máxima sem uso e registros por parte das tabelas colunares
+SOURCE_CACHE_MAX_BYTES = 20 * 1024 * 1024 * 1024
+SOURCE_CACHE_MAX_AGE_DAYS = 30
+SOURCE_CACHE_PART_ROWS = 200000
+
+# Etapas de importação independentes executadas ao mesmo tempo (1 = uma por vez)
+STAGE_WORKERS = 3
+
+# Lotes gravados por commit (0 = um commit ao fim de cada tabela)
+COMMIT_EVERY = 1
+
+# Desativa unique_checks, foreign_key_checks e sql_log_bin nas conexões (apenas cargas sem chaves repetidas)
+BULK_SESSION = False
+
+# Tamanho máximo de pacote aceito pelo cliente pymysql (bytes)
+MAX_ALLOWED_PACKET = 64 * 1024 * 1024
+
+# Limites do ajuste adaptativo de linhas por INSERT e latência máxima desejada por statement
+MIN_BATCH_SIZE = 100
+MAX_BATCH_SIZE = 50000
+BATCH_TARGET_SECONDS = 2.0
+
+# Tamanho máximo de cada INSERT multi-linha (também limitado pelo max_allowed_packet do servidor)
+MAX_STATEMENT_BYTES = 4 * 1024 * 1024
+
+# Atribuição paciente -> hospital: hospitais por paciente, processos e lado da célula da grade (graus)
+ASSIGNMENT_K = 3
+ASSIGNMENT_WORKERS = 4
+ASSIGNMENT_GRID_DEGREES = 1.0
+
+# Chaves por consulta dos hashes do delta (os hashes são lidos por lote, só das chaves do lote)
+DELTA_HASH_LOOKUP_KEYS = 5000
+
+# Acima deste número de cidades alteradas no modo delta, os agregados são recalculados por completo
+REGION_STATS_MAX_INCREMENTAL = 500
+
+# Linhas de contagens parciais acumuladas antes de somá-las aos totais dos agregados por cidade
+REGION_STATS_FOLD_ROWS = 100000
+
+# Validação dos pacientes: valores aceitos em Genero e diretório (relativo ao main.py) dos CSVs de rejeitados
+PATIENT_GENDERS = ('M', 'F')
+REJECT_DIR = 'rejeitados'
+
+# Ordenação externa dos pacientes pela chave única: registros por execução em memória,
+# execuções intercaladas de uma vez e diretório dos arquivos temporários (None = do sistema)
+SORT_RUN_RECORDS = 500000
+SORT_MERGE_FAN_IN = 64
+SORT_SPILL_DIR = None
+
+# Carga em tabelas-sombra: sufixo das tabelas carregadas e das substituídas (mantidas para o rollback)
+SHADOW_SUFFIX = '_new'
+SHADOW_OLD_SUFFIX = '_old'
+
+# Limites (segundos) dos buckets do histograma de latência dos statements de gravação
+METRICS_LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
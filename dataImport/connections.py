@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Pool de conexões e ajustes de sessão para cargas em massa
+Autor: Sistema de Importação
+Data: Setembro 2025
+"""
+
+import logging
+import queue
+import threading
+
+import pymysql
+
+# Ajustes de sessão do modo --bulk-session. Com unique_checks = 0 o InnoDB pode deixar
+# de detectar duplicatas em índices únicos secundários, então só é seguro em cargas
+# sem chaves repetidas (por exemplo, tabelas vazias). sql_log_bin exige privilégio
+# de administrador e é ignorado quando não permitido.
+BULK_SESSION_SETTINGS = (
+    'SET SESSION unique_checks = 0',
+    'SET SESSION foreign_key_checks = 0',
+    'SET SESSION sql_log_bin = 0'
+)
+
+
+def apply_session_settings(connection, statements):
+    """
+    Aplica ajustes de sessão na conexão, ignorando os que o usuário não tem permissão de alterar
+
+    Returns:
+        list: Comandos aplicados
+    """
+    applied = []
+    with connection.cursor() as cursor:
+        for statement in statements:
+            try:
+                cursor.execute(statement)
+                applied.append(statement)
+            except (pymysql.err.OperationalError, pymysql.err.InternalError) as e:
+                logging.warning(f"Ajuste de sessão ignorado ({statement}): {e}")
+    return applied
+
+
+class ConnectionPool:
+    def __init__(self, connect, size):
+        """
+        Pool de conexões compartilhado entre as etapas executadas em paralelo
+
+        As conexões são criadas sob demanda até o limite; quando todas estão em
+        uso, acquire() aguarda uma ser devolvida.
+
+        Args:
+            connect (callable): Abre uma nova conexão
+            size (int): Número máximo de conexões
+        """
+        self.connect = connect
+        self.size = max(1, size)
+        self.idle = queue.LifoQueue()
+        self.created = 0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Retorna uma conexão livre, abrindo uma nova se o limite permitir"""
+        while True:
+            try:
+                return self.idle.get_nowait()
+            except queue.Empty:
+                pass
+
+            with self.lock:
+                can_create = self.created < self.size
+                if can_create:
+                    self.created += 1
+            if can_create:
+                try:
+                    return self.connect()
+                except Exception:
+                    with self.lock:
+                        self.created -= 1
+                    raise
+
+            # Aguarda uma devolução; o laço também percebe vagas abertas por conexões descartadas
+            try:
+                return self.idle.get(timeout=0.5)
+            except queue.Empty:
+                pass
+
+    def release(self, connection):
+        """Devolve a conexão ao pool, descartando o que não foi confirmado"""
+        try:
+            connection.rollback()
+        except pymysql.err.Error:
+            # Conexão perdida: descarta e libera a vaga para uma nova
+            try:
+                connection.close()
+            except pymysql.err.Error:
+                pass
+            with self.lock:
+                self.created -= 1
+            return
+        self.idle.put(connection)
+
+    def close(self):
+        """Fecha as conexões livres"""
+        while True:
+            try:
+                self.idle.get_nowait().close()
+            except queue.Empty:
+                break
+            with self.lock:
+                self.created -= 1
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Transformações vetorizadas dos CSVs de entrada nos lotes em colunas das TableSpecs
+Autor: Sistema de Importação
+Data: Setembro 2025
+"""
+
+import pandas as pd
+
+from lookups import MISSING
+from row_batches import RowBatch, Constant
+
+# Tipos declarados no read_csv para evitar inferência coluna a coluna
+# (cidade é Int64, inteiro com nulos: uma linha sem cidade não interrompe a leitura)
+ESTADOS_DTYPES = {
+    'codigo_uf': 'int64', 'uf': str, 'nome': str, 'latitude': 'float64', 'longitude': 'float64', 'regiao': str
+}
+
+MUNICIPIOS_DTYPES = {
+    'codigo_ibge': 'int64', 'nome': str, 'latitude': 'float64', 'longitude': 'float64', 'codigo_uf': 'int64',
+    'siafi_id': 'int64', 'ddd': 'int64', 'fuso_horario': str, 'populacao': 'int64'
+}
+
+HOSPITAIS_DTYPES = {
+    'codigo': str, 'nome': str, 'cidade': 'Int64', 'bairro': str, 'especialidades': str, 'leitos_totais': 'int64'
+}
+
+MEDICOS_DTYPES = {
+    'codigo': str, 'nome_completo': str, 'especialidade': str, 'cidade': 'Int64'
+}
+
+
+def point_wkt(longitude, latitude):
+    """Monta a coluna WKT POINT(lon lat) a partir das colunas de coordenadas"""
+    return 'POINT(' + longitude.astype(str) + ' ' + latitude.astype(str) + ')'
+
+
+def _rows(*columns):
+    """Lote em colunas: Series viram listas com tipos nativos do Python, Constant fica uma vez por bloco"""
+    return RowBatch([column.tolist() if isinstance(column, pd.Series) else column for column in columns])
+
+
+def transform_estados(df, current_time):
+    """
+    Converte o DataFrame de estados.csv no lote de ESTADOS_SPEC
+
+    Returns:
+        RowBatch: Linhas para inserção
+    """
+    return _rows(
+        df['codigo_uf'],
+        df['uf'],
+        df['nome'],
+        df['latitude'],
+        df['longitude'],
+        df['regiao'],
+        point_wkt(df['longitude'], df['latitude']),
+        Constant(current_time),
+        Constant(current_time)
+    )
+
+
+def transform_municipios(df, current_time):
+    """
+    Converte o DataFrame de municipios.csv no lote de MUNICIPIOS_SPEC
+
+    Returns:
+        RowBatch: Linhas para inserção
+    """
+    return _rows(
+        df['codigo_ibge'],
+        df['nome'],
+        df['latitude'],
+        df['longitude'],
+        point_wkt(df['longitude'], df['latitude']),
+        df['capital'].astype(bool),
+        df['codigo_uf'],
+        df['siafi_id'],
+        df['ddd'],
+        df['fuso_horario'],
+        df['populacao'],
+        Constant(current_time),
+        Constant(current_time)
+    )
+
+
+def transform_hospitais(df, city_lookup, current_time):
+    """
+    Converte o DataFrame de hospitais.csv no lote de HOSPITAIS_SPEC,
+    trocando o código IBGE da cidade pelo id da tabela cities
+
+    Returns:
+        tuple: (RowBatch para inserção, número de hospitais sem cidade ou com cidade não cadastrada)
+    """
+    city_codes = df['cidade'].fillna(MISSING).to_numpy(dtype='int64')
+    city_ids = pd.Series(city_lookup.resolve(city_codes), index=df.index)
+    found = city_ids != MISSING
+    df = df[found]
+
+    rows = _rows(
+        df['codigo'],
+        df['nome'],
+        city_ids[found],
+        df['bairro'],
+        df['leitos_totais'],
+        Constant(current_time),
+        Constant(current_time)
+    )
+    return rows, int((~found).sum())
+
+
+def transform_hospital_specialties(df, hospital_lookup, current_time):
+    """
+    Explode a coluna especialidades (separadas por ;) de hospitais.csv no
+    lote de ESPECIALIDADES_SPEC
+
+    Returns:
+        tuple: (RowBatch para inserção, número de hospitais não cadastrados)
+    """
+    hospital_ids = pd.Series(hospital_lookup.resolve(df['codigo'].fillna('').to_numpy()), index=df.index)
+    found = hospital_ids != MISSING
+
+    specialties = df.loc[found, 'especialidades'].dropna().str.split(';').explode().str.strip()
+    specialties = specialties[specialties.notna() & (specialties != '')]
+
+    rows = _rows(
+        hospital_ids.loc[specialties.index],
+        specialties,
+        Constant(current_time),
+        Constant(current_time)
+    )
+    return rows, int((~found).sum())
+
+
+def transform_medicos(df, current_time):
+    """
+    Converte o DataFrame de medicos.csv no lote de MEDICOS_SPEC
+    (doctors.city é obrigatória: médicos sem cidade são ignorados)
+
+    Returns:
+        tuple: (RowBatch para inserção, número de médicos sem cidade)
+    """
+    found = df['cidade'].notna()
+    df = df[found]
+
+    rows = _rows(
+        df['codigo'],
+        df['nome_completo'],
+        df['especialidade'],
+        df['cidade'],
+        Constant(current_time),
+        Constant(current_time)
+    )
+    return rows, int((~found).sum())
@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Construção adiada dos índices secundários na carga inicial
+
+Antes da carga os índices secundários e as foreign keys da tabela são
+registrados e removidos, e a carga grava só o índice primário. Ao final todos
+os índices são recriados em um único ALTER TABLE (uma leitura da tabela e uma
+ordenação por índice, em vez de manter cada índice linha a linha), as foreign
+keys voltam com os mesmos nomes e o esquema é comparado com o registrado.
+
+Autor: Sistema de Importação
+Data: Setembro 2025
+"""
+
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+
+
+def index_definition(name, index):
+    """Cláusula ADD ... INDEX de um índice registrado"""
+    kind = 'UNIQUE ' if index['unique'] else ''
+    if index['type'] in ('SPATIAL', 'FULLTEXT'):
+        kind = f"{index['type']} "
+    columns = ', '.join(
+        f"`{column}`({sub_part})" if sub_part else f"`{column}`" for column, sub_part in index['columns']
+    )
+    return f"ADD {kind}INDEX `{name}` ({columns})"
+
+
+def foreign_key_definition(name, foreign_key):
+    """Cláusula ADD CONSTRAINT ... FOREIGN KEY de uma foreign key registrada"""
+    columns = ', '.join(f"`{column}`" for column in foreign_key['columns'])
+    referenced = ', '.join(f"`{column}`" for column in foreign_key['referenced_columns'])
+    return (
+        f"ADD CONSTRAINT `{name}` FOREIGN KEY ({columns}) "
+        f"REFERENCES `{foreign_key['referenced_table']}` ({referenced}) "
+        f"ON DELETE {foreign_key['on_delete']} ON UPDATE {foreign_key['on_update']}"
+    )
+
+
+def read_foreign_keys(connection, table):
+    """
+    Foreign keys atuais da tabela (information_schema)
+
+    Returns:
+        dict: Nome -> columns, referenced_table, referenced_columns, on_delete, on_update
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("""
+            SELECT k.CONSTRAINT_NAME AS name, k.COLUMN_NAME AS column_name,
+                   k.REFERENCED_TABLE_NAME AS referenced_table, k.REFERENCED_COLUMN_NAME AS referenced_column,
+                   r.DELETE_RULE AS on_delete, r.UPDATE_RULE AS on_update
+            FROM information_schema.KEY_COLUMN_USAGE k
+            JOIN information_schema.REFERENTIAL_CONSTRAINTS r
+              ON r.CONSTRAINT_SCHEMA = k.CONSTRAINT_SCHEMA AND r.CONSTRAINT_NAME = k.CONSTRAINT_NAME
+            WHERE k.TABLE_SCHEMA = DATABASE() AND k.TABLE_NAME = %s AND k.REFERENCED_TABLE_NAME IS NOT NULL
+            ORDER BY k.CONSTRAINT_NAME, k.ORDINAL_POSITION
+        """, (table,))
+        rows = cursor.fetchall()
+
+    foreign_keys = {}
+    for row in rows:
+        foreign_key = foreign_keys.setdefault(row['name'], {
+            'columns': [], 'referenced_table': row['referenced_table'], 'referenced_columns': [],
+            'on_delete': row['on_delete'], 'on_update': row['on_update']
+        })
+        foreign_key['columns'].append(row['column_name'])
+        foreign_key['referenced_columns'].append(row['referenced_column'])
+    return foreign_keys
+
+
+class DeferredIndexes:
+    def __init__(self, importer, table, state_dir):
+        """
+        Remove e recria os índices secundários de uma tabela
+
+        O esquema registrado é gravado em state_dir antes da remoção: se a carga for
+        interrompida, a próxima execução recria os índices a partir dele.
+
+        Args:
+            importer (DatabaseImporter): Importador com a conexão aberta
+            table (str): Tabela carregada
+            state_dir (str): Diretório do esquema registrado (o dos checkpoints)
+        """
+        self.importer = importer
+        self.table = table
+        self.state_dir = state_dir
+        self.state_path = os.path.join(state_dir, f"indices-{table}.json")
+        self.schema = None
+
+    def _fetch(self, query, params=None):
+        with self.importer.connection.cursor() as cursor:
+            cursor.execute(query, params)
+            return cursor.fetchall()
+
+    def _execute(self, query):
+        with self.importer.connection.cursor() as cursor:
+            cursor.execute(query)
+
+    def read_schema(self):
+        """
+        Índices secundários e foreign keys atuais da tabela (information_schema)
+
+        Returns:
+            dict: 'indexes' (nome -> unique, type, columns) e 'foreign_keys'
+                (nome -> columns, referenced_table, referenced_columns, on_delete, on_update)
+        """
+        indexes = {}
+        for row in self._fetch("""
+            SELECT INDEX_NAME AS name, NON_UNIQUE AS non_unique, INDEX_TYPE AS type,
+                   COLUMN_NAME AS column_name, SUB_PART AS sub_part
+            FROM information_schema.STATISTICS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME <> 'PRIMARY'
+            ORDER BY INDEX_NAME, SEQ_IN_INDEX
+        """, (self.table,)):
+            index = indexes.setdefault(
+                row['name'], {'unique': not int(row['non_unique']), 'type': row['type'], 'columns': []}
+            )
+            index['columns'].append([row['column_name'], row['sub_part']])
+
+        return {'indexes': indexes, 'foreign_keys': read_foreign_keys(self.importer.connection, self.table)}
+
+    def _load_pending(self):
+        """Esquema registrado por uma carga que não chegou a recriar os índices"""
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as handle:
+                return json.load(handle)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def _save_pending(self):
+        """Grava o esquema registrado de forma atômica (arquivo temporário + rename)"""
+        os.makedirs(self.state_dir, exist_ok=True)
+        handle, temp_path = tempfile.mkstemp(dir=self.state_dir, suffix='.tmp')
+        with os.fdopen(handle, 'w', encoding='utf-8') as temp_file:
+            json.dump(self.schema, temp_file)
+        os.replace(temp_path, self.state_path)
+
+    def drop(self):
+        """
+        Registra e remove as foreign keys e os índices secundários da tabela
+
+        Só uma tabela vazia tem os índices removidos: sem os índices únicos o
+        ON DUPLICATE KEY UPDATE não encontraria as linhas já existentes.
+
+        Returns:
+            bool: Se a carga vai rodar sem os índices (False = tabela com dados, índices mantidos)
+        """
+        pending = self._load_pending()
+        has_rows = bool(self._fetch(f"SELECT 1 AS found FROM {self.table} LIMIT 1"))
+        if pending is not None:
+            # Sem os índices únicos, regravar as linhas já carregadas as duplicaria
+            if has_rows and not self.importer.resume:
+                logging.error(
+                    f"{self.table}: índices pendentes de uma carga anterior ({self.state_path}) e a tabela já "
+                    f"tem dados; execute com --defer-indexes --resume para continuar a carga e recriá-los"
+                )
+                sys.exit(1)
+            self.schema = pending
+            logging.warning(f"{self.table}: índices removidos por uma carga interrompida, recriados ao final desta")
+            return True
+
+        if has_rows:
+            logging.warning(f"{self.table}: a tabela já tem dados, carga com os índices mantidos")
+            return False
+
+        try:
+            self.schema = self.read_schema()
+            self._save_pending()
+            if self.schema['foreign_keys']:
+                self._execute(f"ALTER TABLE {self.table} " + ', '.join(
+                    f"DROP FOREIGN KEY `{name}`" for name in self.schema['foreign_keys']
+                ))
+            if self.schema['indexes']:
+                self._execute(f"ALTER TABLE {self.table} " + ', '.join(
+                    f"DROP INDEX `{name}`" for name in self.schema['indexes']
+                ))
+        except Exception as e:
+            logging.error(f"Erro ao remover os índices de {self.table}: {e}")
+            sys.exit(1)
+
+        logging.info(
+            f"{self.table}: {len(self.schema['indexes'])} índices e {len(self.schema['foreign_keys'])} "
+            f"foreign keys removidos até o fim da carga"
+        )
+        return True
+
+    def _duplicate_keys(self, index):
+        """
+        Chaves repetidas de um índice único registrado, conferidas antes do ALTER
+
+        Returns:
+            tuple: (número de chaves repetidas, até 5 exemplos como texto)
+        """
+        columns = [
+            f"LEFT(`{column}`, {int(sub_part)})" if sub_part else f"`{column}`" for column, sub_part in index['columns']
+        ]
+        # Linhas com alguma coluna NULL não violam o índice único
+        not_null = ' AND '.join(f"`{column}` IS NOT NULL" for column, _ in index['columns'])
+        group_by = ', '.join(columns)
+        repeated = self._fetch(f"""
+            SELECT COUNT(*) AS total FROM (
+                SELECT 1 FROM {self.table} WHERE {not_null} GROUP BY {group_by} HAVING COUNT(*) > 1
+            ) repeated
+        """)[0]['total']
+        if not repeated:
+            return 0, []
+        keys = ', '.join(f"{expression} AS k{position}" for position, expression in enumerate(columns))
+        rows = self._fetch(f"""
+            SELECT {keys}, COUNT(*) AS total FROM {self.table}
+            WHERE {not_null}
+            GROUP BY {group_by}
+            HAVING COUNT(*) > 1
+            ORDER BY total DESC
+            LIMIT 5
+        """)
+        examples = [
+            f"{'/'.join(str(row[f'k{position}']) for position in range(len(columns)))} ({row['total']}x)"
+            for row in rows
+        ]
+        return int(repeated), examples
+
+    def rebuild(self):
+        """
+        Recria os índices em um único ALTER TABLE, confere as referências das
+        foreign keys e as recria, e compara o esquema final com o registrado
+
+        Só o que falta é recriado: depois de uma remoção interrompida parte dos
+        índices pode ter ficado na tabela. Antes do ALTER as chaves dos índices
+        únicos são conferidas, como as referências das foreign keys: um índice
+        único com chaves repetidas ou uma foreign key com linhas sem referência
+        fica de fora, o restante é recriado (a tabela continua consultável) e a
+        carga termina com erro, com o esquema ainda pendente.
+        """
+        started_at = time.perf_counter()
+        current = self.read_schema()
+        problems = []
+
+        indexes = {}
+        for name, index in self.schema['indexes'].items():
+            if name in current['indexes']:
+                continue
+            if index['unique']:
+                repeated, examples = self._duplicate_keys(index)
+                if repeated:
+                    problems.append(
+                        f"índice único {name}: {repeated} chaves repetidas (por exemplo {', '.join(examples)})"
+                    )
+                    continue
+            indexes[name] = index
+
+        try:
+            if indexes:
+                self._execute(f"ALTER TABLE {self.table} " + ', '.join(
+                    index_definition(name, index) for name, index in indexes.items()
+                ) + ", ALGORITHM=INPLACE")
+        except Exception as e:
+            logging.error(f"Erro ao recriar os índices de {self.table}: {e}")
+            logging.error(f"Os índices continuam pendentes em {self.state_path}")
+            sys.exit(1)
+        index_seconds = time.perf_counter() - started_at
+
+        # Com as checagens ativas o MySQL copiaria a tabela para criar a foreign key;
+        # as referências são conferidas antes, com uma consulta por foreign key
+        foreign_keys = {}
+        for name, foreign_key in self.schema['foreign_keys'].items():
+            if name in current['foreign_keys']:
+                continue
+            join = ' AND '.join(
+                f"p.`{referenced}` = c.`{column}`"
+                for column, referenced in zip(foreign_key['columns'], foreign_key['referenced_columns'])
+            )
+            orphans = self._fetch(f"""
+                SELECT COUNT(*) AS total FROM {self.table} c
+                LEFT JOIN `{foreign_key['referenced_table']}` p ON {join}
+                WHERE c.`{foreign_key['columns'][0]}` IS NOT NULL
+                  AND p.`{foreign_key['referenced_columns'][0]}` IS NULL
+            """)[0]['total']
+            if orphans:
+                problems.append(
+                    f"foreign key {name}: {orphans} linhas sem correspondente em {foreign_key['referenced_table']}"
+                )
+                continue
+            foreign_keys[name] = foreign_key
+
+        try:
+            if foreign_keys:
+                checks = self._fetch("SELECT @@foreign_key_checks AS checks")[0]['checks']
+                self._execute("SET foreign_key_checks = 0")
+                try:
+                    self._execute(f"ALTER TABLE {self.table} " + ', '.join(
+                        foreign_key_definition(name, foreign_key) for name, foreign_key in foreign_keys.items()
+                    ))
+                finally:
+                    self._execute(f"SET foreign_key_checks = {int(checks)}")
+        except Exception as e:
+            logging.error(f"Erro ao recriar as foreign keys de {self.table}: {e}")
+            sys.exit(1)
+        foreign_key_seconds = time.perf_counter() - started_at - index_seconds
+
+        logging.info(
+            f"{self.table}: {len(indexes)} índices recriados em {index_seconds:.1f}s e "
+            f"{len(foreign_keys)} foreign keys em {foreign_key_seconds:.1f}s"
+        )
+        if problems:
+            for problem in problems:
+                logging.error(f"{self.table}: {problem}, não recriado")
+            logging.error(
+                f"{self.table}: os demais índices e foreign keys foram recriados. Depois de corrigir as linhas, "
+                f"execute novamente com --defer-indexes --resume para recriar o que falta "
+                f"(esquema pendente em {self.state_path})"
+            )
+            sys.exit(1)
+
+        self.verify()
+        os.remove(self.state_path)
+
+    def verify(self):
+        """Encerra com erro se os índices ou as foreign keys diferirem dos registrados antes da carga"""
+        current = self.read_schema()
+        differences = [
+            f"{kind} {name}"
+            for kind in ('indexes', 'foreign_keys')
+            for name in sorted(set(current[kind]) | set(self.schema[kind]))
+            if current[kind].get(name) != self.schema[kind].get(name)
+        ]
+        if differences:
+            logging.error(f"{self.table}: esquema diferente do registrado antes da carga: {', '.join(differences)}")
+            sys.exit(1)
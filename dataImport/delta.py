@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Importação incremental: envia ao banco apenas as linhas novas ou alteradas
+Autor: Sistema de Importação
+Data: Setembro 2025
+"""
+
+import hashlib
+import logging
+
+from batch_sizing import AdaptiveBatchSizer
+from row_batches import select_rows
+from table_specs import ROW_HASHES_SPEC, DIRTY_REGIONS_SPEC
+
+
+def row_hash(row, content_indexes):
+    """Hash do conteúdo da linha (sem created_at/updated_at)"""
+    content = repr(tuple(row[index] for index in content_indexes))
+    return hashlib.blake2b(content.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def region_value(value):
+    """Valor da coluna da cidade como texto (None para vazio/NaN)"""
+    if value is None or (isinstance(value, float) and value != value):
+        return None
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value)
+
+
+class DeltaWriter:
+    def __init__(self, importer, writer, spec):
+        """
+        Envolve um gravador e descarta as linhas cujo hash de conteúdo não mudou
+        desde a última importação
+
+        Os hashes ficam na tabela import_row_hashes, por tabela e chave natural, e
+        só são atualizados depois que o gravador confirmou as linhas no banco. A
+        cada lote são consultados apenas os hashes das chaves do lote, então a
+        memória não depende do tamanho da tabela.
+        Se a tabela tem region_column, as cidades das linhas novas ou alteradas
+        (inclusive a cidade anterior de linhas que mudaram de cidade) são
+        registradas em stats_dirty_regions, no mesmo commit dos hashes.
+
+        Args:
+            importer (DatabaseImporter): Importador com a conexão aberta (grava os hashes)
+            writer (BatchWriter): Gravador das linhas novas ou alteradas
+            spec (TableSpec): Tabela de destino (com key_column)
+        """
+        self.importer = importer
+        self.writer = writer
+        self.spec = spec
+        self.key_index = spec.key_index()
+        self.content_indexes = spec.content_indexes()
+        self.commits_on_write = writer.commits_on_write
+        self.pending_hashes = []
+        self.hash_sizer = AdaptiveBatchSizer()
+        self.region_index = spec.region_index() if spec.region_column else None
+        self.pending_regions = set()
+        self.region_sizer = AdaptiveBatchSizer()
+        self.inserted = 0
+        self.updated = 0
+        self.unchanged = 0
+
+    @property
+    def count(self):
+        return self.writer.count
+
+    def write(self, rows):
+        """Repassa ao gravador apenas as linhas novas ou com conteúdo alterado"""
+        changed_mask = []
+        updated_keys = []
+        entries = [(row[self.key_index], row_hash(row, self.content_indexes)) for row in rows]
+        known_hashes = self.importer.load_row_hashes(self.spec, [str(value) for value, _ in entries])
+        for value, digest in entries:
+            key = str(value)
+            # A chave sai do dicionário: se ela se repetir no lote, a ocorrência seguinte conta como nova
+            previous = known_hashes.pop(key, None)
+            if previous is None:
+                self.inserted += 1
+            elif previous != digest:
+                self.updated += 1
+                updated_keys.append(value)
+            else:
+                self.unchanged += 1
+                changed_mask.append(False)
+                continue
+            changed_mask.append(True)
+            self.pending_hashes.append((self.spec.table, key, digest))
+        # Um RowBatch continua em colunas para o gravador
+        changed = select_rows(rows, changed_mask)
+
+        if self.region_index is not None and changed:
+            # A cidade anterior é lida antes da gravação, enquanto o banco ainda tem a versão antiga
+            regions = [row[self.region_index] for row in changed]
+            if updated_keys:
+                regions.extend(self.importer.load_row_regions(self.spec, updated_keys))
+            self.pending_regions.update(filter(None, map(region_value, regions)))
+
+        if changed:
+            self.writer.write(changed)
+        if self.commits_on_write:
+            self.flush_hashes()
+
+    def flush_hashes(self):
+        """Grava os hashes (e as cidades alteradas) das linhas já confirmadas pelo gravador"""
+        if self.pending_regions:
+            self.importer.execute_values(
+                DIRTY_REGIONS_SPEC, [(self.spec.table, value) for value in sorted(self.pending_regions)],
+                self.region_sizer
+            )
+            self.pending_regions = set()
+        if self.pending_hashes:
+            self.importer.execute_values(ROW_HASHES_SPEC, self.pending_hashes, self.hash_sizer)
+            self.importer.commit()
+            self.pending_hashes = []
+
+    def summary(self):
+        """
+        Contagens do delta
+
+        Returns:
+            dict: Linhas novas, alteradas e inalteradas
+        """
+        return {
+            'inserted': self.inserted,
+            'updated': self.updated,
+            'unchanged': self.unchanged
+        }
+
+    def close(self):
+        """Fecha o gravador e grava os hashes pendentes"""
+        self.writer.close()
+        self.flush_hashes()
+        return self.count
+
+    def discard(self):
+        """Descarta o gravador sem gravar hashes de linhas não confirmadas"""
+        self.pending_hashes = []
+        self.pending_regions = set()
+        self.writer.discard()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+        return False
+
+
+def log_delta_report(table, summary, complete=True):
+    """
+    Registra as contagens do delta de uma tabela
+
+    Args:
+        table (str): Tabela de destino
+        summary (dict): Contagens de DeltaWriter.summary (podem ser somas de vários gravadores)
+            e known, o número de hashes gravados antes da importação
+        complete (bool): Se a origem foi lida por inteiro; só assim as chaves
+            ausentes podem ser contadas
+    """
+    message = (
+        f"{table} delta: {summary['inserted']} inseridos, {summary['updated']} atualizados, "
+        f"{summary['unchanged']} inalterados"
+    )
+    if complete:
+        # As linhas cujas chaves não vieram na origem continuam no banco: são apenas contadas
+        missing = summary['known'] - summary['updated'] - summary['unchanged']
+        message += f", {missing} ausentes da origem (mantidos no banco)"
+    logging.info(message)
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Ordenação externa dos registros de origem com memória limitada
+
+Os registros são lidos em execuções de até run_records registros; cada execução
+é ordenada em memória e gravada em um arquivo temporário, e as execuções são
+intercaladas com heapq.merge. Só um bloco de cada execução fica em memória
+durante a intercalação.
+
+A chave de ordenação dos pacientes (CollationKey) segue a ordem do índice do
+MySQL em vez da ordem dos code points do Python.
+
+Autor: Sistema de Importação
+Data: Setembro 2025
+"""
+
+import heapq
+import logging
+import os
+import pickle
+import tempfile
+from itertools import islice
+
+from config import SORT_RUN_RECORDS, SORT_MERGE_FAN_IN, SORT_SPILL_DIR
+
+# Registros por bloco gravado nos arquivos de execução (e lido por vez na intercalação)
+SPILL_BLOCK_RECORDS = 1000
+
+
+def _write_run(records, directory):
+    """Grava registros já ordenados em blocos pickle e retorna o caminho do arquivo"""
+    handle, path = tempfile.mkstemp(dir=directory, suffix='.run')
+    with os.fdopen(handle, 'wb') as run_file:
+        records = iter(records)
+        while True:
+            block = list(islice(records, SPILL_BLOCK_RECORDS))
+            if not block:
+                break
+            pickle.dump(block, run_file, protocol=pickle.HIGHEST_PROTOCOL)
+    return path
+
+
+def _read_run(path):
+    """Registros de um arquivo de execução, um bloco por vez"""
+    with open(path, 'rb') as run_file:
+        while True:
+            try:
+                block = pickle.load(run_file)
+            except EOFError:
+                return
+            yield from block
+
+
+def _merge_runs(paths, key, directory, fan_in):
+    """
+    Intercala as execuções; com mais de fan_in arquivos, grupos de fan_in são
+    intercalados antes em novas execuções, para limitar os arquivos abertos
+
+    Returns:
+        iterator: Registros ordenados
+    """
+    while len(paths) > fan_in:
+        merged = []
+        for start in range(0, len(paths), fan_in):
+            group = paths[start:start + fan_in]
+            merged.append(_write_run(heapq.merge(*map(_read_run, group), key=key), directory))
+            for path in group:
+                os.remove(path)
+        paths = merged
+    return heapq.merge(*map(_read_run, paths), key=key)
+
+
+class CollationKey:
+    def __init__(self, index, label='registros'):
+        """
+        Chave de ordenação de um campo textual na ordem da collation das tabelas do
+        backend (utf8mb4_unicode_ci): sem diferença de maiúsculas, com os dígitos
+        antes das letras
+
+        Para valores só com [0-9A-Za-z], upper() na ordem dos code points é
+        exatamente essa ordem. Outros caracteres (acentos, pontuação) têm pesos
+        próprios na collation; eles continuam na ordem dos code points e o
+        primeiro encontrado é registrado no log. A ordem só afeta a localidade
+        das gravações no índice, não o resultado da importação.
+
+        Args:
+            index (int): Posição do campo no registro
+            label (str): Nome da fonte no log
+        """
+        self.index = index
+        self.label = label
+        self.warned = False
+
+    def __call__(self, record):
+        value = record[self.index]
+        if not self.warned and value and not (value.isascii() and value.isalnum()):
+            self.warned = True
+            logging.warning(
+                f"{self.label}: valor {value!r} tem caracteres fora de [0-9A-Za-z]; "
+                f"a ordem desses valores pode diferir da do índice do MySQL"
+            )
+        return value.upper()
+
+
+def sorted_records(records, key, run_records=SORT_RUN_RECORDS, spill_dir=SORT_SPILL_DIR,
+                   fan_in=SORT_MERGE_FAN_IN, label='registros'):
+    """
+    Registros na ordem de key, com no máximo run_records registros em memória
+    (mais um bloco por execução na intercalação)
+
+    A ordenação é estável: registros com a mesma chave saem na ordem de leitura.
+
+    Args:
+        records (iterable): Registros de origem
+        key (callable): Chave de ordenação de um registro
+        run_records (int): Registros por execução ordenada em memória
+        spill_dir (str): Diretório dos arquivos temporários (None = diretório temporário do sistema)
+        fan_in (int): Máximo de execuções intercaladas de uma vez
+        label (str): Nome da fonte no log
+
+    Yields:
+        Registros ordenados
+    """
+    records = iter(records)
+    run = sorted(islice(records, run_records), key=key)
+    if len(run) < run_records:
+        # Tudo coube em uma execução: nada é gravado em disco
+        yield from run
+        return
+
+    with tempfile.TemporaryDirectory(prefix='import_sort_', dir=spill_dir) as directory:
+        paths = []
+        total = 0
+        while run:
+            paths.append(_write_run(run, directory))
+            total += len(run)
+            run = sorted(islice(records, run_records), key=key)
+        spilled = sum(os.path.getsize(path) for path in paths)
+        logging.info(
+            f"{label}: {total} registros ordenados em {len(paths)} execuções "
+            f"({spilled / (1024 * 1024):.0f} MB em disco)"
+        )
+        yield from _merge_runs(paths, key, directory, fan_in)
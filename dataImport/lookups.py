@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Mapeamentos compactos (código -> id) usados para resolver cidades, CIDs e hospitais
+
+As chaves ficam em um vetor NumPy ordenado e os ids em um vetor paralelo; um
+lote inteiro de chaves é resolvido com um único searchsorted. Os vetores podem
+ser gravados em arquivos .npy e abertos com mmap pelos processos trabalhadores,
+que compartilham as páginas pelo cache do sistema em vez de receber uma cópia.
+
+Autor: Sistema de Importação
+Data: Setembro 2025
+"""
+
+import os
+import threading
+
+import numpy as np
+
+# Id devolvido para chaves não encontradas
+MISSING = -1
+
+
+class SortedLookup:
+    def __init__(self, keys, values):
+        """
+        Mapeamento de chaves inteiras ou textuais para ids inteiros
+
+        Chaves textuais são guardadas como bytes de largura fixa, um byte maior
+        que a maior chave, para que uma chave consultada mais longa nunca seja
+        truncada para uma chave existente.
+
+        Args:
+            keys (sequence): Chaves (int ou str)
+            values (sequence): Id de cada chave
+        """
+        keys = np.asarray(keys)
+        if keys.dtype.kind in 'US':
+            keys = np.char.encode(keys.astype(str), 'utf-8')
+            keys = keys.astype(f'S{keys.dtype.itemsize + 1}')
+        else:
+            keys = keys.astype(np.int64)
+        order = np.argsort(keys, kind='stable')
+        self.keys = keys[order]
+        self.values = np.asarray(values, dtype=np.int64)[order]
+        self.path = None
+
+    def __len__(self):
+        return len(self.keys)
+
+    @property
+    def nbytes(self):
+        return self.keys.nbytes + self.values.nbytes
+
+    def _query(self, keys):
+        """Converte as chaves consultadas para o tipo do vetor de chaves"""
+        if self.keys.dtype.kind == 'S':
+            return np.char.encode(np.asarray(keys, dtype=str), 'utf-8').astype(self.keys.dtype)
+        return np.asarray(keys, dtype=np.int64)
+
+    def resolve(self, keys):
+        """
+        Resolve um lote de chaves
+
+        Args:
+            keys (sequence): Chaves consultadas
+
+        Returns:
+            ndarray: Id de cada chave (MISSING se não encontrada)
+        """
+        query = self._query(keys)
+        if not len(self.keys) or not len(query):
+            return np.full(len(query), MISSING, dtype=np.int64)
+        positions = np.minimum(np.searchsorted(self.keys, query), len(self.keys) - 1)
+        return np.where(self.keys[positions] == query, self.values[positions], MISSING)
+
+    def get(self, key, default=None):
+        """Id de uma chave (para consultas avulsas)"""
+        value = int(self.resolve([key])[0])
+        return default if value == MISSING else value
+
+    def share(self, directory, name):
+        """
+        Grava os vetores em directory e retorna uma cópia que os lê com mmap
+
+        A cópia é serializada apenas pelo caminho dos arquivos, então pode ser
+        enviada aos processos trabalhadores sem copiar os vetores.
+
+        Returns:
+            SortedLookup: Mapeamento aberto com mmap
+        """
+        path = os.path.join(directory, name)
+        np.save(f"{path}.keys.npy", self.keys)
+        np.save(f"{path}.values.npy", self.values)
+        shared = SortedLookup.__new__(SortedLookup)
+        shared.__setstate__({'path': path})
+        return shared
+
+    def __getstate__(self):
+        if self.path:
+            return {'path': self.path}
+        return {'keys': self.keys, 'values': self.values, 'path': None}
+
+    def __setstate__(self, state):
+        self.path = state['path']
+        if self.path:
+            self.keys = np.load(f"{self.path}.keys.npy", mmap_mode='r')
+            self.values = np.load(f"{self.path}.values.npy", mmap_mode='r')
+        else:
+            self.keys = state['keys']
+            self.values = state['values']
+
+
+class LookupCache:
+    def __init__(self):
+        """
+        Mapeamentos carregados uma vez por execução e compartilhados entre as
+        etapas; o mapeamento de uma tabela é descartado quando ela é gravada
+        """
+        self.lookups = {}
+        self.lock = threading.Lock()
+
+    def get(self, table, load):
+        """
+        Retorna o mapeamento da tabela, carregando-o com load() na primeira vez
+
+        Args:
+            table (str): Tabela de origem do mapeamento
+            load (callable): Retorna o SortedLookup da tabela
+        """
+        with self.lock:
+            lookup = self.lookups.get(table)
+        if lookup is None:
+            lookup = load()
+            with self.lock:
+                lookup = self.lookups.setdefault(table, lookup)
+        return lookup
+
+    def invalidate(self, table):
+        """Descarta o mapeamento de uma tabela que foi alterada"""
+        with self.lock:
+            self.lookups.pop(table, None)
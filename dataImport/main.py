@@ -8,14 +8,56 @@ Data: Setembro 2025
 
 import pymysql
 import pandas as pd
+import numpy as np
 import xml.etree.ElementTree as ET
-from openpyxl import load_workbook
+from xml.parsers import expat
 import logging
 import sys
 from datetime import datetime
 import os
-import gc  
-from config import DB_HOST, DB_PORT, DB_USER, DB_PASSWORD, DB_NAME
+import argparse
+import time
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from itertools import compress, islice, repeat
+from config import (
+    DB_HOST, DB_PORT, DB_USER, DB_PASSWORD, DB_NAME, LOAD_MODE, XML_WORKERS, PIPELINE_WRITERS, PIPELINE_QUEUE_SIZE,
+    ASYNC_BATCHES,
+    XML_PARSER, CSV_CHUNK_SIZE, CHECKPOINT_DIR, STAGE_WORKERS, COMMIT_EVERY, BULK_SESSION, MAX_ALLOWED_PACKET,
+    MAX_STATEMENT_BYTES, ASSIGNMENT_K, ASSIGNMENT_WORKERS, ASSIGNMENT_GRID_DEGREES, REGION_STATS_MAX_INCREMENTAL,
+    TABLE_MUNICIPIOS, TABLE_HOSPITAIS, TABLE_MEDICOS, TABLE_PACIENTES, TABLE_CID10, REJECT_DIR, SOURCE_CACHE_DIR,
+    DELTA_HASH_LOOKUP_KEYS
+)
+from table_specs import (
+    ESTADOS_SPEC, MUNICIPIOS_SPEC, HOSPITAIS_SPEC, ESPECIALIDADES_SPEC, MEDICOS_SPEC, PACIENTES_SPEC, CID10_SPEC,
+    PATIENT_HOSPITAL_SPEC, REGION_STATS_SPEC
+)
+from writers import BatchWriter, BulkLoadWriter, LOAD_MODE_BULK, LOAD_MODES
+from xml_shards import find_shard_ranges, ShardReader
+from pipeline import PipelinedWriter
+from async_writer import AsyncBatchWriter, require_aiomysql
+from patient_parsers import PARSER_BACKENDS, PATIENT_FIELDS, iter_patient_records
+from checkpoints import CheckpointStore
+from delta import DeltaWriter, log_delta_report
+from scheduler import StageScheduler
+from connections import ConnectionPool, BULK_SESSION_SETTINGS, apply_session_settings
+from assignments import NO_CID, init_assignment_worker, compute_assignments
+from validation import PatientValidator, REJECT_CITY, invalid_reason, patient_keys, find_duplicates
+from lookups import SortedLookup, LookupCache, MISSING
+from cid_workbook import iter_cid_records
+from source_cache import SourceCache, PartWriter
+from row_batches import RowBatch, Constant
+from shadow_tables import ShadowTables
+from deferred_indexes import DeferredIndexes, read_foreign_keys, foreign_key_definition
+from external_sort import CollationKey, sorted_records
+from region_stats import RegionStatsAccumulator, SCOPE_CITY, SCOPE_STATE
+from metrics import (
+    ImportMetrics, StageMetrics, PHASE_PARSE, PHASE_TRANSFORM, PHASE_LOOKUP, PHASE_DB, ROWS_PARSED, ROWS_REJECTED
+)
+from csv_transforms import (
+    ESTADOS_DTYPES, MUNICIPIOS_DTYPES, HOSPITAIS_DTYPES, MEDICOS_DTYPES,
+    transform_estados, transform_municipios, transform_hospitais, transform_hospital_specialties, transform_medicos
+)
 
 # Configuração de logging
 logging.basicConfig(
@@ -27,8 +69,215 @@ logging.basicConfig(
     ]
 )
 
+# Etapa que carrega cada tabela do grupo de tabelas-sombra (--shadow)
+SHADOW_STAGES = {
+    'municipios': TABLE_MUNICIPIOS,
+    'hospitais': TABLE_HOSPITAIS,
+    'especialidades': ESPECIALIDADES_SPEC.table,
+    'medicos': TABLE_MEDICOS,
+    'pacientes': TABLE_PACIENTES,
+    'atribuicao': PATIENT_HOSPITAL_SPEC.table
+}
+
+# Registros por lote na leitura das chaves de deduplicação das faixas (_collect_shard_keys)
+KEY_COLLECT_BATCH = 100000
+
+def resolve_patient_cities(fields_list, city_lookup):
+    """
+    Registros aceitos de um lote de <Paciente> e os ids das suas cidades
+
+    Args:
+        fields_list (list): Campos na ordem de patient_parsers.PATIENT_FIELDS
+        city_lookup (SortedLookup): city_code -> id da cidade
+
+    Returns:
+        tuple: (máscara dos registros aceitos, ids das cidades com MISSING para sem cidade)
+    """
+    count = len(fields_list)
+
+    # Validações básicas
+    accepted = np.fromiter((bool(fields[0] and fields[1] and fields[2]) for fields in fields_list), bool, count)
+
+    # Código de município não numérico fica sem cidade; numérico precisa estar cadastrado
+    municipios = [fields[4] for fields in fields_list]
+    numeric = np.fromiter((code.isascii() and code.isdigit() and len(code) < 19 for code in municipios), bool, count)
+    city_codes = np.fromiter((int(code) if ok else MISSING for code, ok in zip(municipios, numeric.tolist())),
+                             np.int64, count)
+    city_ids = city_lookup.resolve(city_codes)
+    accepted &= ~numeric | (city_ids != MISSING)
+    city_ids[~numeric] = MISSING
+    return accepted, city_ids
+
+
+def build_patient_rows(fields_list, city_lookup, cid_lookup, current_time):
+    """
+    Converte os campos de um lote de <Paciente> nas colunas de PACIENTES_SPEC,
+    resolvendo as cidades e os CIDs do lote inteiro de uma vez
+
+    O lote é um RowBatch: uma lista por coluna, sem uma tupla por paciente, e
+    created_at/updated_at guardados uma vez para o lote.
+
+    Args:
+        fields_list (list): Campos na ordem de patient_parsers.PATIENT_FIELDS
+        city_lookup (SortedLookup): city_code -> id da cidade
+        cid_lookup (SortedLookup): código CID-10 -> id do CID
+        current_time (datetime): Valor de created_at/updated_at
+
+    Returns:
+        tuple: (RowBatch dos registros aceitos, máscara dos registros aceitos)
+    """
+    if not fields_list:
+        return RowBatch([], 0), np.zeros(0, dtype=bool)
+    codigos, cpfs, nomes, generos, _, bairros, convenios, cid_codes = zip(*fields_list)
+    count = len(fields_list)
+    accepted, city_ids = resolve_patient_cities(fields_list, city_lookup)
+
+    # CID não cadastrado vira R69; registro sem CID fica sem
+    cid_ids = cid_lookup.resolve(cid_codes)
+    fallback = cid_lookup.get('R69', MISSING)
+    has_cid = np.fromiter((bool(code) for code in cid_codes), bool, count)
+    cid_ids = np.where(has_cid, np.where(cid_ids == MISSING, fallback, cid_ids), MISSING)
+
+    keep = accepted.tolist()
+    city_ids = city_ids[accepted].tolist()
+    cid_ids = cid_ids[accepted].tolist()
+    timestamp = Constant(current_time)
+    rows = RowBatch([
+        list(compress(codigos, keep)),
+        list(compress(cpfs, keep)),
+        list(compress(nomes, keep)),
+        list(compress(generos, keep)),
+        [None if city_id == MISSING else city_id for city_id in city_ids],
+        list(compress(bairros, keep)),
+        [1 if convenio.upper() == 'SIM' else 0 for convenio in compress(convenios, keep)],
+        [None if cid_id == MISSING else cid_id for cid_id in cid_ids],
+        timestamp,
+        timestamp
+    ], len(city_ids))
+    return rows, accepted
+
+
+def _tee_records(records_iter, cache_part):
+    """Repassa os registros, entregando cada um também ao gravador do cache de origens"""
+    for fields in records_iter:
+        cache_part.append(fields)
+        yield fields
+
+
+# Estado de cada processo do modo paralelo, definido por _init_xml_worker
+_xml_worker_state = {}
+
+
+def _init_xml_worker(importer_config, city_lookup, cid_lookup, cached_table, cache_dir):
+    """
+    Inicializa o processo trabalhador com os mapeamentos compartilhados (abertos com mmap)
+    e a tabela do cache de origens (cached_table) ou o diretório onde gravá-la (cache_dir)
+    """
+    _xml_worker_state['importer_config'] = importer_config
+    _xml_worker_state['city_lookup'] = city_lookup
+    _xml_worker_state['cid_lookup'] = cid_lookup
+    _xml_worker_state['cached_table'] = cached_table
+    _xml_worker_state['cache_dir'] = cache_dir
+
+
+def _import_xml_shard(shard_index, xml_file_path, start, end, batch_size, duplicates=None):
+    """
+    Importa uma faixa do pacientes.xml em um processo trabalhador, com conexão
+    própria ao banco
+
+    A faixa é de registros da tabela do cache de origens, se houver, ou de bytes
+    do XML; nesse caso os registros lidos são gravados como parte do cache.
+    duplicates é o resultado de find_duplicates para a faixa (deduplicação do
+    arquivo inteiro, feita antes das faixas).
+
+    Returns:
+        dict: Contagens e tempo do trabalhador
+    """
+    started_at = time.perf_counter()
+    city_lookup = _xml_worker_state['city_lookup']
+    cid_lookup = _xml_worker_state['cid_lookup']
+    cached_table = _xml_worker_state['cached_table']
+    cache_dir = _xml_worker_state['cache_dir']
+    importer = DatabaseImporter(**_xml_worker_state['importer_config'])
+
+    try:
+        importer.metrics.start()
+        importer.connect()
+        if cached_table:
+            result = importer.import_patient_records(
+                cached_table.iter_records(start, end), f"{os.path.basename(xml_file_path)}-registros-{start}-{end}",
+                xml_file_path, city_lookup, cid_lookup, batch_size, duplicates=duplicates
+            )
+        else:
+            with ShardReader(xml_file_path, start, end) as reader:
+                result = importer.import_patient_records(
+                    iter_patient_records(reader, importer.xml_parser),
+                    f"{os.path.basename(xml_file_path)}-{start}-{end}", xml_file_path,
+                    city_lookup, cid_lookup, batch_size,
+                    cache_part=PartWriter(cache_dir, shard_index, PATIENT_FIELDS) if cache_dir else None,
+                    duplicates=duplicates
+                )
+    except SystemExit:
+        # Os métodos do importador encerram o processo em caso de erro;
+        # no trabalhador isso precisa virar exceção para chegar ao processo principal
+        raise RuntimeError(f"Falha ao importar a faixa {shard_index} ({start}-{end}) do XML")
+    finally:
+        importer.disconnect()
+        importer.metrics.finish()
+
+    result['shard'] = shard_index
+    result['seconds'] = time.perf_counter() - started_at
+    result['metrics'] = importer.metrics.snapshot()
+    return result
+
+
+def _iter_shard_records(xml_file_path, start, end, xml_parser):
+    """Registros de uma faixa de bytes do XML"""
+    with ShardReader(xml_file_path, start, end) as reader:
+        yield from iter_patient_records(reader, xml_parser)
+
+
+def _collect_shard_keys(shard_index, xml_file_path, start, end):
+    """
+    Lê uma faixa do pacientes.xml em um processo trabalhador e retorna as chaves
+    de deduplicação dos registros que chegam a PatientValidator.unique na
+    importação da faixa (válidos e de cidade conhecida), na mesma ordem
+
+    Returns:
+        tuple: (índice da faixa, hashes dos codigos, CPFs), vetores int64
+    """
+    config = _xml_worker_state['importer_config']
+    city_lookup = _xml_worker_state['city_lookup']
+    cached_table = _xml_worker_state['cached_table']
+    if cached_table:
+        records = cached_table.iter_records(start, end)
+    else:
+        records = _iter_shard_records(xml_file_path, start, end, config['xml_parser'])
+    if config['sort_patients']:
+        label = f"{os.path.basename(xml_file_path)}-{start}-{end}"
+        records = sorted_records(records, CollationKey(0, label), label=label)
+
+    codigos = [np.zeros(0, dtype=np.int64)]
+    cpfs = [np.zeros(0, dtype=np.int64)]
+    valid = (fields for fields in records if invalid_reason(fields) is None)
+    while True:
+        fields_list = list(islice(valid, KEY_COLLECT_BATCH))
+        if not fields_list:
+            break
+        accepted, _ = resolve_patient_cities(fields_list, city_lookup)
+        batch_codigos, batch_cpfs = patient_keys(list(compress(fields_list, accepted.tolist())))
+        codigos.append(batch_codigos)
+        cpfs.append(batch_cpfs)
+    return shard_index, np.concatenate(codigos), np.concatenate(cpfs)
+
+
 class DatabaseImporter:
-    def __init__(self, host='localhost', port=3306, user='root', password='', database=''):
+    def __init__(self, host='localhost', port=3306, user='root', password='', database='', load_mode=LOAD_MODE,
+                 pipeline_writers=0, pipeline_queue_size=PIPELINE_QUEUE_SIZE, async_batches=0, xml_parser=XML_PARSER,
+                 csv_chunk_size=CSV_CHUNK_SIZE, resume=False, checkpoint_dir=CHECKPOINT_DIR, delta=False,
+                 commit_every=COMMIT_EVERY, bulk_session=BULK_SESSION, validate=True, reject_dir=REJECT_DIR,
+                 source_cache_dir=None, shadow=None, sort_patients=False, pool=None, lookups=None,
+                 metrics=None):
         """
         Inicializa o importador de banco de dados
         
@@ -38,41 +287,252 @@ class DatabaseImporter:
             user (str): Usuário do MySQL
             password (str): Senha do MySQL
             database (str): Nome do banco de dados
+            load_mode (str): 'batch' (INSERT multi-linha em lotes) ou 'bulk' (LOAD DATA LOCAL INFILE)
+            pipeline_writers (int): Threads gravadoras do modo pipeline (0 = desativado)
+            pipeline_queue_size (int): Máximo de lotes aguardando gravação no modo pipeline
+            async_batches (int): Statements em andamento ao mesmo tempo na gravação assíncrona
+                (0 = desativada)
+            xml_parser (str): Backend de parsing do pacientes.xml ('etree', 'lxml' ou 'expat')
+            csv_chunk_size (int): Linhas lidas por bloco dos arquivos CSV
+            resume (bool): Retoma cada fonte a partir do último checkpoint confirmado
+            checkpoint_dir (str): Diretório dos checkpoints de importação
+            delta (bool): Envia apenas linhas novas ou alteradas (hash de conteúdo em import_row_hashes)
+            commit_every (int): Lotes por commit (0 = commit apenas ao fim de cada tabela)
+            bulk_session (bool): Aplica BULK_SESSION_SETTINGS em cada conexão
+            validate (bool): Valida e deduplica os pacientes antes da gravação
+            reject_dir (str): Diretório dos CSVs de pacientes rejeitados pela validação
+            source_cache_dir (str): Diretório do cache dos arquivos de origem já interpretados
+                (None = sem cache)
+            shadow (ShadowTables): Grava as tabelas do grupo nas tabelas-sombra, só com INSERT
+                (None = grava nas tabelas atuais com upsert)
+            sort_patients (bool): Ordena os pacientes por codigo (ordenação externa) antes da gravação
+            pool (ConnectionPool): Pool de onde a conexão é obtida (None = conexão própria)
+            lookups (LookupCache): Mapeamentos compartilhados entre os importadores da execução
+                (None = cache próprio)
+            metrics (StageMetrics): Métricas da etapa em que o importador é usado
+                (None = métricas próprias, não exportadas)
         """
         self.host = host
         self.port = port
         self.user = user
         self.password = password
         self.database = database
+        self.load_mode = load_mode
+        self.pipeline_writers = pipeline_writers
+        self.pipeline_queue_size = pipeline_queue_size
+        self.async_batches = async_batches
+        self.xml_parser = xml_parser
+        self.csv_chunk_size = csv_chunk_size
+        self.resume = resume
+        self.checkpoint_dir = checkpoint_dir
+        self.checkpoints = CheckpointStore(checkpoint_dir)
+        self.delta = delta
+        self.commit_every = commit_every
+        self.bulk_session = bulk_session
+        self.validate = validate
+        self.reject_dir = reject_dir
+        self.source_cache_dir = source_cache_dir
+        self.source_cache = SourceCache(source_cache_dir)
+        self.shadow = shadow
+        self.sort_patients = sort_patients
+        self.pool = pool
+        self.lookups = lookups if lookups is not None else LookupCache()
+        self.metrics = metrics if metrics is not None else StageMetrics('importacao')
+        self.pending_batches = 0
+        self.statement_bytes = None
         self.connection = None
         
-    def log_memory_cleanup(self, step_name):
-        """Log de limpeza de memória"""
-        objects_collected = gc.collect()
-        if objects_collected > 0:
-            logging.info(f"{step_name}: {objects_collected} objetos coletados pelo GC")
-        
+    def open_connection(self):
+        """Abre uma nova conexão com as configurações do importador"""
+        connection = pymysql.connect(
+            host=self.host,
+            port=self.port,
+            user=self.user,
+            password=self.password,
+            database=self.database,
+            charset='utf8mb4',
+            cursorclass=pymysql.cursors.DictCursor,
+            local_infile=self.load_mode == LOAD_MODE_BULK,
+            max_allowed_packet=MAX_ALLOWED_PACKET
+        )
+        if self.bulk_session:
+            apply_session_settings(connection, BULK_SESSION_SETTINGS)
+        return connection
+
     def connect(self):
-        """Conecta ao banco de dados MySQL"""
+        """Conecta ao banco de dados MySQL (ou obtém uma conexão do pool)"""
         try:
-            self.connection = pymysql.connect(
-                host=self.host,
-                port=self.port,
-                user=self.user,
-                password=self.password,
-                database=self.database,
-                charset='utf8mb4',
-                cursorclass=pymysql.cursors.DictCursor
-            )
+            self.connection = self.pool.acquire() if self.pool else self.open_connection()
+            self.pending_batches = 0
+            self.statement_bytes = None
             return True
         except Exception as e:
+            logging.error(f"Erro ao conectar ao banco: {e}")
             sys.exit(1)
     
     def disconnect(self):
-        """Desconecta do banco de dados"""
+        """Desconecta do banco de dados (ou devolve a conexão ao pool)"""
         if self.connection:
-            self.connection.close()
+            if self.pool:
+                self.pool.release(self.connection)
+            else:
+                self.connection.close()
+            self.connection = None
     
+    def start_checkpoint(self, key, source_path):
+        """
+        Prepara o checkpoint de uma fonte
+
+        Com resume, retorna o checkpoint gravado (se o arquivo de origem não mudou);
+        sem resume, descarta qualquer checkpoint anterior.
+
+        Returns:
+            dict: Checkpoint a retomar, ou None para importar desde o início
+        """
+        if not self.resume:
+            self.checkpoints.clear(key)
+            return None
+
+        checkpoint = self.checkpoints.load(key, source_path)
+        if checkpoint:
+            if checkpoint['completed']:
+                logging.info(f"{key}: importação já concluída segundo o checkpoint, etapa ignorada")
+            else:
+                logging.info(f"{key}: retomando após {checkpoint['records']} registros já confirmados")
+        return checkpoint
+
+    def connection_config(self):
+        """Parâmetros para criar outro importador com as mesmas configurações"""
+        return {
+            'host': self.host,
+            'port': self.port,
+            'user': self.user,
+            'password': self.password,
+            'database': self.database,
+            'load_mode': self.load_mode,
+            'async_batches': self.async_batches,
+            'xml_parser': self.xml_parser,
+            'csv_chunk_size': self.csv_chunk_size,
+            'resume': self.resume,
+            'checkpoint_dir': self.checkpoint_dir,
+            'delta': self.delta,
+            'commit_every': self.commit_every,
+            'bulk_session': self.bulk_session,
+            'validate': self.validate,
+            'reject_dir': self.reject_dir,
+            'source_cache_dir': self.source_cache_dir,
+            'shadow': self.shadow,
+            'sort_patients': self.sort_patients
+        }
+
+    def clone(self):
+        """
+        Cria um importador sem conexão com as mesmas configurações, para gravar
+        linhas já filtradas (sem pipeline e sem delta)
+        """
+        config = self.connection_config()
+        config['delta'] = False
+        config['async_batches'] = 0
+        return DatabaseImporter(**config, metrics=self.metrics)
+
+    def table_name(self, table):
+        """Tabela lida e gravada no lugar de table (a tabela-sombra na carga com --shadow)"""
+        return self.shadow.name(table) if self.shadow else table
+
+    def iter_rows(self, query, params=None):
+        """
+        Executa um SELECT com cursor sem buffer (SSDictCursor): as linhas são lidas
+        do servidor conforme consumidas, sem materializar o resultado inteiro no cliente
+
+        O iterador deve ser consumido até o fim antes da próxima query na conexão.
+        """
+        with self.connection.cursor(pymysql.cursors.SSDictCursor) as cursor:
+            cursor.execute(query, params)
+            yield from cursor
+
+    def load_lookup(self, table, key_column, text=False):
+        """
+        Mapeamento key_column -> id da tabela, carregado uma vez por execução
+        (compartilhado entre as etapas pelo LookupCache)
+
+        Args:
+            table (str): Tabela de origem
+            key_column (str): Coluna com o código
+            text (bool): Se o código é textual
+
+        Returns:
+            SortedLookup: Mapeamento compacto
+        """
+        table = self.table_name(table)
+
+        def load():
+            keys = []
+            ids = []
+            with self.metrics.timed(PHASE_LOOKUP):
+                for row in self.iter_rows(f"SELECT id, {key_column} FROM {table}"):
+                    keys.append(row[key_column])
+                    ids.append(row['id'])
+                lookup = SortedLookup(np.array(keys, dtype=str if text else np.int64), ids)
+            logging.info(f"Mapeamento {table}.{key_column}: {len(lookup)} chaves em {lookup.nbytes / 1024:.0f} KB")
+            return lookup
+
+        return self.lookups.get(table, load)
+
+    def load_city_lookup(self):
+        """Retorna o mapeamento city_code -> id da cidade"""
+        return self.load_lookup(TABLE_MUNICIPIOS, 'city_code')
+
+    def load_cid_lookup(self):
+        """Retorna o mapeamento código CID-10 -> id do CID"""
+        return self.load_lookup(TABLE_CID10, 'code', text=True)
+
+    def load_hospital_lookup(self):
+        """Retorna o mapeamento hospital_code -> id do hospital"""
+        return self.load_lookup(TABLE_HOSPITAIS, 'hospital_code', text=True)
+
+    def load_row_hashes(self, spec, keys):
+        """
+        Hashes de conteúdo gravados na última importação para as chaves naturais de
+        um lote, consultados pela chave primária de import_row_hashes em grupos de
+        DELTA_HASH_LOOKUP_KEYS chaves
+
+        Args:
+            spec (TableSpec): Tabela de destino
+            keys (list): Chaves naturais do lote (texto)
+
+        Returns:
+            dict: Chave natural -> hash, só das chaves já importadas
+        """
+        hashes = {}
+        with self.metrics.timed(PHASE_LOOKUP), self.connection.cursor() as cursor:
+            for start in range(0, len(keys), DELTA_HASH_LOOKUP_KEYS):
+                chunk = keys[start:start + DELTA_HASH_LOOKUP_KEYS]
+                placeholders = ', '.join(['%s'] * len(chunk))
+                cursor.execute(
+                    f"SELECT natural_key, row_hash FROM import_row_hashes "
+                    f"WHERE table_name = %s AND natural_key IN ({placeholders})",
+                    (spec.table, *chunk)
+                )
+                hashes.update((row['natural_key'], row['row_hash']) for row in cursor.fetchall())
+        return hashes
+
+    def load_row_regions(self, spec, keys):
+        """Valores atuais da coluna da cidade das linhas com as chaves naturais informadas"""
+        placeholders = ', '.join(['%s'] * len(keys))
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT {spec.region_column} AS region FROM {spec.table} "
+                f"WHERE {spec.key_column} IN ({placeholders})",
+                tuple(str(key) for key in keys)
+            )
+            return [row['region'] for row in cursor.fetchall()]
+
+    def count_row_hashes(self, spec):
+        """Número de linhas da tabela com hash gravado pela importação anterior"""
+        with self.connection.cursor() as cursor:
+            cursor.execute("SELECT COUNT(*) AS total FROM import_row_hashes WHERE table_name = %s", (spec.table,))
+            return cursor.fetchone()['total']
+
     def execute_query(self, query, params=None):
         """
         Executa uma query no banco de dados
@@ -87,45 +547,264 @@ class DatabaseImporter:
         try:
             with self.connection.cursor() as cursor:
                 cursor.execute(query, params)
-                self.connection.commit()
-                return True
+            self.batch_done()
+            return True
         except Exception as e:
             self.connection.rollback()
             sys.exit(1)
+
+    def batch_done(self):
+        """Conta um lote gravado e faz o commit a cada self.commit_every lotes"""
+        self.pending_batches += 1
+        if self.commit_every and self.pending_batches >= self.commit_every:
+            self.commit()
+
+    def commit(self):
+        """Confirma os lotes pendentes (usado ao fim de cada tabela com commit_every > 1 ou 0)"""
+        if self.pending_batches:
+            with self.metrics.timed(PHASE_DB):
+                self.connection.commit()
+            self.pending_batches = 0
     
-    def execute_batch(self, query, data_list, batch_size=100):
+    def max_statement_bytes(self):
         """
-        Executa inserções em lotes
-        
+        Tamanho máximo de um INSERT multi-linha: MAX_STATEMENT_BYTES, limitado
+        pelo max_allowed_packet do servidor (consultado uma vez por conexão)
+        """
+        if self.statement_bytes is None:
+            limit = min(MAX_STATEMENT_BYTES, MAX_ALLOWED_PACKET)
+            with self.connection.cursor() as cursor:
+                cursor.execute("SELECT @@max_allowed_packet AS max_allowed_packet")
+                row = cursor.fetchone()
+            if row and row['max_allowed_packet']:
+                # Margem para o cabeçalho do pacote e a cláusula ON DUPLICATE KEY UPDATE
+                limit = min(limit, int(row['max_allowed_packet']) - 16 * 1024)
+            self.statement_bytes = limit
+        return self.statement_bytes
+
+    def iter_value_statements(self, spec, rows, sizer):
+        """
+        Monta os INSERT ... VALUES (...),(...) ON DUPLICATE KEY UPDATE das linhas, cada
+        um com até sizer.size linhas (lido a cada statement) e max_statement_bytes() bytes
+
         Args:
-            query (str): Query SQL de inserção
-            data_list (list): Lista de dados para inserir
-            batch_size (int): Tamanho do lote
-            
+            spec (TableSpec): Tabela de destino
+            rows (list | RowBatch): Tuplas na ordem de spec.columns ou lote em colunas
+            sizer (AdaptiveBatchSizer): Escolhe o número de linhas por statement
+
+        Yields:
+            tuple: (SQL do statement, número de linhas, se foi limitado pelos bytes)
+        """
+        max_bytes = self.max_statement_bytes()
+        prefix = spec.insert_prefix()
+        suffix = '\n' + spec.update_clause()
+        base_bytes = len(prefix.encode('utf-8')) + len(suffix.encode('utf-8'))
+        escape = self.connection.escape
+
+        values = []
+        statement_bytes = base_bytes
+        for literal in spec.values_literals(rows, escape):
+            literal_bytes = len(literal.encode('utf-8')) + 2
+            full_by_bytes = statement_bytes + literal_bytes > max_bytes
+            if values and (full_by_bytes or len(values) >= sizer.size):
+                yield prefix + ',\n'.join(values) + suffix, len(values), full_by_bytes
+                values = []
+                statement_bytes = base_bytes
+            values.append(literal)
+            statement_bytes += literal_bytes
+
+        if values:
+            yield prefix + ',\n'.join(values) + suffix, len(values), False
+
+    def execute_values(self, spec, rows, sizer):
+        """
+        Grava as linhas com INSERT ... VALUES (...),(...) ON DUPLICATE KEY UPDATE,
+        montando cada statement com até sizer.size linhas e max_statement_bytes() bytes
+
+        Args:
+            spec (TableSpec): Tabela de destino
+            rows (list | RowBatch): Tuplas na ordem de spec.columns ou lote em colunas
+            sizer (AdaptiveBatchSizer): Escolhe o número de linhas por statement
+
         Returns:
-            int: Número de registros inseridos
+            int: Número de registros gravados
         """
-        inserted_count = 0
-        
+        written_count = 0
+
+        try:
+            for statement, count, limited_by_bytes in self.iter_value_statements(spec, rows, sizer):
+                started_at = time.perf_counter()
+                with self.connection.cursor() as cursor:
+                    affected = cursor.execute(statement)
+                seconds = time.perf_counter() - started_at
+                self.metrics.record_statement(spec.table, count, affected, seconds)
+                self.batch_done()
+                sizer.record(count, seconds, limited_by_bytes)
+                written_count += count
+        except Exception as e:
+            logging.error(f"Erro no INSERT multi-linha de {spec.table}: {e}")
+            if self.connection:
+                self.connection.rollback()
+            sys.exit(1)
+
+        return written_count
+
+    def open_writer(self, spec, batch_size=None):
+        """
+        Cria o gravador de linhas conforme o modo de carga
+
+        Args:
+            spec (TableSpec): Tabela de destino
+            batch_size (int): Linhas do primeiro INSERT multi-linha (None = BATCH_SIZE);
+                no modo pipeline, linhas por lote da fila (None = cada write() é um lote)
+
+        Returns:
+            BatchWriter: Gravador a ser usado como context manager
+        """
+        # Na carga com --shadow as tabelas do grupo são gravadas nas sombras, vazias, sem upsert
+        if self.table_name(spec.table) != spec.table:
+            spec = spec.insert_only(self.table_name(spec.table))
+
+        # O mapeamento carregado antes da gravação deixaria de valer
+        self.lookups.invalidate(spec.table)
+
+        if self.pipeline_writers > 0:
+            writer = PipelinedWriter(
+                self, spec, batch_size, writers=self.pipeline_writers, queue_size=self.pipeline_queue_size
+            )
+        elif self.async_batches > 0:
+            writer = AsyncBatchWriter(self, spec, batch_size, in_flight=self.async_batches)
+        elif self.load_mode == LOAD_MODE_BULK:
+            writer = BulkLoadWriter(self, spec)
+        else:
+            writer = BatchWriter(self, spec, batch_size)
+
+        # No modo delta, linhas com o mesmo hash de conteúdo da última importação não são enviadas
+        if self.delta and spec.key_column:
+            return DeltaWriter(self, writer, spec)
+        return writer
+
+    def bulk_load(self, spec, tsv_path):
+        """
+        Carrega um arquivo TSV em uma tabela de staging com LOAD DATA LOCAL INFILE
+        e aplica um único upsert baseado em conjunto na tabela de destino
+
+        Args:
+            spec (TableSpec): Tabela de destino
+            tsv_path (str): Caminho do arquivo TSV
+
+        Returns:
+            int: Número de linhas carregadas na staging
+        """
+        staging_table = f"{spec.table}_staging"
+
         try:
+            started_at = time.perf_counter()
             with self.connection.cursor() as cursor:
-                for i in range(0, len(data_list), batch_size):
-                    batch = data_list[i:i + batch_size]
-                    cursor.executemany(query, batch)
-                    self.connection.commit()
-                    inserted_count += len(batch)
-                    
-                    # Libera a referência do batch para economia de memória
-                    del batch
+                cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS {staging_table}")
+                cursor.execute(spec.create_staging_query(staging_table))
+                loaded_count = cursor.execute(spec.load_data_query(staging_table), (tsv_path,))
+                affected = cursor.execute(spec.upsert_from_staging_query(staging_table))
+                cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS {staging_table}")
+            self.connection.commit()
+            self.metrics.record_statement(spec.table, loaded_count, affected, time.perf_counter() - started_at)
         except Exception as e:
-            logging.error(f"Erro no execute_batch: {e}")
+            logging.error(f"Erro no bulk_load de {spec.table}: {e}")
             if self.connection:
                 self.connection.rollback()
             sys.exit(1)
-            
-        return inserted_count
-    
-    def import_estados_csv(self, csv_file_path, batch_size=50):
+
+        return loaded_count
+
+    def iter_csv_chunks(self, csv_file_path, dtypes, skip=0):
+        """
+        Blocos do CSV a partir da linha skip: do cache de origens se o arquivo não
+        mudou, senão do read_csv em blocos de self.csv_chunk_size linhas (lidos desde
+        o início, os blocos são gravados no cache)
+
+        Yields:
+            DataFrame: Bloco com as colunas do CSV
+        """
+        name = os.path.basename(csv_file_path)
+        table = self.source_cache.table(csv_file_path, name)
+        if table is not None:
+            yield from table.iter_frames(skip)
+            return
+
+        builder = None if skip else self.source_cache.builder(csv_file_path, name)
+        try:
+            with pd.read_csv(
+                csv_file_path, encoding='utf-8', dtype=dtypes, chunksize=self.csv_chunk_size,
+                skiprows=range(1, skip + 1) if skip else None
+            ) as reader:
+                part = builder.part_writer() if builder else None
+                for chunk in reader:
+                    if part:
+                        part.write_frame(chunk)
+                    yield chunk
+            if builder:
+                part.close()
+                builder.commit()
+        finally:
+            if builder:
+                builder.discard()
+
+    def import_csv_chunks(self, csv_file_path, dtypes, spec, transform, batch_size=None):
+        """
+        Lê um CSV em blocos de self.csv_chunk_size linhas; cada bloco é transformado
+        e gravado antes do próximo ser lido, mantendo a memória constante
+
+        Args:
+            csv_file_path (str): Caminho para o arquivo CSV
+            dtypes (dict): Tipos das colunas para o read_csv
+            spec (TableSpec): Tabela de destino
+            transform (callable): Recebe o bloco (DataFrame) e retorna as linhas (tuplas ou RowBatch),
+                ou (linhas, linhas ignoradas)
+            batch_size (int): Linhas do primeiro INSERT (None = BATCH_SIZE, depois ajustado)
+
+        Returns:
+            int: Número de registros importados
+        """
+        skipped_count = 0
+
+        # hospitais.csv alimenta duas tabelas, por isso a chave inclui a tabela de destino
+        checkpoint_key = f"{os.path.basename(csv_file_path)}-{spec.table}"
+        checkpoint = self.start_checkpoint(checkpoint_key, csv_file_path)
+        if checkpoint and checkpoint['completed']:
+            return 0
+        records = checkpoint['records'] if checkpoint else 0
+        # Total de hashes antes da gravação, para contar as chaves ausentes da origem
+        known_hashes = self.count_row_hashes(spec) if self.delta and spec.key_column else 0
+
+        chunks = self.iter_csv_chunks(csv_file_path, dtypes, records)
+        with self.open_writer(spec, batch_size) as writer:
+            while True:
+                with self.metrics.timed(PHASE_PARSE):
+                    chunk = next(chunks, None)
+                if chunk is None:
+                    break
+
+                with self.metrics.timed(PHASE_TRANSFORM):
+                    result = transform(chunk)
+                data_list, skipped = result if isinstance(result, tuple) else (result, 0)
+                skipped_count += skipped
+                self.metrics.count(ROWS_PARSED, len(chunk))
+                self.metrics.count(ROWS_REJECTED, skipped)
+                writer.write(data_list)
+
+                records += len(chunk)
+                if writer.commits_on_write:
+                    self.checkpoints.save(checkpoint_key, csv_file_path, records)
+
+        self.checkpoints.save(checkpoint_key, csv_file_path, records, completed=True)
+
+        if isinstance(writer, DeltaWriter):
+            log_delta_report(spec.table, dict(writer.summary(), known=known_hashes), complete=checkpoint is None)
+        if skipped_count:
+            logging.info(f"{spec.table}: {skipped_count} linhas ignoradas")
+        return writer.count
+
+    def import_estados_csv(self, csv_file_path, batch_size=None):
         """
         Importa dados do arquivo estados.csv
         
@@ -134,615 +813,1255 @@ class DatabaseImporter:
         
         Args:
             csv_file_path (str): Caminho para o arquivo CSV
-            batch_size (int): Tamanho do lote para inserção
+            batch_size (int): Linhas do primeiro INSERT (None = BATCH_SIZE, depois ajustado)
             
         Returns:
             int: Número de registros importados
         """
         try:
-            df = pd.read_csv(csv_file_path, encoding='utf-8')
-            
-            data_list = []
             current_time = datetime.now()
             
-            for _, row in df.iterrows():
-                # Create the POINT WKT string directly with the coordinates
-                point_wkt = f"POINT({float(row['longitude'])} {float(row['latitude'])})"
-                
-                data_tuple = (
-                    int(row['codigo_uf']),  
-                    row['uf'],              
-                    row['nome'],            
-                    float(row['latitude']),  
-                    float(row['longitude']), 
-                    row['regiao'],          
-                    current_time,
-                    point_wkt,  # Para o INSERT
-                    current_time,
-                    point_wkt   # Para o UPDATE            
-                )
-                data_list.append(data_tuple)
-
-            # Query de inserção com ON DUPLICATE KEY UPDATE - corrigida
-            insert_query = """
-                INSERT INTO states (codigo_uf, uf, name, latitude, longitude, region, created_at, location, updated_at)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, ST_GeomFromText(%s), %s)
-                ON DUPLICATE KEY UPDATE
-                    uf = VALUES(uf),
-                    name = VALUES(name),
-                    latitude = VALUES(latitude),
-                    longitude = VALUES(longitude),
-                    region = VALUES(region),
-                    location = ST_GeomFromText(%s),
-                    updated_at = VALUES(updated_at)
-            """
-            
-            # Executa a inserção em lotes
-            inserted_count = self.execute_batch(insert_query, data_list, batch_size)
-            
-            return inserted_count
+            # Conversão vetorizada por bloco, incluindo o WKT POINT(lon lat)
+            return self.import_csv_chunks(
+                csv_file_path, ESTADOS_DTYPES, ESTADOS_SPEC,
+                lambda chunk: transform_estados(chunk, current_time), batch_size
+            )
             
         except Exception as e:
             logging.error(f"Erro ao importar estados: {e}")
             sys.exit(1)
     
-    def import_hospitais_csv(self, csv_file_path, batch_size=100):
+    def import_hospitais_csv(self, csv_file_path, batch_size=None):
         """
         Importa dados do arquivo hospitais.csv
         
         Args:
             csv_file_path (str): Caminho para o arquivo CSV
-            batch_size (int): Tamanho do lote para inserção
+            batch_size (int): Linhas do primeiro INSERT (None = BATCH_SIZE, depois ajustado)
             
         Returns:
             int: Número de registros importados
         """
         try:
-            # Lê o arquivo CSV
-            df = pd.read_csv(csv_file_path, encoding='utf-8')
-            
             # Cria mapeamento de código IBGE para ID da cidade
-            with self.connection.cursor() as cursor:
-                cursor.execute("SELECT id, city_code FROM cities")
-                city_mapping = {row['city_code']: row['id'] for row in cursor.fetchall()}
-            
-            
-            # Mapeia os dados (estrutura pode variar - ajustar conforme necessário)
-            data_list = []
+            city_lookup = self.load_city_lookup()
             current_time = datetime.now()
-            skipped_count = 0
-            
-            for _, row in df.iterrows():
-                cidade_ibge = int(row['cidade'])
-                city_id = city_mapping.get(cidade_ibge)
-                
-                if city_id is None:
-                    skipped_count += 1
-                    continue
-                
-                data_tuple = (
-                    row['codigo'],           
-                    row['nome'],            
-                    city_id,                # Usa o ID da cidade, não o código IBGE
-                    row['bairro'],          
-                    int(row['leitos_totais']), 
-                    current_time,           
-                    current_time            
-                )
-                data_list.append(data_tuple)
             
-            
-            # Query de inserção (ajustar nome da tabela e campos conforme necessário)
-            
-            insert_query = """
-                INSERT INTO hospitals (hospital_code, name, city, neighborhood, total_beds, created_at, updated_at)
-                VALUES (%s, %s, %s, %s, %s, %s, %s)
-                ON DUPLICATE KEY UPDATE
-                    name = VALUES(name),
-                    city = VALUES(city),
-                    neighborhood = VALUES(neighborhood),
-                    total_beds = VALUES(total_beds),
-                    updated_at = VALUES(updated_at)
-            """
-            
-            inserted_count = self.execute_batch(insert_query, data_list, batch_size)
-            
-            return inserted_count
+            # Usa o ID da cidade, não o código IBGE (hospitais sem cidade cadastrada são ignorados)
+            return self.import_csv_chunks(
+                csv_file_path, HOSPITAIS_DTYPES, HOSPITAIS_SPEC,
+                lambda chunk: transform_hospitais(chunk, city_lookup, current_time), batch_size
+            )
             
         except Exception as e:
             sys.exit(1)
     
-    def import_hospital_specialties(self, csv_file_path, batch_size=100):
+    def import_hospital_specialties(self, csv_file_path, batch_size=None):
         """
         Importa especialidades dos hospitais para a tabela specialties
         
         Args:
             csv_file_path (str): Caminho para o arquivo CSV dos hospitais
-            batch_size (int): Tamanho do lote para inserção
+            batch_size (int): Linhas do primeiro INSERT (None = BATCH_SIZE, depois ajustado)
             
         Returns:
             int: Número de especialidades importadas
         """
         try:
-            # Lê o arquivo CSV dos hospitais
-            df = pd.read_csv(csv_file_path, encoding='utf-8')
-            
             # Cria mapeamento de código do hospital para ID do hospital
-            with self.connection.cursor() as cursor:
-                cursor.execute("SELECT id, hospital_code FROM hospitals")
-                hospital_mapping = {row['hospital_code']: row['id'] for row in cursor.fetchall()}
-            
-            
-            specialties_data = []
+            hospital_lookup = self.load_hospital_lookup()
             current_time = datetime.now()
-            skipped_hospitals = 0
-            
-            for _, row in df.iterrows():
-                hospital_code = row['codigo']
-                hospital_id = hospital_mapping.get(hospital_code)
-                
-                if hospital_id is None:
-                    skipped_hospitals += 1
-                    continue
-                
-                # Processa as especialidades (separadas por ;)
-                especialidades_str = str(row['especialidades']).strip()
-                if especialidades_str and especialidades_str != 'nan':
-                    especialidades_list = [esp.strip() for esp in especialidades_str.split(';') if esp.strip()]
-                    
-                    for especialidade in especialidades_list:
-                        specialty_tuple = (
-                            hospital_id,
-                            especialidade,
-                            current_time,
-                            current_time
-                        )
-                        specialties_data.append(specialty_tuple)
-            
-            
-            if not specialties_data:
-                return 0
-            
-            # Query de inserção para especialidades
-            insert_query = """
-                INSERT INTO specialties (hospital_id, name, created_at, updated_at)
-                VALUES (%s, %s, %s, %s)
-                ON DUPLICATE KEY UPDATE
-                    name = VALUES(name),
-                    updated_at = VALUES(updated_at)
-            """
             
-            inserted_count = self.execute_batch(insert_query, specialties_data, batch_size)
-            
-            return inserted_count
+            # Processa as especialidades (separadas por ;)
+            return self.import_csv_chunks(
+                csv_file_path, HOSPITAIS_DTYPES, ESPECIALIDADES_SPEC,
+                lambda chunk: transform_hospital_specialties(chunk, hospital_lookup, current_time), batch_size
+            )
             
         except Exception as e:
             sys.exit(1)
     
+    def import_patient_records(self, records_iter, checkpoint_key, source_path, city_lookup, cid_lookup, batch_size,
+                               cache_part=None, duplicates=None):
+        """
+        Converte e grava os registros <Paciente> de uma fonte (arquivo inteiro ou faixa),
+        gravando um checkpoint a cada lote confirmado no banco
+
+        Com self.validate, cada registro passa pelo PatientValidator antes de entrar
+        no lote e cada lote é deduplicado por codigo e CPF; os rejeitados vão para
+        reject_dir/<checkpoint_key>.csv.
+
+        Com self.sort_patients, os registros passam por uma ordenação externa por
+        codigo antes da gravação: lotes consecutivos cobrem faixas vizinhas da chave
+        única, e cada commit grava páginas próximas do índice em vez de páginas
+        espalhadas. O cache de origens recebe os registros na ordem do arquivo.
+
+        Args:
+            records_iter (iterator): Campos de cada <Paciente> na ordem de PATIENT_FIELDS
+                (do backend de parsing ou do cache de origens)
+            checkpoint_key (str): Chave do checkpoint da fonte
+            source_path (str): Arquivo de origem (para a impressão digital do checkpoint)
+            city_lookup (SortedLookup): city_code -> id da cidade
+            cid_lookup (SortedLookup): código CID-10 -> id do CID
+            batch_size (int): Registros por lote lido; cada lote é gravado e gera um checkpoint
+            cache_part (PartWriter): Recebe todos os registros lidos para o cache de origens
+                (marcado como completo só se a fonte for lida até o fim)
+            duplicates (ndarray): Resultado de find_duplicates para a faixa (None = deduplicação
+                só dentro da fonte)
+
+        Returns:
+            dict: Registros lidos, inseridos e ignorados, se a fonte foi retomada
+                e as contagens do delta (None fora do modo delta)
+        """
+        # A ordem dos registros muda com a ordenação, então os checkpoints são outros
+        if self.sort_patients:
+            checkpoint_key = f"{checkpoint_key}-ordenado"
+        checkpoint = self.start_checkpoint(checkpoint_key, source_path)
+        if checkpoint and checkpoint['completed']:
+            return {'parsed': 0, 'inserted': 0, 'skipped': 0, 'resumed': True, 'delta': None}
+
+        # Registros já confirmados são apenas lidos e descartados, sem ida ao banco
+        resume_after = checkpoint['records'] if checkpoint else 0
+        current_time = datetime.now()
+        records = 0
+        skipped_count = 0
+        sent_count = 0
+        fields_list = []
+
+        validator = None
+        if self.validate:
+            validator = PatientValidator(
+                os.path.join(self.reject_dir, f"{checkpoint_key}.csv"), append=checkpoint is not None,
+                duplicates=duplicates
+            )
+
+        if cache_part:
+            records_iter = _tee_records(records_iter, cache_part)
+        if self.sort_patients:
+            records_iter = sorted_records(records_iter, CollationKey(0, checkpoint_key), label=checkpoint_key)
+
+        def build_batch(reject=True):
+            """Colunas do lote (cidades e CIDs resolvidos de uma vez, sem chaves repetidas)"""
+            data_list, accepted = build_patient_rows(fields_list, city_lookup, cid_lookup, current_time)
+            if validator:
+                accepted_fields = []
+                for fields, ok in zip(fields_list, accepted.tolist()):
+                    if ok:
+                        accepted_fields.append(fields)
+                    elif reject:
+                        validator.reject(fields, REJECT_CITY)
+                keep = validator.unique(accepted_fields, reject).tolist()
+                data_list = data_list.select(keep)
+            return data_list, len(fields_list) - len(data_list)
+
+        # As métricas recebem as contagens a cada lote, acompanhando a etapa em andamento
+        counted_records = resume_after
+        counted_skipped = 0
+
+        def log_progress():
+            """Soma às métricas os registros lidos e rejeitados desde o lote anterior e registra o progresso"""
+            nonlocal counted_records, counted_skipped
+            self.metrics.count(ROWS_PARSED, records - counted_records)
+            self.metrics.count(ROWS_REJECTED, skipped_count - counted_skipped)
+            counted_records, counted_skipped = records, skipped_count
+            logging.info(
+                f"{checkpoint_key}: {sent_count} registros enviados "
+                f"({records - resume_after} lidos, {skipped_count} ignorados)"
+            )
+
+        try:
+            with self.open_writer(PACIENTES_SPEC) as writer:
+                # Leitura e validação são medidas por lote: o tempo desde o fim do lote anterior
+                batch_started_at = time.perf_counter()
+                for fields in records_iter:
+                    records += 1
+                    if records <= resume_after:
+                        if records == resume_after and fields[0] != checkpoint['last_key']:
+                            logging.warning(
+                                f"{checkpoint_key}: registro {records} é {fields[0]}, "
+                                f"checkpoint esperava {checkpoint['last_key']}"
+                            )
+                        # As chaves dos registros já confirmados continuam valendo para a deduplicação
+                        if validator:
+                            if validator.check(fields) is None:
+                                fields_list.append(fields)
+                            if len(fields_list) >= batch_size or records == resume_after:
+                                build_batch(reject=False)
+                                fields_list = []
+                        continue
+
+                    # Campos inválidos são rejeitados antes de entrar no lote
+                    reason = validator.check(fields) if validator else None
+                    if reason:
+                        validator.reject(fields, reason)
+                        skipped_count += 1
+                        continue
+
+                    fields_list.append(fields)
+
+                    # Processa em lotes; registros de cidade desconhecida ou repetidos são ignorados
+                    if len(fields_list) >= batch_size:
+                        self.metrics.add_time(PHASE_PARSE, time.perf_counter() - batch_started_at)
+                        with self.metrics.timed(PHASE_TRANSFORM):
+                            data_list, skipped = build_batch()
+                        skipped_count += skipped
+                        writer.write(data_list)
+                        sent_count += len(data_list)
+                        if writer.commits_on_write:
+                            self.checkpoints.save(checkpoint_key, source_path, records, last_key=fields[0])
+                        log_progress()
+
+                        # Nova lista para o próximo lote (a anterior pertence ao gravador)
+                        fields_list = []
+                        batch_started_at = time.perf_counter()
+
+                # Processa dados restantes
+                self.metrics.add_time(PHASE_PARSE, time.perf_counter() - batch_started_at)
+                if fields_list:
+                    with self.metrics.timed(PHASE_TRANSFORM):
+                        data_list, skipped = build_batch()
+                    skipped_count += skipped
+                    writer.write(data_list)
+                    sent_count += len(data_list)
+                    log_progress()
+                    fields_list = []
+
+                if cache_part:
+                    cache_part.close()
+        finally:
+            if validator:
+                validator.close()
+            self.metrics.count(ROWS_PARSED, records - counted_records)
+            self.metrics.count(ROWS_REJECTED, skipped_count - counted_skipped)
+
+        self.checkpoints.save(checkpoint_key, source_path, records, completed=True)
+
+        return {
+            'parsed': records - resume_after,
+            'inserted': writer.count,
+            'skipped': skipped_count,
+            'resumed': checkpoint is not None,
+            'delta': writer.summary() if isinstance(writer, DeltaWriter) else None
+        }
+
     def import_xml_data(self, xml_file_path, batch_size=10000):
         """
         Importa dados de arquivo XML (pacientes.xml) em modo iterativo para arquivos grandes.
-        Versão otimizada com gestão avançada de memória.
+
+        Os registros são lidos pelo backend de parsing configurado (self.xml_parser),
+        que já descarta os elementos processados; não há chamadas explícitas ao gc.
+        Com resume, os registros confirmados em uma execução anterior são pulados.
         """
-        import gc
-        
-        # Variáveis de controle de recursos
-        context = None
-        root = None
-        city_mapping = None
-        cid_mapping = None
-        data_list = []
-        
         try:
             # Carrega mapeamentos antes do processamento
-            with self.connection.cursor() as cursor:
-                cursor.execute("SELECT id, city_code FROM cities")
-                city_mapping = {row['city_code']: row['id'] for row in cursor.fetchall()}
-            
-            with self.connection.cursor() as cursor:
-                cursor.execute("SELECT id, code FROM cids")
-                cid_mapping = {row['code']: row['id'] for row in cursor.fetchall()}
-            
-            # Parsing XML iterativo com gestão de memória
-            context = ET.iterparse(xml_file_path, events=('start', 'end'))
-            context = iter(context)
-            event, root = next(context)  # Pega o elemento root
+            city_lookup = self.load_city_lookup()
+            cid_lookup = self.load_cid_lookup()
+            known_hashes = self.count_row_hashes(PACIENTES_SPEC) if self.delta else 0
             
-            current_time = datetime.now()
-            inserted_count = 0
-            skipped_count = 0
-            
-            # Query preparada uma única vez
-            insert_query = """
-                INSERT INTO patients
-                (codigo, cpf, full_name, gender, city, neighborhood, has_insurance, cid_id, created_at, updated_at)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                ON DUPLICATE KEY UPDATE
-                    cpf=VALUES(cpf),
-                    full_name=VALUES(full_name),
-                    gender=VALUES(gender),
-                    city=VALUES(city),
-                    neighborhood=VALUES(neighborhood),
-                    has_insurance=VALUES(has_insurance),
-                    cid_id=VALUES(cid_id),
-                    updated_at=VALUES(updated_at)
-            """
-
-            for event, elem in context:
-                if event == 'end' and elem.tag == 'Paciente':
-                    # Extrai os campos do XML de forma otimizada
-                    codigo = elem.findtext('Codigo', '').strip()
-                    cpf = elem.findtext('CPF', '').strip()
-                    nome = elem.findtext('Nome_Completo', '').strip()
-                    genero = elem.findtext('Genero', '').strip()
-                    cod_municipio = elem.findtext('Cod_municipio', '').strip()
-                    bairro = elem.findtext('Bairro', '').strip()
-                    convenio = elem.findtext('Convenio', '').strip()
-                    cid10_code = elem.findtext('CID-10', '').strip()
-
-                    # Validações básicas
-                    if not codigo or not cpf or not nome:
-                        skipped_count += 1
-                        elem.clear()
-                        # Limpa root periodicamente para evitar acúmulo
-                        if skipped_count % 1000 == 0:
-                            root.clear()
-                        continue
-
-                    # Converte convênio
-                    has_insurance = 1 if convenio.upper() == 'SIM' else 0
-                    
-                    # Busca ID da cidade
-                    city_id = None
-                    if cod_municipio.isdigit():
-                        city_code = int(cod_municipio)
-                        city_id = city_mapping.get(city_code)
-                        if not city_id:
-                            continue
-                    
-                    # Busca ID do CID-10
-                    cid_id = None
-                    if cid10_code:
-                        cid_id = cid_mapping.get(cid10_code)
-                        cid_id = cid_mapping.get('R69') if cid_id is None else cid_id
-
-                    data_tuple = (
-                        codigo, cpf, nome, genero, city_id, bairro,
-                        has_insurance, cid_id, current_time, current_time
-                    )
-                    data_list.append(data_tuple)
-                    
-                    # Limpeza imediata do elemento XML
-                    elem.clear()
-                    
-                    # Limpeza agressiva do root a cada 100 elementos processados
-                    if len(data_list) % 100 == 0:
-                        root.clear()
-                        # Força garbage collection a cada 1000 elementos
-                        if len(data_list) % 1000 == 0:
-                            gc.collect()
-                    
-                    # Processa em lotes
-                    if len(data_list) >= batch_size:
-                        try:
-                            batch_inserted = self.execute_batch(insert_query, data_list, batch_size)
-                            inserted_count += batch_inserted
-                            
-                            print(f"Registros importados: {inserted_count}")
-                            
-                            # Limpeza agressiva da lista
-                            data_list.clear()
-                            del data_list[:]  # Força limpeza da lista
-                            data_list = []    # Recria lista vazia
-                            
-                            # Força garbage collection após cada batch
-                            gc.collect()
-                            self.log_memory_cleanup(f"Batch {inserted_count//batch_size}")
-                            
-                            # Limpeza periódica do root XML
-                            root.clear()
-                            
-                        except Exception as batch_error:
-                            print(f"Erro no batch: {batch_error}")
-                            # Limpa dados e continua
-                            data_list.clear()
-                            data_list = []
-                            gc.collect()
-
-            # Processa dados restantes
-            if data_list:
-                try:
-                    batch_inserted = self.execute_batch(insert_query, data_list, len(data_list))
-                    inserted_count += batch_inserted
-                    print(f"Batch final: {batch_inserted} registros")
-                except Exception as final_error:
-                    print(f"Erro no batch final: {final_error}")
-                finally:
-                    # Limpeza dos dados finais
-                    data_list.clear()
-                    del data_list
-                    data_list = []
+            # Registros do cache de origens ou do backend de parsing (gravados no cache)
+            name = os.path.basename(xml_file_path)
+            table = self.source_cache.table(xml_file_path, name)
+            builder = None if table else self.source_cache.builder(xml_file_path, name)
+            try:
+                result = self.import_patient_records(
+                    table.iter_records() if table else iter_patient_records(xml_file_path, self.xml_parser),
+                    name, xml_file_path, city_lookup, cid_lookup, batch_size,
+                    cache_part=builder.part_writer(0, PATIENT_FIELDS) if builder else None
+                )
+                if builder:
+                    builder.commit()
+            finally:
+                if builder:
+                    builder.discard()
+            inserted_count = result['inserted']
+            skipped_count = result['skipped']
+            if result['delta']:
+                log_delta_report(
+                    PACIENTES_SPEC.table, dict(result['delta'], known=known_hashes), complete=not result['resumed']
+                )
             
-            print(f"Importação concluída: {inserted_count} inseridos, {skipped_count} ignorados")
+            logging.info(f"{name}: importação concluída, {inserted_count} inseridos, {skipped_count} ignorados")
             return inserted_count
             
-        except ET.ParseError as e:
-            print(f"Erro de parsing XML: {e}")
+        except (ET.ParseError, expat.ExpatError) as e:
+            logging.error(f"Erro de parsing XML em {xml_file_path}: {e}")
             raise
         except Exception as e:
-            print(f"Erro durante importação: {e}")
+            logging.error(f"Erro durante a importação de {xml_file_path}: {e}")
             raise
-        finally:
-            # Limpeza garantida de todos os recursos
+
+    def import_xml_data_parallel(self, xml_file_path, workers=XML_WORKERS, batch_size=10000):
+        """
+        Importa o pacientes.xml em paralelo: o arquivo é dividido em faixas de bytes
+        alinhadas em <Paciente> e cada faixa é processada por um processo com
+        conexão própria ao banco
+
+        Args:
+            xml_file_path (str): Caminho para o pacientes.xml
+            workers (int): Número de processos trabalhadores
+            batch_size (int): Registros por lote lido em cada trabalhador
+
+        Returns:
+            int: Número de registros importados
+        """
+        if workers <= 1:
+            return self.import_xml_data(xml_file_path, batch_size)
+
+        started_at = time.perf_counter()
+
+        # Mapeamentos carregados uma vez; os trabalhadores os abrem com mmap
+        lookup_dir = tempfile.TemporaryDirectory(prefix='import_lookups_')
+        city_lookup = self.load_city_lookup().share(lookup_dir.name, 'cities')
+        cid_lookup = self.load_cid_lookup().share(lookup_dir.name, 'cids')
+
+        # Cada processo consulta os hashes das chaves de cada lote; o total anterior é lido aqui
+        known_hashes = self.count_row_hashes(PACIENTES_SPEC) if self.delta else 0
+
+        # Com o XML no cache de origens, as faixas são de registros da tabela colunar;
+        # senão são de bytes do XML, e cada processo grava os seus registros no cache
+        name = os.path.basename(xml_file_path)
+        table = self.source_cache.table(xml_file_path, name)
+        builder = None
+        if table:
+            shards = table.row_ranges(workers)
+            logging.info(f"{name} (cache) dividido em {len(shards)} faixas de registros para {workers} processos")
+        else:
+            builder = self.source_cache.builder(xml_file_path, name)
+            shards = find_shard_ranges(xml_file_path, workers)
+            logging.info(f"{name} dividido em {len(shards)} faixas para {workers} processos")
+
+        results = []
+        duplicates = [None] * len(shards)
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_xml_worker,
+            initargs=(
+                self.connection_config(), city_lookup, cid_lookup, table, builder.directory if builder else None
+            )
+        ) as executor:
+            futures = []
             try:
-                # Limpa lista de dados
-                if 'data_list' in locals() and data_list:
-                    data_list.clear()
-                    del data_list
-                
-                # Limpa mapeamentos da memória
-                if city_mapping is not None:
-                    city_mapping.clear()
-                    del city_mapping
-                    
-                if cid_mapping is not None:
-                    cid_mapping.clear()
-                    del cid_mapping
-                
-                # Limpa XML da memória
-                if root is not None:
-                    root.clear()
-                    for elem in root.iter():
-                        elem.clear()
-                    del root
-                
-                if context is not None:
-                    del context
-                
-                # Força garbage collection agressivo final
-                for _ in range(3):
-                    gc.collect()
-                    
-                self.log_memory_cleanup("Finalização import_xml_data")
-                
-            except Exception as cleanup_error:
-                print(f"Aviso - erro na limpeza final: {cleanup_error}")
-                # Força GC mesmo com erro na limpeza
+                # Um codigo ou CPF pode se repetir em faixas diferentes: as chaves de todas as
+                # faixas são lidas antes e deduplicadas aqui, na ordem do arquivo
+                if self.validate:
+                    key_started_at = time.perf_counter()
+                    futures = [
+                        executor.submit(_collect_shard_keys, index, xml_file_path, start, end)
+                        for index, (start, end) in enumerate(shards)
+                    ]
+                    shard_keys = [future.result()[1:] for future in futures]
+                    duplicates = find_duplicates(shard_keys)
+                    del shard_keys
+                    logging.info(
+                        f"{name}: chaves das {len(shards)} faixas deduplicadas em "
+                        f"{time.perf_counter() - key_started_at:.1f}s"
+                    )
+
+                futures = [
+                    executor.submit(
+                        _import_xml_shard, index, xml_file_path, start, end, batch_size, duplicates[index]
+                    )
+                    for index, (start, end) in enumerate(shards)
+                ]
+                for future in futures:
+                    result = future.result()
+                    results.append(result)
+                    self.metrics.merge(result['metrics'])
+                    rate = result['inserted'] / result['seconds'] if result['seconds'] else 0
+                    logging.info(
+                        f"Faixa {result['shard']}: {result['inserted']} inseridos, {result['skipped']} ignorados "
+                        f"em {result['seconds']:.1f}s ({rate:.0f} registros/s)"
+                    )
+            except Exception as e:
+                logging.error(f"Erro na importação paralela do XML: {e}")
+                for future in futures:
+                    future.cancel()
+                sys.exit(1)
+            finally:
+                lookup_dir.cleanup()
+                if builder:
+                    if len(results) == len(shards):
+                        builder.commit(len(shards))
+                    builder.discard()
+
+        inserted_count = sum(result['inserted'] for result in results)
+        skipped_count = sum(result['skipped'] for result in results)
+        if self.delta:
+            summary = {'known': known_hashes}
+            for field in ('inserted', 'updated', 'unchanged'):
+                summary[field] = sum(result['delta'][field] for result in results if result['delta'])
+            log_delta_report(
+                PACIENTES_SPEC.table, summary, complete=not any(result['resumed'] for result in results)
+            )
+        elapsed = time.perf_counter() - started_at
+        logging.info(
+            f"Importação paralela concluída: {inserted_count} inseridos, {skipped_count} ignorados "
+            f"em {elapsed:.1f}s ({inserted_count / elapsed if elapsed else 0:.0f} registros/s)"
+        )
+        return inserted_count
+
+    def load_hospital_locations(self):
+        """
+        Retorna os hospitais com as coordenadas da sua cidade
+
+        Returns:
+            DataFrame: Colunas id, city, latitude, longitude
+        """
+        rows = self.iter_rows(f"""
+            SELECT h.id, h.city, c.latitude, c.longitude
+            FROM {self.table_name(TABLE_HOSPITAIS)} h
+            JOIN {self.table_name(TABLE_MUNICIPIOS)} c ON c.id = h.city
+            WHERE c.latitude IS NOT NULL AND c.longitude IS NOT NULL
+        """)
+        return pd.DataFrame(list(rows), columns=['id', 'city', 'latitude', 'longitude'])
+
+    def load_cid_hospitals(self):
+        """
+        Retorna os pares (CID, hospital) em que o hospital tem uma especialidade ligada
+        ao CID em cid_specialty (specialties_unique e specialties são ligadas pelo nome)
+
+        Returns:
+            DataFrame: Colunas cid_id, hospital_id
+        """
+        rows = self.iter_rows(f"""
+            SELECT DISTINCT cs.cid_id, s.hospital_id
+            FROM cid_specialty cs
+            JOIN specialties_unique su ON su.id = cs.specialty_id
+            JOIN {self.table_name(ESPECIALIDADES_SPEC.table)} s ON s.name = su.name
+        """)
+        return pd.DataFrame(list(rows), columns=['cid_id', 'hospital_id'])
+
+    def assign_patient_hospitals(self, k=ASSIGNMENT_K, by_specialty=False, workers=ASSIGNMENT_WORKERS,
+                                 chunk_size=100000, replace=True):
+        """
+        Preenche patient_hospital com os k hospitais mais próximos de cada paciente
+
+        Pacientes e hospitais usam as coordenadas da cidade, então os vizinhos são
+        calculados uma vez por par (cidade, CID) distinto, em paralelo, com um índice
+        em grade e haversine vetorizado. Depois os pacientes são lidos em blocos,
+        cruzados com os pares e gravados; as atribuições anteriores do intervalo de
+        ids de cada bloco são removidas antes da gravação.
+
+        Args:
+            k (int): Hospitais por paciente
+            by_specialty (bool): Considera apenas hospitais com especialidade ligada ao CID
+                do paciente em cid_specialty (sem nenhum compatível, usa todos)
+            workers (int): Processos do cálculo dos vizinhos (1 = no próprio processo)
+            chunk_size (int): Pacientes lidos por bloco
+            replace (bool): Remove as atribuições anteriores de cada bloco (False com a tabela
+                vazia no início, em que o DELETE sem o índice de patient_id leria a tabela inteira)
+
+        Returns:
+            int: Número de atribuições gravadas
+        """
+        started_at = time.perf_counter()
+
+        hospitals = self.load_hospital_locations()
+        if hospitals.empty:
+            logging.warning("Nenhum hospital com coordenadas cadastrado, atribuição ignorada")
+            return 0
+
+        cid_hospitals = {}
+        if by_specialty:
+            compatible = self.load_cid_hospitals()
+            positions = pd.Series(np.arange(len(hospitals)), index=hospitals['id'])
+            compatible['position'] = compatible['hospital_id'].map(positions)
+            compatible = compatible.dropna()
+            cid_hospitals = {
+                int(cid_id): group.to_numpy(np.int64)
+                for cid_id, group in compatible.groupby('cid_id')['position']
+            }
+
+        # Sem filtro por especialidade todos os pacientes da cidade compartilham os vizinhos
+        cid_expression = f"COALESCE(p.cid_id, {NO_CID})" if by_specialty else str(NO_CID)
+        pairs = [
+            (row['city'], float(row['latitude']), float(row['longitude']), int(row['cid_id']))
+            for row in self.iter_rows(f"""
+                SELECT p.city, c.latitude, c.longitude, {cid_expression} AS cid_id
+                FROM {self.table_name(TABLE_PACIENTES)} p
+                JOIN {self.table_name(TABLE_MUNICIPIOS)} c ON c.id = p.city
+                WHERE c.latitude IS NOT NULL AND c.longitude IS NOT NULL
+                GROUP BY p.city, c.latitude, c.longitude, cid_id
+            """)
+        ]
+        logging.info(f"Atribuição: {len(pairs)} pares (cidade, CID) distintos, {len(hospitals)} hospitais, k={k}")
+
+        initargs = (
+            hospitals['id'].to_numpy(np.int64),
+            hospitals['latitude'].astype('float64').to_numpy(),
+            hospitals['longitude'].astype('float64').to_numpy(),
+            hospitals['city'].to_numpy(np.int64),
+            cid_hospitals, k, ASSIGNMENT_GRID_DEGREES
+        )
+        step = max(1, -(-len(pairs) // (max(1, workers) * 4)))
+        tasks = [pairs[i:i + step] for i in range(0, len(pairs), step)]
+        if workers > 1 and len(tasks) > 1:
+            with ProcessPoolExecutor(
+                max_workers=workers, initializer=init_assignment_worker, initargs=initargs
+            ) as executor:
+                results = list(executor.map(compute_assignments, tasks))
+        else:
+            init_assignment_worker(*initargs)
+            results = [compute_assignments(task) for task in tasks]
+
+        frames = [pd.DataFrame(columns) for columns, _ in results if columns]
+        if not frames:
+            logging.warning("Nenhum paciente com cidade georreferenciada, atribuição ignorada")
+            return 0
+        assignments = pd.concat(frames, ignore_index=True)
+        fallbacks = sum(fallback for _, fallback in results)
+        if fallbacks:
+            logging.info(f"Atribuição: {fallbacks} pares sem hospital de especialidade compatível usaram todos os hospitais")
+
+        # Leitura sem buffer em conexão separada, já que a conexão principal grava enquanto lê
+        reader = self.clone()
+        reader.connect()
+        current_time = datetime.now()
+        patients_count = 0
+        try:
+            patients_rows = reader.iter_rows(f"""
+                SELECT p.id AS patient_id, p.city, {cid_expression} AS cid_id
+                FROM {self.table_name(TABLE_PACIENTES)} p
+                WHERE p.city IS NOT NULL
+                ORDER BY p.id
+            """)
+            with self.open_writer(PATIENT_HOSPITAL_SPEC) as writer:
+                while True:
+                    chunk = list(islice(patients_rows, chunk_size))
+                    if not chunk:
+                        break
+                    patients = pd.DataFrame(chunk, columns=['patient_id', 'city', 'cid_id'])
+                    patients_count += len(patients)
+                    merged = patients.merge(assignments, on=['city', 'cid_id'])
+
+                    # Commit imediato: as threads do modo pipeline gravam o intervalo em outras conexões
+                    if replace:
+                        self.execute_query(
+                            f"DELETE FROM {self.table_name(PATIENT_HOSPITAL_SPEC.table)} "
+                            f"WHERE patient_id BETWEEN %s AND %s",
+                            (int(patients['patient_id'].iloc[0]), int(patients['patient_id'].iloc[-1]))
+                        )
+                        self.commit()
+
+                    writer.write(list(zip(
+                        merged['patient_id'].tolist(),
+                        merged['hospital_id'].tolist(),
+                        merged['distance_km'].tolist(),
+                        merged['same_city'].tolist(),
+                        repeat(current_time),
+                        repeat(current_time)
+                    )))
+        finally:
+            reader.disconnect()
+
+        elapsed = time.perf_counter() - started_at
+        logging.info(
+            f"Atribuição concluída: {writer.count} linhas para {patients_count} pacientes em {elapsed:.1f}s "
+            f"({patients_count / elapsed if elapsed else 0:.0f} pacientes/s)"
+        )
+        return writer.count
+
+    def load_dirty_cities(self):
+        """
+        Ids das cidades registradas em stats_dirty_regions pelo modo delta
+        (em doctors a coluna city guarda o código IBGE, convertido pelo cities.city_code)
+        """
+        rows = self.iter_rows(f"""
+            SELECT CAST(region_value AS UNSIGNED) AS id FROM stats_dirty_regions WHERE table_name <> %s
+            UNION
+            SELECT c.id FROM stats_dirty_regions d
+            JOIN cities c ON c.city_code = d.region_value
+            WHERE d.table_name = %s
+        """, (TABLE_MEDICOS, TABLE_MEDICOS))
+        return sorted(row['id'] for row in rows)
+
+    def has_region_stats(self):
+        """Se region_stats já foi materializada alguma vez"""
+        with self.connection.cursor() as cursor:
+            cursor.execute("SELECT 1 AS found FROM region_stats LIMIT 1")
+            return cursor.fetchone() is not None
+
+    def materialize_region_stats(self, full=False, chunk_size=100000):
+        """
+        Calcula os agregados por cidade e por estado e grava em region_stats
+
+        Pacientes (por gênero, convênio e CID), médicos (por especialidade) e
+        hospitais (leitos) são lidos uma vez cada, em blocos, com cursor sem buffer;
+        cada bloco é reduzido a contagens por cidade. Os estados são recalculados no
+        banco somando as linhas das suas cidades.
+
+        No modo delta só as cidades registradas em stats_dirty_regions são
+        recalculadas (e os estados delas); o cálculo é completo sem delta, com
+        full, na primeira materialização ou quando há mais de
+        REGION_STATS_MAX_INCREMENTAL cidades alteradas.
+
+        Args:
+            full (bool): Recalcula todas as cidades mesmo no modo delta
+            chunk_size (int): Linhas lidas por bloco
+
+        Returns:
+            int: Número de linhas de cidade gravadas
+        """
+        started_at = time.perf_counter()
+
+        cities = None
+        if self.delta and not full:
+            if not self.has_region_stats():
+                logging.info("Agregados: primeira materialização, cálculo completo")
+            else:
+                cities = self.load_dirty_cities()
+                if not cities:
+                    logging.info("Agregados: nenhuma cidade alterada, etapa ignorada")
+                    return 0
+                if len(cities) > REGION_STATS_MAX_INCREMENTAL:
+                    logging.info(f"Agregados: {len(cities)} cidades alteradas, cálculo completo")
+                    cities = None
+
+        # Filtro por cidade com parâmetros; sem filtro no cálculo completo
+        if cities is None:
+            city_filter, params = '', None
+        else:
+            city_filter = f"IN ({', '.join(['%s'] * len(cities))})"
+            params = tuple(cities)
+
+        accumulator = RegionStatsAccumulator()
+        sources = (
+            (accumulator.add_patients, ['city', 'gender', 'has_insurance', 'cid_id'], f"""
+                SELECT city, gender, has_insurance, cid_id FROM patients
+                WHERE city {city_filter or 'IS NOT NULL'}
+            """),
+            (accumulator.add_doctors, ['city', 'specialty'], f"""
+                SELECT c.id AS city, d.specialty FROM doctors d
+                JOIN cities c ON c.city_code = d.city
+                {f'WHERE c.id {city_filter}' if city_filter else ''}
+            """),
+            (accumulator.add_hospitals, ['city', 'total_beds'], f"""
+                SELECT city, total_beds FROM hospitals
+                WHERE city {city_filter or 'IS NOT NULL'}
+            """)
+        )
+        for add, columns, query in sources:
+            rows = self.iter_rows(query, params)
+            while True:
+                chunk = list(islice(rows, chunk_size))
+                if not chunk:
+                    break
+                add(pd.DataFrame(chunk, columns=columns))
+
+        current_time = datetime.now()
+        city_rows = accumulator.rows(current_time)
+
+        # Commit imediato: as threads do modo pipeline gravam as cidades em outras conexões
+        delete_query = "DELETE FROM region_stats WHERE scope = %s"
+        if city_filter:
+            delete_query += f" AND region_id {city_filter}"
+        self.execute_query(delete_query, (SCOPE_CITY,) + (params or ()))
+        self.commit()
+
+        with self.open_writer(REGION_STATS_SPEC) as writer:
+            writer.write(city_rows)
+
+        # Estados: soma das cidades, calculada no banco depois que as cidades foram confirmadas
+        state_filter = f"IN (SELECT DISTINCT state_id FROM cities WHERE id {city_filter})" if city_filter else ''
+        self.execute_query(
+            f"DELETE FROM region_stats WHERE scope = %s {f'AND region_id {state_filter}' if state_filter else ''}",
+            (SCOPE_STATE,) + (params or ())
+        )
+        self.execute_query(f"""
+            INSERT INTO region_stats (scope, region_id, metric, dimension, value, created_at, updated_at)
+            SELECT %s, c.state_id, r.metric, r.dimension, SUM(r.value), %s, %s
+            FROM region_stats r
+            JOIN cities c ON c.id = r.region_id
+            WHERE r.scope = %s {f'AND c.state_id {state_filter}' if state_filter else ''}
+            GROUP BY c.state_id, r.metric, r.dimension
+        """, (SCOPE_STATE, current_time, current_time, SCOPE_CITY) + (params or ()))
+
+        # A etapa roda depois de todas as cargas, então todas as regiões pendentes foram consideradas
+        self.execute_query("DELETE FROM stats_dirty_regions")
+        self.commit()
+
+        elapsed = time.perf_counter() - started_at
+        scope = 'todas as cidades' if cities is None else f"{len(cities)} cidades alteradas"
+        logging.info(f"Agregados: {len(city_rows)} linhas de cidade gravadas ({scope}) em {elapsed:.1f}s")
+        return len(city_rows)
+
+    def load_with_deferred_indexes(self, table, load):
+        """
+        Executa a carga de uma tabela vazia sem os índices secundários e as foreign
+        keys, recriados em uma única passada ao final (tabela com dados: carga normal)
+
+        Args:
+            table (str): Tabela carregada
+            load (callable): Recebe se os índices foram adiados e executa a carga
+
+        Returns:
+            O valor retornado por load
+        """
+        deferred = DeferredIndexes(self, self.table_name(table), self.checkpoint_dir)
+        if not deferred.drop():
+            return load(False)
+        result = load(True)
+        deferred.rebuild()
+        return result
+
+    def prepare_shadow_tables(self):
+        """
+        Recria vazias as tabelas-sombra do grupo, com a estrutura atual de cada tabela
+        (sombras de uma carga anterior que não chegou à troca são descartadas)
+
+        Returns:
+            int: Número de tabelas-sombra criadas
+        """
+        try:
+            with self.connection.cursor() as cursor:
+                # Filhas antes das mães, por causa das foreign keys entre as sombras
+                for table in reversed(self.shadow.tables):
+                    cursor.execute(f"DROP TABLE IF EXISTS {self.shadow.name(table)}")
+                for table in self.shadow.tables:
+                    cursor.execute(f"SHOW CREATE TABLE {table}")
+                    cursor.execute(self.shadow.create_query(table, cursor.fetchone()['Create Table']))
+        except Exception as e:
+            logging.error(f"Erro ao criar as tabelas-sombra: {e}")
+            sys.exit(1)
+
+        logging.info(f"Tabelas-sombra criadas: {', '.join(map(self.shadow.name, self.shadow.tables))}")
+        return len(self.shadow.tables)
+
+    def swap_shadow_tables(self, expected_counts):
+        """
+        Confere as linhas das tabelas-sombra e as troca com as atuais por um único
+        RENAME TABLE; as tabelas substituídas ficam como <tabela>_old até a próxima troca
+
+        Com qualquer contagem diferente a troca não acontece: as tabelas atuais não
+        são alteradas e as sombras ficam para inspeção.
+
+        Args:
+            expected_counts (dict): Tabela -> linhas enviadas pelas etapas da carga
+
+        Returns:
+            int: Número de tabelas trocadas
+        """
+        mismatches = []
+        with self.connection.cursor() as cursor:
+            for table, expected in expected_counts.items():
+                cursor.execute(f"SELECT COUNT(*) AS total FROM {self.shadow.name(table)}")
+                total = cursor.fetchone()['total']
+                logging.info(f"{self.shadow.name(table)}: {total} linhas (enviadas: {expected})")
+                if total != expected:
+                    mismatches.append(table)
+        if mismatches:
+            logging.error(f"Contagem divergente nas tabelas-sombra de {', '.join(mismatches)}; troca cancelada")
+            sys.exit(1)
+
+        try:
+            started_at = time.perf_counter()
+            # Foreign keys das tabelas atuais, com os nomes da migration, recriadas nas sombras depois da troca
+            foreign_keys = {table: read_foreign_keys(self.connection, table) for table in self.shadow.tables}
+            with self.connection.cursor() as cursor:
+                for table in reversed(self.shadow.tables):
+                    cursor.execute(f"DROP TABLE IF EXISTS {self.shadow.old_name(table)}")
+                cursor.execute(self.shadow.swap_query())
+        except Exception as e:
+            logging.error(f"Erro na troca das tabelas-sombra: {e}")
+            sys.exit(1)
+
+        logging.info(
+            f"Tabelas trocadas em {time.perf_counter() - started_at:.1f}s; as anteriores estão em "
+            f"{', '.join(map(self.shadow.old_name, self.shadow.tables))}"
+        )
+        self.restore_foreign_key_names(foreign_keys, list(map(self.shadow.old_name, self.shadow.tables)))
+        return len(self.shadow.tables)
+
+    def restore_foreign_key_names(self, foreign_keys, released_tables):
+        """
+        Depois de um RENAME TABLE do grupo, devolve às tabelas atuais as foreign keys
+        com os nomes originais (os da migration, que o dropForeign do Laravel procura)
+
+        Nomes de constraint são únicos no banco: as foreign keys de released_tables
+        (as tabelas que saíram do grupo) são removidas antes, e as tabelas atuais
+        trocam as suas (nomes gerados pelo InnoDB) pelas originais. Com
+        foreign_key_checks desligado o ALTER não copia a tabela nem confere as linhas.
+
+        Args:
+            foreign_keys (dict): Tabela -> foreign keys lidas antes do RENAME (read_foreign_keys)
+            released_tables (list): Tabelas que saíram do grupo (_old na troca, sombras no rollback)
+        """
+        started_at = time.perf_counter()
+        try:
+            with self.connection.cursor() as cursor:
+                cursor.execute("SELECT @@foreign_key_checks AS checks")
+                checks = cursor.fetchone()['checks']
+                cursor.execute("SET foreign_key_checks = 0")
                 try:
-                    gc.collect()
-                except:
-                    pass
-                
-    def import_medicos_csv(self, csv_file_path, batch_size=100):
+                    for table in released_tables:
+                        names = read_foreign_keys(self.connection, table)
+                        if names:
+                            cursor.execute(f"ALTER TABLE {table} " + ', '.join(
+                                f"DROP FOREIGN KEY `{name}`" for name in names
+                            ))
+                    for table, expected in foreign_keys.items():
+                        current = read_foreign_keys(self.connection, table)
+                        clauses = [
+                            f"DROP FOREIGN KEY `{name}`" for name, foreign_key in current.items()
+                            if expected.get(name) != foreign_key
+                        ] + [
+                            foreign_key_definition(name, foreign_key) for name, foreign_key in expected.items()
+                            if current.get(name) != foreign_key
+                        ]
+                        if clauses:
+                            cursor.execute(f"ALTER TABLE {table} {', '.join(clauses)}")
+                finally:
+                    cursor.execute(f"SET foreign_key_checks = {int(checks)}")
+        except Exception as e:
+            logging.error(f"Erro ao restaurar os nomes das foreign keys de {', '.join(foreign_keys)}: {e}")
+            logging.error(
+                "As tabelas já foram trocadas; confira as foreign keys com SHOW CREATE TABLE e recrie as que "
+                "faltarem com os nomes da migration"
+            )
+            sys.exit(1)
+
+        logging.info(
+            f"Foreign keys com os nomes originais em {', '.join(foreign_keys)} "
+            f"({time.perf_counter() - started_at:.1f}s); {', '.join(released_tables)} ficaram sem foreign keys"
+        )
+
+    def rollback_shadow_tables(self):
+        """
+        Devolve as tabelas substituídas pela última troca (<tabela>_old) com um único
+        RENAME TABLE; a carga desfeita volta para as tabelas-sombra
+
+        Returns:
+            int: Número de tabelas devolvidas
+        """
+        try:
+            foreign_keys = {table: read_foreign_keys(self.connection, table) for table in self.shadow.tables}
+            with self.connection.cursor() as cursor:
+                cursor.execute(self.shadow.rollback_query())
+        except Exception as e:
+            logging.error(f"Erro no rollback das tabelas-sombra: {e}")
+            sys.exit(1)
+
+        # As tabelas _old ficaram sem foreign keys na troca: recebem as das tabelas desfeitas
+        self.restore_foreign_key_names(foreign_keys, list(map(self.shadow.name, self.shadow.tables)))
+        logging.info(f"Rollback concluído: {', '.join(self.shadow.tables)} voltaram ao conteúdo anterior")
+        return len(self.shadow.tables)
+
+    def import_medicos_csv(self, csv_file_path, batch_size=None):
         try:
-            # Lê o arquivo CSV
-            df = pd.read_csv(csv_file_path, encoding='utf-8')
-            
-            data_list = []
             current_time = datetime.now()
             
-            for _, row in df.iterrows():
-                data_tuple = (
-                    row['codigo'],           
-                    row['nome_completo'],    
-                    row['especialidade'],    
-                    row['cidade'],          
-                    current_time,           
-                    current_time            
-                )
-                data_list.append(data_tuple)
-            
-            # Query de inserção
-            insert_query = """
-                INSERT INTO doctors (doctor_code, full_name, specialty, city, created_at, updated_at)
-                VALUES (%s, %s, %s, %s, %s, %s)
-                ON DUPLICATE KEY UPDATE
-                    full_name = VALUES(full_name),
-                    specialty = VALUES(specialty),
-                    city = VALUES(city),
-                    updated_at = VALUES(updated_at)
-            """
-            
-            inserted_count = self.execute_batch(insert_query, data_list, batch_size)
-            
-            return inserted_count
+            return self.import_csv_chunks(
+                csv_file_path, MEDICOS_DTYPES, MEDICOS_SPEC,
+                lambda chunk: transform_medicos(chunk, current_time), batch_size
+            )
             
         except Exception as e:
             sys.exit(1)
     
-    def import_municipios_csv(self, csv_file_path, batch_size=100):
+    def import_municipios_csv(self, csv_file_path, batch_size=None):
         try:
-            # Lê o arquivo CSV
-            df = pd.read_csv(csv_file_path, encoding='utf-8')
-            
-            data_list = []
             current_time = datetime.now()
             
-            for _, row in df.iterrows():
-                # Create the POINT WKT string directly with the coordinates
-                point_wkt = f"POINT({float(row['longitude'])} {float(row['latitude'])})"
-                
-                data_tuple = (
-                    int(row['codigo_ibge']),     # city_code
-                    row['nome'],                 # name
-                    float(row['latitude']),      # latitude
-                    float(row['longitude']),     # longitude
-                    point_wkt,                   # location (WKT para INSERT)
-                    bool(row['capital']),        # is_capital
-                    int(row['codigo_uf']),       # state_id
-                    int(row['siafi_id']),        # siafi_id
-                    int(row['ddd']),             # area_code
-                    row['fuso_horario'],         # time_zone
-                    int(row['populacao']),       # population
-                    current_time,                # created_at
-                    current_time,                # updated_at
-                    point_wkt                    # location (WKT para UPDATE)
-                )
-                data_list.append(data_tuple)
-            
-            # Query de inserção - ajustada conforme schema: id, city_code, name, latitude, longitude, location, is_capital, state_id, siafi_id, area_code, time_zone, population, created_at, updated_at
-            insert_query = """
-                INSERT INTO cities (
-                    city_code, name, latitude, longitude, location, is_capital, state_id, siafi_id, area_code, time_zone, population, created_at, updated_at
-                ) VALUES (%s, %s, %s, %s, ST_GeomFromText(%s), %s, %s, %s, %s, %s, %s, %s, %s)
-                ON DUPLICATE KEY UPDATE
-                    name = VALUES(name),
-                    latitude = VALUES(latitude),
-                    longitude = VALUES(longitude),
-                    location = ST_GeomFromText(%s),
-                    is_capital = VALUES(is_capital),
-                    state_id = VALUES(state_id),
-                    siafi_id = VALUES(siafi_id),
-                    area_code = VALUES(area_code),
-                    time_zone = VALUES(time_zone),
-                    population = VALUES(population),
-                    updated_at = VALUES(updated_at)
-            """
-            
-            inserted_count = self.execute_batch(insert_query, data_list, batch_size)
-            
-            return inserted_count
+            # Conversão vetorizada por bloco, incluindo o WKT POINT(lon lat)
+            return self.import_csv_chunks(
+                csv_file_path, MUNICIPIOS_DTYPES, MUNICIPIOS_SPEC,
+                lambda chunk: transform_municipios(chunk, current_time), batch_size
+            )
             
         except Exception as e:
             sys.exit(1)
 
-    def import_excel_data(self, excel_file_path, sheet_name=None, batch_size=3000):
+    def import_excel_data(self, excel_file_path, sheet_name=None, batch_size=None):
+        """
+        Importa a tabela CID-10 (xlsx)
+
+        A planilha é lida em streaming (openpyxl read_only) e os pares (código,
+        descrição) interpretados ficam no cache de origens, então enquanto o xlsx
+        não muda as execuções seguintes não abrem a planilha.
+
+        Args:
+            excel_file_path (str): Caminho para a tabela CID-10
+            sheet_name (str): Planilha (None = primeira)
+            batch_size (int): Linhas do primeiro INSERT (None = BATCH_SIZE, depois ajustado)
+
+        Returns:
+            int: Número de registros importados
+        """
         try:
-            # Lê arquivo Excel
-            df = pd.read_excel(excel_file_path, sheet_name=sheet_name)
-            
-            # Se sheet_name é None, df pode ser um dict; seleciona a primeira planilha
-            if isinstance(df, dict):
-                sheet_name = list(df.keys())[0]
-                df = df[sheet_name]
-            
-            
-            data_list = []
+            with self.metrics.timed(PHASE_PARSE):
+                records = self.source_cache.get(
+                    excel_file_path, f"cid10-{sheet_name or 'primeira'}",
+                    lambda: list(iter_cid_records(excel_file_path, sheet_name))
+                )
+
             current_time = datetime.now()
-            
-            for _, row in df.iterrows():
-                # Verifica se a linha tem pelo menos 1 coluna
-                if len(row) < 1:
-                    continue
-
-                # Pega o conteúdo da primeira coluna
-                cell_value = str(row.iloc[0]).strip()
-
-                # Pula linhas vazias ou que começam com "Capítulo" ou "Total"
-                if not cell_value or cell_value.startswith('Capítulo') or cell_value.startswith('Total'):
-                    continue
-
-                # Verifica se a linha contém um código CID válido (formato: "A00 - Descrição")
-                if ' - ' in cell_value:
-                    parts = cell_value.split(' - ', 1)  # Divide apenas na primeira ocorrência
-                    if len(parts) == 2:
-                        cid_code = parts[0].strip()
-                        cid_name = parts[1].strip()
-
-                        # Valida se o código tem formato válido (letras + números)
-                        if cid_code and cid_name:
-                            data_tuple = (
-                                cid_code,
-                                cid_name,
-                                current_time,
-                                current_time
-                            )
-                            data_list.append(data_tuple)
-                   
-            
+            with self.metrics.timed(PHASE_TRANSFORM):
+                data_list = [(cid_code, cid_name, current_time, current_time) for cid_code, cid_name in records]
+            self.metrics.count(ROWS_PARSED, len(records))
+
             if not data_list:
+                logging.error(f"Nenhum CID encontrado em {excel_file_path}")
                 sys.exit(1)
             
-            # Query de inserção corrigida
-            insert_query = """
-                INSERT INTO cids (code, name, created_at, updated_at)
-                VALUES (%s, %s, %s, %s)
-                ON DUPLICATE KEY UPDATE 
-                    name = VALUES(name),
-                    updated_at = VALUES(updated_at)
-            """
-            
-            inserted_count = self.execute_batch(insert_query, data_list, batch_size)
+            with self.open_writer(CID10_SPEC, batch_size) as writer:
+                writer.write(data_list)
             
-            return inserted_count
+            return writer.count
             
         except FileNotFoundError:
-            sys.exit(1)
-        except pd.errors.EmptyDataError:
+            logging.error(f"Arquivo não encontrado: {excel_file_path}")
             sys.exit(1)
         except Exception as e:
+            logging.error(f"Erro ao importar CID-10: {e}")
+            sys.exit(1)
+
+def parse_args(argv=None):
+    """Lê as opções de linha de comando (argv = None usa sys.argv)"""
+    parser = argparse.ArgumentParser(description='Importação de dados médicos para o banco MySQL')
+    parser.add_argument(
+        '--load-mode',
+        choices=LOAD_MODES,
+        default=LOAD_MODE,
+        help="'batch' usa INSERT multi-linha em lotes; 'bulk' usa LOAD DATA LOCAL INFILE em staging + upsert único"
+    )
+    parser.add_argument(
+        '--pipeline-writers',
+        type=int,
+        default=PIPELINE_WRITERS,
+        help='Threads gravadoras ligadas ao parser por uma fila limitada (0 = sem pipeline)'
+    )
+    parser.add_argument(
+        '--pipeline-queue',
+        type=int,
+        default=PIPELINE_QUEUE_SIZE,
+        help='Número máximo de lotes prontos aguardando gravação no modo pipeline'
+    )
+    parser.add_argument(
+        '--async-batches',
+        type=int,
+        default=ASYNC_BATCHES,
+        help='Gravação assíncrona (aiomysql) com até N INSERT multi-linha de um mesmo lote em andamento, '
+             'um por conexão de um pool de N conexões (0 = desativada). Cada statement é confirmado na sua '
+             'conexão (--commit-every não se aplica) e cada lote termina confirmado, então --resume e '
+             '--delta gravam checkpoints e hashes por lote'
+    )
+    parser.add_argument(
+        '--xml-parser',
+        choices=tuple(PARSER_BACKENDS),
+        default=XML_PARSER,
+        help='Backend de parsing do pacientes.xml'
+    )
+    parser.add_argument(
+        '--csv-chunk-size',
+        type=int,
+        default=CSV_CHUNK_SIZE,
+        help='Linhas lidas por bloco dos arquivos CSV (memória constante independente do tamanho do arquivo)'
+    )
+    parser.add_argument(
+        '--resume',
+        action='store_true',
+        help='Retoma cada arquivo a partir do último lote confirmado (checkpoints em CHECKPOINT_DIR)'
+    )
+    parser.add_argument(
+        '--delta',
+        action='store_true',
+        help='Envia apenas linhas novas ou alteradas, comparando o hash de conteúdo com a última importação'
+    )
+    parser.add_argument(
+        '--stage-workers',
+        type=int,
+        default=STAGE_WORKERS,
+        help='Etapas independentes executadas ao mesmo tempo, cada uma com sua conexão (1 = uma etapa por vez)'
+    )
+    parser.add_argument(
+        '--commit-every',
+        type=int,
+        default=COMMIT_EVERY,
+        help='Lotes gravados por commit (0 = um commit ao fim de cada tabela); checkpoints por lote só com 1'
+    )
+    parser.add_argument(
+        '--bulk-session',
+        action='store_true',
+        default=BULK_SESSION,
+        help='Desativa unique_checks, foreign_key_checks e sql_log_bin nas conexões; '
+             'use apenas em cargas sem chaves repetidas (por exemplo, banco vazio)'
+    )
+    parser.add_argument(
+        '--no-assignment',
+        action='store_true',
+        help='Não executa a etapa de atribuição paciente -> hospital (tabela patient_hospital)'
+    )
+    parser.add_argument(
+        '--assign-k',
+        type=int,
+        default=ASSIGNMENT_K,
+        help='Hospitais mais próximos atribuídos a cada paciente'
+    )
+    parser.add_argument(
+        '--assign-by-specialty',
+        action='store_true',
+        help='Atribui apenas hospitais com especialidade ligada ao CID do paciente (exige cid_specialty populada)'
+    )
+    parser.add_argument(
+        '--assign-workers',
+        type=int,
+        default=ASSIGNMENT_WORKERS,
+        help='Processos usados no cálculo dos hospitais mais próximos'
+    )
+    parser.add_argument(
+        '--no-validation',
+        action='store_true',
+        help='Não valida nem deduplica os pacientes antes da gravação (CPF, gênero, codigo/CPF repetidos)'
+    )
+    parser.add_argument(
+        '--no-stats',
+        action='store_true',
+        help='Não executa a etapa de agregados por cidade e estado (tabela region_stats)'
+    )
+    parser.add_argument(
+        '--full-stats',
+        action='store_true',
+        help='Recalcula os agregados de todas as cidades mesmo no modo --delta'
+    )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=XML_WORKERS,
+        help='Número de processos para importar o pacientes.xml (1 = importação sequencial)'
+    )
+    parser.add_argument(
+        '--source-cache',
+        action='store_true',
+        help='Guarda os arquivos de origem já interpretados em SOURCE_CACHE_DIR e os lê de lá '
+             'enquanto não mudarem (usa disco: ver README)'
+    )
+    parser.add_argument(
+        '--sort-patients',
+        action='store_true',
+        help='Ordena os pacientes por codigo antes da gravação (ordenação externa em disco, '
+             'SORT_RUN_RECORDS registros em memória), para gravar os índices em ordem'
+    )
+    parser.add_argument(
+        '--defer-indexes',
+        action='store_true',
+        help='Na carga inicial (tabela vazia), remove os índices secundários e as foreign keys de patients e '
+             'patient_hospital e os recria em uma única passada ao final'
+    )
+    parser.add_argument(
+        '--shadow',
+        action='store_true',
+        help='Carrega cidades, hospitais, especialidades, médicos, pacientes e atribuições em tabelas <tabela>_new '
+             'só com INSERT e troca com as atuais por um único RENAME TABLE (as anteriores ficam em <tabela>_old)'
+    )
+    parser.add_argument(
+        '--rollback-shadow',
+        action='store_true',
+        help='Devolve as tabelas <tabela>_old substituídas pela última carga com --shadow e encerra'
+    )
+    parser.add_argument(
+        '--metrics-file',
+        help='Acrescenta as métricas em JSON lines a este arquivo (um evento por statement e um por etapa)'
+    )
+    parser.add_argument(
+        '--metrics-prometheus',
+        help='Grava as métricas por etapa neste arquivo no formato texto do Prometheus (coletor textfile)'
+    )
+    return parser.parse_args(argv)
+
+
+def source_files(directory):
+    """Caminhos dos arquivos de entrada esperados no diretório"""
+    return {
+        'estados': os.path.join(directory, 'estados.csv'),
+        'hospitais': os.path.join(directory, 'hospitais.csv'),
+        'medicos': os.path.join(directory, 'medicos.csv'),
+        'municipios': os.path.join(directory, 'municipios.csv'),
+        'pacientes': os.path.join(directory, 'pacientes.xml'),
+        'cid10': os.path.join(directory, 'tabela CID-10.xlsx')
+    }
+
+
+def importer_settings_from_args(args, directory):
+    """
+    Parâmetros do DatabaseImporter a partir das opções de linha de comando
+
+    Args:
+        args (Namespace): Opções lidas por parse_args
+        directory (str): Diretório base dos checkpoints e dos rejeitados
+    """
+    return dict(
+        host=DB_HOST,
+        port=DB_PORT,
+        user=DB_USER,
+        password=DB_PASSWORD,
+        database=DB_NAME,
+        load_mode=args.load_mode,
+        pipeline_writers=args.pipeline_writers,
+        pipeline_queue_size=args.pipeline_queue,
+        async_batches=args.async_batches,
+        xml_parser=args.xml_parser,
+        csv_chunk_size=args.csv_chunk_size,
+        resume=args.resume,
+        checkpoint_dir=os.path.join(directory, CHECKPOINT_DIR),
+        delta=args.delta,
+        commit_every=args.commit_every,
+        bulk_session=args.bulk_session,
+        validate=not args.no_validation,
+        reject_dir=os.path.join(directory, REJECT_DIR),
+        source_cache_dir=os.path.join(directory, SOURCE_CACHE_DIR) if args.source_cache else None,
+        shadow=ShadowTables() if args.shadow or args.rollback_shadow else None,
+        sort_patients=args.sort_patients
+    )
+
+
+def register_stages(scheduler, files, args):
+    """
+    Registra no agendador as etapas da importação, com as dependências entre elas
+
+    Args:
+        scheduler (StageScheduler): Agendador
+        files (dict): Caminhos de source_files (etapas sem arquivo não são registradas)
+        args (Namespace): Opções lidas por parse_args
+    """
+    # Na carga com --shadow as tabelas-sombra são recriadas antes das etapas que as gravam;
+    # o delta e os checkpoints se referem ao conteúdo das tabelas atuais
+    shadow = ('sombra',) if args.shadow else ()
+    if args.shadow:
+        if args.delta or args.resume:
+            logging.error("--shadow não pode ser combinado com --delta nem com --resume")
+            sys.exit(1)
+        scheduler.add('sombra', lambda importer: importer.prepare_shadow_tables())
+
+    if os.path.exists(files['estados']):
+        scheduler.add('estados', lambda importer: importer.import_estados_csv(files['estados']))
+
+    # Municípios dependem dos estados (foreign key state_id)
+    if os.path.exists(files['municipios']):
+        scheduler.add(
+            'municipios', lambda importer: importer.import_municipios_csv(files['municipios']),
+            depends_on=('estados',) + shadow
+        )
+
+    # Hospitais usam o mapeamento de cidades; especialidades usam o de hospitais
+    if os.path.exists(files['hospitais']):
+        scheduler.add(
+            'hospitais', lambda importer: importer.import_hospitais_csv(files['hospitais']),
+            depends_on=('municipios',) + shadow
+        )
+        scheduler.add(
+            'especialidades', lambda importer: importer.import_hospital_specialties(files['hospitais']),
+            depends_on=('hospitais',)
+        )
+
+    if os.path.exists(files['medicos']):
+        scheduler.add(
+            'medicos', lambda importer: importer.import_medicos_csv(files['medicos']), depends_on=shadow
+        )
+
+    # Importa Excel (CID-10)
+    if os.path.exists(files['cid10']):
+        scheduler.add('cid10', lambda importer: importer.import_excel_data(files['cid10']))
+
+    # Pacientes usam os mapeamentos de cidades e de CIDs
+    if os.path.exists(files['pacientes']):
+        def import_patients(importer):
+            return importer.import_xml_data_parallel(files['pacientes'], workers=args.workers)
+
+        # Com --defer-indexes os índices são removidos antes e recriados depois de todas as faixas
+        scheduler.add(
+            'pacientes',
+            (lambda importer: importer.load_with_deferred_indexes(
+                TABLE_PACIENTES, lambda deferred: import_patients(importer)
+            )) if args.defer_indexes else import_patients,
+            depends_on=('municipios', 'cid10') + shadow
+        )
+    else:
+        logging.warning(f"Arquivo não encontrado: {files['pacientes']}")
+
+    # Atribuição paciente -> hospital depois de pacientes, hospitais e especialidades
+    if not args.no_assignment:
+        def assign(importer, replace=True):
+            return importer.assign_patient_hospitals(
+                k=args.assign_k, by_specialty=args.assign_by_specialty, workers=args.assign_workers,
+                replace=replace
+            )
+
+        scheduler.add(
+            'atribuicao',
+            (lambda importer: importer.load_with_deferred_indexes(
+                PATIENT_HOSPITAL_SPEC.table, lambda deferred: assign(importer, replace=not deferred)
+            )) if args.defer_indexes else assign,
+            depends_on=('pacientes', 'hospitais', 'especialidades')
+        )
+
+    # Troca das tabelas-sombra depois de todas as cargas do grupo: uma tabela sem etapa
+    # seria trocada vazia, e as atribuições antigas apontariam para ids que não existem mais
+    if args.shadow:
+        missing = [stage for stage in SHADOW_STAGES if stage not in scheduler.stages]
+        if missing:
+            logging.error(f"--shadow exige todas as etapas das tabelas trocadas; faltam: {', '.join(missing)}")
             sys.exit(1)
+        scheduler.add(
+            'troca',
+            lambda importer: importer.swap_shadow_tables(
+                {table: scheduler.stages[stage].result for stage, table in SHADOW_STAGES.items()}
+            ),
+            depends_on=tuple(SHADOW_STAGES)
+        )
+
+    # Agregados por cidade e estado ao final, depois de todas as tabelas que eles resumem
+    # (com --shadow, depois da troca, sobre as tabelas novas)
+    if not args.no_stats:
+        scheduler.add(
+            'estatisticas',
+            lambda importer: importer.materialize_region_stats(full=args.full_stats),
+            depends_on=('municipios', 'hospitais', 'medicos', 'pacientes') + (('troca',) if args.shadow else ())
+        )
 
 
 def main():
     """Função principal"""
-    
-    DB_CONFIG = {
-        'host': DB_HOST,
-        'port': DB_PORT,
-        'user': DB_USER,
-        'password': DB_PASSWORD,
-        'database': DB_NAME
-    }
-    
+    args = parse_args()
+
     CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
-    FILES = {
-        'estados': os.path.join(CURRENT_DIR, 'estados.csv'),
-        'hospitais': os.path.join(CURRENT_DIR, 'hospitais.csv'),
-        'medicos': os.path.join(CURRENT_DIR, 'medicos.csv'),
-        'municipios': os.path.join(CURRENT_DIR, 'municipios.csv'),
-        'pacientes': os.path.join(CURRENT_DIR, 'pacientes.xml'),
-        'cid10': os.path.join(CURRENT_DIR, 'tabela CID-10.xlsx')
-    }
-    
-    importer = DatabaseImporter(**DB_CONFIG)
-    
+    importer_settings = importer_settings_from_args(args, CURRENT_DIR)
+    if args.async_batches > 0:
+        require_aiomysql()
+
+    if args.rollback_shadow:
+        importer = DatabaseImporter(**importer_settings)
+        importer.connect()
+        try:
+            importer.rollback_shadow_tables()
+        finally:
+            importer.disconnect()
+        return
+
+    # Cada etapa roda com importador próprio e uma conexão do pool assim que suas dependências terminam;
+    # os mapeamentos de códigos são carregados uma vez e compartilhados entre as etapas
+    pool = ConnectionPool(DatabaseImporter(**importer_settings).open_connection, args.stage_workers)
+    lookups = LookupCache()
+    metrics = ImportMetrics(args.metrics_file, args.metrics_prometheus)
+    scheduler = StageScheduler(
+        lambda: DatabaseImporter(**importer_settings, pool=pool, lookups=lookups),
+        max_parallel=args.stage_workers, metrics=metrics
+    )
+    register_stages(scheduler, source_files(CURRENT_DIR), args)
+
     try:
-        # Conecta ao banco
-        if not importer.connect():
-            sys.exit(1)
-        count = 0
-        # Importa estados
-        if os.path.exists(FILES['estados']):
-            importer.import_estados_csv(FILES['estados'])
-            logging.info(f"Estados importados: {count}")
-        
-        # Importa municípios (antes dos hospitais devido à foreign key)
-        if os.path.exists(FILES['municipios']):
-            importer.import_municipios_csv(FILES['municipios'])
-           
-        
-        if os.path.exists(FILES['hospitais']):
-            importer.import_hospitais_csv(FILES['hospitais'])
-           
-        if os.path.exists(FILES['medicos']):
-            importer.import_medicos_csv(FILES['medicos'])
-            
-        
-        if os.path.exists(FILES['hospitais']):
-            importer.import_hospital_specialties(FILES['hospitais'])
-        
-        # Importa Excel (CID-10)
-        if os.path.exists(FILES['cid10']):
-            importer.import_excel_data(FILES['cid10'])
+        results = scheduler.run()
+        if 'pacientes' in results:
+            logging.info(f"Registros XML importados: {results['pacientes']}")
 
-            
-        if os.path.exists(FILES['pacientes']):
-            count = importer.import_xml_data(FILES['pacientes'])
-            logging.info(f"Registros XML importados: {count}")
-        else:
-            logging.warning(f"Arquivo não encontrado: {FILES['pacientes']}")
-        
         logging.info("=== IMPORTAÇÃO CONCLUÍDA ===")
-        
+
     except Exception as e:
         logging.error(f"Erro durante a importação: {e}")
         sys.exit(1)
-    
-    finally:
-        # Desconecta do banco
-        importer.disconnect()
 
+    finally:
+        pool.close()
+        metrics.close()
 
 if __name__ == "__main__":
     main()
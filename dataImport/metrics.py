@@ -0,0 +1,392 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Métricas por etapa e por lote da importação
+
+Cada etapa acumula linhas lidas, rejeitadas, inseridas e atualizadas, o tempo de
+leitura, transformação, carga de mapeamentos e banco, o histograma de latência
+dos statements, o pico de RSS e as coletas do GC. As métricas podem ser gravadas
+em JSON lines (um evento por statement e um por etapa), em um arquivo texto no
+formato do Prometheus (coletor textfile do node_exporter) e são resumidas em uma
+tabela no log ao fim da execução.
+
+Autor: Sistema de Importação
+Data: Setembro 2025
+"""
+
+import gc
+import json
+import logging
+import os
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+
+from config import METRICS_LATENCY_BUCKETS
+from table_specs import ROW_HASHES_SPEC, DIRTY_REGIONS_SPEC
+
+# Fases em que o tempo de uma etapa é dividido
+PHASE_PARSE = 'parse'
+PHASE_TRANSFORM = 'transform'
+PHASE_LOOKUP = 'lookup'
+PHASE_DB = 'db'
+PHASES = (PHASE_PARSE, PHASE_TRANSFORM, PHASE_LOOKUP, PHASE_DB)
+
+# Contadores de linhas da etapa
+ROWS_PARSED = 'parsed'
+ROWS_REJECTED = 'rejected'
+ROWS_INSERTED = 'inserted'
+ROWS_UPDATED = 'updated'
+
+# Tabelas de controle do delta, fora das contagens de linhas inseridas/atualizadas do resumo
+INTERNAL_TABLES = (ROW_HASHES_SPEC.table, DIRTY_REGIONS_SPEC.table)
+
+
+def current_rss():
+    """RSS atual do processo em bytes (None fora do Linux)"""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def split_affected(rows, affected):
+    """
+    Separa as linhas afetadas de um INSERT ... ON DUPLICATE KEY UPDATE em
+    inseridas e atualizadas: o MySQL conta 1 por inserção, 2 por atualização e 0
+    por linha que não mudou
+
+    Returns:
+        tuple: (inseridas, atualizadas)
+    """
+    updated = min(max(affected - rows, 0), rows)
+    inserted = min(max(affected - 2 * updated, 0), rows - updated)
+    return inserted, updated
+
+
+class StageMetrics:
+    def __init__(self, name, sink=None):
+        """
+        Métricas de uma etapa
+
+        Os contadores podem ser atualizados pelas threads gravadoras do pipeline;
+        as pausas do GC são atribuídas à etapa apenas quando a coleta acontece na
+        thread que chamou start().
+
+        Args:
+            name (str): Nome da etapa
+            sink (ImportMetrics): Destino dos eventos em JSON lines (None = sem eventos)
+        """
+        self.name = name
+        self.sink = sink
+        self.rows = Counter()
+        self.tables = defaultdict(Counter)
+        self.phases = defaultdict(float)
+        self.buckets = [0] * (len(METRICS_LATENCY_BUCKETS) + 1)
+        self.statements = 0
+        self.statement_seconds = 0.0
+        self.peak_rss = 0
+        self.gc_collections = Counter()
+        self.gc_pause_seconds = 0.0
+        self.seconds = 0.0
+        self.started_at = None
+        self.thread_id = None
+        self.gc_started_at = None
+        self.lock = threading.Lock()
+
+    def _on_gc(self, phase, info):
+        """Callback de gc.callbacks: mede as pausas ocorridas na thread da etapa"""
+        if threading.get_ident() != self.thread_id:
+            return
+        if phase == 'start':
+            self.gc_started_at = time.perf_counter()
+        elif self.gc_started_at is not None:
+            self.gc_pause_seconds += time.perf_counter() - self.gc_started_at
+            self.gc_collections[info['generation']] += 1
+            self.gc_started_at = None
+
+    def start(self):
+        """Início da etapa na thread atual"""
+        self.started_at = time.perf_counter()
+        self.thread_id = threading.get_ident()
+        self.sample_rss()
+        gc.callbacks.append(self._on_gc)
+
+    def finish(self):
+        """Fim da etapa: remove o callback do GC e emite o evento da etapa"""
+        if self.started_at is None:
+            return
+        if self._on_gc in gc.callbacks:
+            gc.callbacks.remove(self._on_gc)
+        self.seconds = time.perf_counter() - self.started_at
+        self.started_at = None
+        self.sample_rss()
+        if self.sink:
+            self.sink.emit('stage', **self.snapshot())
+
+    def sample_rss(self):
+        """Atualiza o pico de RSS com o valor atual"""
+        rss = current_rss()
+        if rss and rss > self.peak_rss:
+            self.peak_rss = rss
+
+    def count(self, kind, amount):
+        """Soma amount ao contador de linhas kind"""
+        if amount:
+            with self.lock:
+                self.rows[kind] += amount
+            self.sample_rss()
+
+    def add_time(self, phase, seconds):
+        """Soma seconds ao tempo da fase"""
+        with self.lock:
+            self.phases[phase] += seconds
+
+    @contextmanager
+    def timed(self, phase):
+        """Mede o bloco e soma o tempo à fase"""
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(phase, time.perf_counter() - started_at)
+
+    def record_statement(self, table, rows, affected, seconds):
+        """
+        Registra um statement de gravação (INSERT multi-linha ou upsert do LOAD DATA)
+
+        Args:
+            table (str): Tabela de destino
+            rows (int): Linhas enviadas
+            affected (int): Linhas afetadas informadas pelo MySQL
+            seconds (float): Duração do statement
+        """
+        inserted, updated = split_affected(rows, affected)
+        bucket = next(
+            (index for index, bound in enumerate(METRICS_LATENCY_BUCKETS) if seconds <= bound),
+            len(METRICS_LATENCY_BUCKETS)
+        )
+        with self.lock:
+            self.tables[table][ROWS_INSERTED] += inserted
+            self.tables[table][ROWS_UPDATED] += updated
+            self.phases[PHASE_DB] += seconds
+            self.buckets[bucket] += 1
+            self.statements += 1
+            self.statement_seconds += seconds
+        self.sample_rss()
+        if self.sink:
+            self.sink.emit(
+                'statement', stage=self.name, table=table, rows=rows, inserted=inserted, updated=updated,
+                seconds=round(seconds, 6), peak_rss_mb=round(self.peak_rss / (1024 * 1024), 1)
+            )
+
+    def written(self):
+        """Linhas inseridas e atualizadas nas tabelas de dados (sem as de controle do delta)"""
+        totals = Counter()
+        for table, counts in self.tables.items():
+            if table not in INTERNAL_TABLES:
+                totals.update(counts)
+        return totals
+
+    def latency_quantile(self, quantile):
+        """Limite superior do bucket que contém o quantil da latência dos statements"""
+        if not self.statements:
+            return None
+        target = quantile * self.statements
+        seen = 0
+        for bound, count in zip(METRICS_LATENCY_BUCKETS + (float('inf'),), self.buckets):
+            seen += count
+            if seen >= target:
+                return bound
+        return float('inf')
+
+    def snapshot(self):
+        """Métricas em um dicionário serializável (também usado para juntar processos)"""
+        with self.lock:
+            return {
+                'stage': self.name,
+                'seconds': round(self.seconds, 6),
+                'rows': dict(self.rows),
+                'tables': {table: dict(counts) for table, counts in self.tables.items()},
+                'phases': {phase: round(value, 6) for phase, value in self.phases.items()},
+                'statements': self.statements,
+                'statement_seconds': round(self.statement_seconds, 6),
+                'latency_buckets': list(self.buckets),
+                'peak_rss_bytes': self.peak_rss,
+                'gc_collections': {str(generation): count for generation, count in self.gc_collections.items()},
+                'gc_pause_seconds': round(self.gc_pause_seconds, 6)
+            }
+
+    def merge(self, snapshot):
+        """
+        Soma as métricas de um processo trabalhador (o pico de RSS é o maior
+        entre os processos, não a soma)
+        """
+        with self.lock:
+            self.rows.update(snapshot['rows'])
+            for table, counts in snapshot['tables'].items():
+                self.tables[table].update(counts)
+            for phase, value in snapshot['phases'].items():
+                self.phases[phase] += value
+            self.buckets = [mine + theirs for mine, theirs in zip(self.buckets, snapshot['latency_buckets'])]
+            self.statements += snapshot['statements']
+            self.statement_seconds += snapshot['statement_seconds']
+            self.peak_rss = max(self.peak_rss, snapshot['peak_rss_bytes'])
+            for generation, count in snapshot['gc_collections'].items():
+                self.gc_collections[int(generation)] += count
+            self.gc_pause_seconds += snapshot['gc_pause_seconds']
+
+
+# Famílias do arquivo do Prometheus, na ordem em que são gravadas: (nome, tipo, descrição)
+PROMETHEUS_FAMILIES = (
+    ('import_stage_seconds', 'gauge', 'Duração da etapa'),
+    ('import_rows_total', 'counter', 'Linhas lidas e rejeitadas por etapa'),
+    ('import_table_rows_total', 'counter', 'Linhas inseridas e atualizadas por etapa e tabela'),
+    ('import_phase_seconds_total', 'counter', 'Tempo por fase da etapa'),
+    ('import_statement_seconds', 'histogram', 'Latência dos statements de gravação'),
+    ('import_peak_rss_bytes', 'gauge', 'Maior RSS observado durante a etapa'),
+    ('import_gc_collections_total', 'counter', 'Coletas do GC por geração'),
+    ('import_gc_pause_seconds_total', 'counter', 'Tempo parado em coletas do GC'),
+)
+
+
+def _stage_samples(name, snapshot):
+    """
+    Amostras do Prometheus de uma etapa
+
+    Args:
+        name (str): Nome da etapa
+        snapshot (dict): StageMetrics.snapshot() da etapa
+
+    Returns:
+        dict: Linhas de amostra de cada família de PROMETHEUS_FAMILIES
+    """
+    label = f'stage="{name}"'
+    samples = {family: [] for family, _, _ in PROMETHEUS_FAMILIES}
+    samples['import_stage_seconds'].append(f'import_stage_seconds{{{label}}} {snapshot["seconds"]}')
+    for kind in (ROWS_PARSED, ROWS_REJECTED):
+        samples['import_rows_total'].append(
+            f'import_rows_total{{{label},kind="{kind}"}} {snapshot["rows"].get(kind, 0)}'
+        )
+    for table, counts in snapshot['tables'].items():
+        for kind in (ROWS_INSERTED, ROWS_UPDATED):
+            samples['import_table_rows_total'].append(
+                f'import_table_rows_total{{{label},table="{table}",kind="{kind}"}} {counts.get(kind, 0)}'
+            )
+    for phase in PHASES:
+        samples['import_phase_seconds_total'].append(
+            f'import_phase_seconds_total{{{label},phase="{phase}"}} {snapshot["phases"].get(phase, 0)}'
+        )
+    histogram = samples['import_statement_seconds']
+    cumulative = 0
+    for bound, count in zip(METRICS_LATENCY_BUCKETS + ('+Inf',), snapshot['latency_buckets']):
+        cumulative += count
+        histogram.append(f'import_statement_seconds_bucket{{{label},le="{bound}"}} {cumulative}')
+    histogram.append(f'import_statement_seconds_sum{{{label}}} {snapshot["statement_seconds"]}')
+    histogram.append(f'import_statement_seconds_count{{{label}}} {snapshot["statements"]}')
+    samples['import_peak_rss_bytes'].append(f'import_peak_rss_bytes{{{label}}} {snapshot["peak_rss_bytes"]}')
+    for generation, count in snapshot['gc_collections'].items():
+        samples['import_gc_collections_total'].append(
+            f'import_gc_collections_total{{{label},generation="{generation}"}} {count}'
+        )
+    samples['import_gc_pause_seconds_total'].append(
+        f'import_gc_pause_seconds_total{{{label}}} {snapshot["gc_pause_seconds"]}'
+    )
+    return samples
+
+
+class ImportMetrics:
+    def __init__(self, jsonl_path=None, prometheus_path=None):
+        """
+        Métricas de uma execução, com uma StageMetrics por etapa
+
+        Args:
+            jsonl_path (str): Arquivo de eventos em JSON lines (None = sem eventos)
+            prometheus_path (str): Arquivo texto no formato do Prometheus, gravado no
+                close() (None = não grava)
+        """
+        self.jsonl_path = jsonl_path
+        self.prometheus_path = prometheus_path
+        self.stages = {}
+        self.file = open(jsonl_path, 'a', encoding='utf-8') if jsonl_path else None
+        self.lock = threading.Lock()
+
+    def stage(self, name):
+        """Cria as métricas de uma etapa"""
+        stage_metrics = StageMetrics(name, self if self.file else None)
+        with self.lock:
+            self.stages[name] = stage_metrics
+        return stage_metrics
+
+    def emit(self, event, **fields):
+        """Grava um evento em JSON lines"""
+        if self.file is None:
+            return
+        line = json.dumps({'ts': datetime.now().isoformat(timespec='milliseconds'), 'event': event, **fields},
+                          ensure_ascii=False)
+        with self.lock:
+            self.file.write(line + '\n')
+            self.file.flush()
+
+    def prometheus_text(self):
+        """
+        Métricas de todas as etapas no formato texto do Prometheus: cada família
+        (HELP, TYPE e as amostras de todas as etapas) forma um grupo contínuo
+        """
+        samples = [_stage_samples(name, stage_metrics.snapshot()) for name, stage_metrics in self.stages.items()]
+        lines = []
+        for family, kind, description in PROMETHEUS_FAMILIES:
+            lines.append(f'# HELP {family} {description}')
+            lines.append(f'# TYPE {family} {kind}')
+            for stage_samples in samples:
+                lines.extend(stage_samples[family])
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self):
+        """Grava o arquivo do Prometheus de forma atômica (o coletor nunca lê um arquivo pela metade)"""
+        directory = os.path.dirname(os.path.abspath(self.prometheus_path))
+        os.makedirs(directory, exist_ok=True)
+        temporary = f"{self.prometheus_path}.{os.getpid()}.tmp"
+        with open(temporary, 'w', encoding='utf-8') as prometheus_file:
+            prometheus_file.write(self.prometheus_text())
+        os.replace(temporary, self.prometheus_path)
+
+    def log_summary(self):
+        """Tabela com as métricas de cada etapa"""
+        logging.info(
+            f"{'etapa':<16} {'lidas':>10} {'rejeit.':>8} {'inseridas':>10} {'atualiz.':>9} {'leitura':>8} "
+            f"{'transf.':>8} {'mapeam.':>8} {'banco':>8} {'stmts':>6} {'p95':>7} {'RSS MB':>7} {'GC':>5} {'pausa':>6}"
+        )
+        for name, stage_metrics in self.stages.items():
+            written = stage_metrics.written()
+            phases = stage_metrics.phases
+            p95 = stage_metrics.latency_quantile(0.95)
+            if p95 is None:
+                p95 = '-'
+            elif p95 == float('inf'):
+                p95 = f">{METRICS_LATENCY_BUCKETS[-1]}"
+            else:
+                p95 = f"≤{p95}"
+            logging.info(
+                f"{name:<16} {stage_metrics.rows[ROWS_PARSED]:>10} {stage_metrics.rows[ROWS_REJECTED]:>8} "
+                f"{written[ROWS_INSERTED]:>10} {written[ROWS_UPDATED]:>9} {phases[PHASE_PARSE]:>7.1f}s "
+                f"{phases[PHASE_TRANSFORM]:>7.1f}s {phases[PHASE_LOOKUP]:>7.1f}s {phases[PHASE_DB]:>7.1f}s "
+                f"{stage_metrics.statements:>6} {p95:>7} {stage_metrics.peak_rss / (1024 * 1024):>7.0f} "
+                f"{sum(stage_metrics.gc_collections.values()):>5} {stage_metrics.gc_pause_seconds:>5.2f}s"
+            )
+
+    def close(self):
+        """Registra o resumo, grava o arquivo do Prometheus e fecha o de eventos"""
+        self.log_summary()
+        if self.prometheus_path:
+            try:
+                self.write_prometheus()
+                logging.info(f"Métricas do Prometheus gravadas em {self.prometheus_path}")
+            except OSError as e:
+                logging.warning(f"Erro ao gravar as métricas do Prometheus: {e}")
+        if self.file is not None:
+            self.file.close()
+            self.file = None
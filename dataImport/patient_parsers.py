@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Backends de parsing do pacientes.xml
+
+Cada backend recebe um caminho ou objeto com read() e produz tuplas com os
+campos de cada <Paciente> na ordem de PATIENT_FIELDS, já sem espaços nas pontas.
+
+Uso para comparar os backends com o laço original:
+    python patient_parsers.py pacientes.xml [original|etree|lxml|expat ...]
+
+Autor: Sistema de Importação
+Data: Setembro 2025
+"""
+
+import gc
+import sys
+import time
+import tracemalloc
+import xml.etree.ElementTree as ET
+from xml.parsers import expat
+
+# Campos de <Paciente> na ordem esperada por build_patient_row
+PATIENT_FIELDS = ('Codigo', 'CPF', 'Nome_Completo', 'Genero', 'Cod_municipio', 'Bairro', 'Convenio', 'CID-10')
+
+RECORD_TAG = 'Paciente'
+
+
+def iter_patients_etree(source):
+    """
+    Backend xml.etree.ElementTree (caminho original): iterparse + findtext por campo
+
+    O elemento e a raiz são limpos a cada registro, sem chamadas ao gc.
+    """
+    context = ET.iterparse(source, events=('start', 'end'))
+    event, root = next(context)
+
+    for event, elem in context:
+        if event == 'end' and elem.tag == RECORD_TAG:
+            yield tuple(elem.findtext(tag, '').strip() for tag in PATIENT_FIELDS)
+            elem.clear()
+            root.clear()
+
+
+def iter_patients_lxml(source):
+    """
+    Backend lxml.etree.iterparse filtrando apenas <Paciente>
+
+    Os campos são lidos em uma única passada pelos filhos e os irmãos já
+    processados são removidos da árvore.
+    """
+    from lxml import etree
+
+    positions = {tag: index for index, tag in enumerate(PATIENT_FIELDS)}
+    empty = [''] * len(PATIENT_FIELDS)
+
+    for event, elem in etree.iterparse(source, events=('end',), tag=RECORD_TAG):
+        fields = empty[:]
+        for child in elem:
+            index = positions.get(child.tag)
+            if index is not None and child.text:
+                fields[index] = child.text.strip()
+        yield tuple(fields)
+
+        elem.clear(keep_tail=True)
+        while elem.getprevious() is not None:
+            del elem.getparent()[0]
+
+
+def iter_patients_expat(source, chunk_size=1 << 20):
+    """
+    Backend SAX com expat: emite as tuplas direto dos eventos, sem criar Elements
+    """
+    positions = {tag: index for index, tag in enumerate(PATIENT_FIELDS)}
+    records = []
+    fields = None
+    current = None
+    text = []
+
+    def start_element(name, attrs):
+        nonlocal fields, current
+        if name == RECORD_TAG:
+            fields = [''] * len(PATIENT_FIELDS)
+        elif fields is not None:
+            current = positions.get(name)
+            text.clear()
+
+    def end_element(name):
+        nonlocal fields, current
+        if name == RECORD_TAG:
+            if fields is not None:
+                records.append(tuple(fields))
+            fields = None
+        elif current is not None:
+            fields[current] = ''.join(text).strip()
+            current = None
+
+    def character_data(data):
+        if current is not None:
+            text.append(data)
+
+    parser = expat.ParserCreate()
+    parser.buffer_text = True
+    parser.buffer_size = 1 << 16
+    parser.StartElementHandler = start_element
+    parser.EndElementHandler = end_element
+    parser.CharacterDataHandler = character_data
+
+    handle = open(source, 'rb') if isinstance(source, str) else source
+    try:
+        while True:
+            chunk = handle.read(chunk_size)
+            parser.Parse(chunk, not chunk)
+            if records:
+                yield from records
+                records.clear()
+            if not chunk:
+                break
+    finally:
+        if handle is not source:
+            handle.close()
+
+
+PARSER_BACKENDS = {
+    'etree': iter_patients_etree,
+    'lxml': iter_patients_lxml,
+    'expat': iter_patients_expat
+}
+
+
+def iter_patient_records(source, backend='etree'):
+    """
+    Itera os registros de <Paciente> usando o backend escolhido
+
+    Args:
+        source (str | objeto com read()): Caminho ou arquivo XML
+        backend (str): Nome do backend em PARSER_BACKENDS
+
+    Returns:
+        iterator: Tuplas de campos na ordem de PATIENT_FIELDS
+    """
+    try:
+        parse = PARSER_BACKENDS[backend]
+    except KeyError:
+        raise ValueError(f"Backend de parsing desconhecido: {backend}")
+    return parse(source)
+
+
+def _iter_patients_original(source):
+    """
+    Laço de parsing anterior aos backends (findtext + root.clear a cada 100 e
+    gc.collect a cada 1000 registros), mantido apenas como referência no benchmark
+    """
+    context = ET.iterparse(source, events=('start', 'end'))
+    event, root = next(context)
+    count = 0
+
+    for event, elem in context:
+        if event == 'end' and elem.tag == RECORD_TAG:
+            yield tuple(elem.findtext(tag, '').strip() for tag in PATIENT_FIELDS)
+            elem.clear()
+            count += 1
+            if count % 100 == 0:
+                root.clear()
+                if count % 1000 == 0:
+                    gc.collect()
+
+
+def benchmark_backends(xml_file_path, backends=('original',) + tuple(PARSER_BACKENDS)):
+    """
+    Mede tempo, registros/s e pico de memória alocada de cada backend
+
+    O tempo é medido em uma passada sem tracemalloc e o pico de memória em outra,
+    já que o rastreamento de alocações distorce o tempo.
+
+    Returns:
+        list: Um dicionário de resultados por backend
+    """
+    results = []
+    for backend in backends:
+        parse = _iter_patients_original if backend == 'original' else PARSER_BACKENDS[backend]
+
+        started_at = time.perf_counter()
+        count = sum(1 for _ in parse(xml_file_path))
+        elapsed = time.perf_counter() - started_at
+
+        tracemalloc.start()
+        for _ in parse(xml_file_path):
+            pass
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        results.append({
+            'backend': backend,
+            'records': count,
+            'seconds': elapsed,
+            'records_per_second': count / elapsed if elapsed else 0,
+            'peak_mb': peak / (1024 * 1024)
+        })
+    return results
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print("Uso: python patient_parsers.py pacientes.xml [backend ...]")
+        sys.exit(1)
+
+    selected = tuple(sys.argv[2:]) or ('original',) + tuple(PARSER_BACKENDS)
+    print(f"{'backend':<9} {'registros':>10} {'segundos':>9} {'registros/s':>12} {'pico MB':>8}")
+    for result in benchmark_backends(sys.argv[1], selected):
+        print(
+            f"{result['backend']:<9} {result['records']:>10} {result['seconds']:>9.2f} "
+            f"{result['records_per_second']:>12.0f} {result['peak_mb']:>8.1f}"
+        )
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Gravação em pipeline: o parser produz lotes e threads gravadoras os enviam ao banco
+Autor: Sistema de Importação
+Data: Setembro 2025
+"""
+
+import logging
+import queue
+import threading
+import time
+
+_STOP = object()
+
+
+class PipelineStats:
+    def __init__(self, name):
+        """Contadores de uma thread do pipeline"""
+        self.name = name
+        self.batches = 0
+        self.rows = 0
+        self.busy_seconds = 0.0
+        self.blocked_seconds = 0.0
+
+
+class PipelinedWriter:
+    # Os lotes são confirmados pelas threads gravadoras depois que write() retorna
+    commits_on_write = False
+
+    def __init__(self, importer, spec, batch_size, writers=2, queue_size=4):
+        """
+        Envia lotes para threads gravadoras através de uma fila limitada, permitindo
+        que o parsing continue enquanto os lotes anteriores são gravados
+
+        Cada thread abre sua própria conexão (conexões pymysql não são thread-safe).
+        O limite da fila define quantos lotes prontos podem ficar em memória.
+
+        Args:
+            importer (DatabaseImporter): Importador de origem das configurações de conexão
+            spec (TableSpec): Tabela de destino
+            batch_size (int): Tamanho de cada lote enviado à fila (None = cada write() é um lote)
+            writers (int): Número de threads gravadoras
+            queue_size (int): Número máximo de lotes aguardando gravação
+        """
+        self.spec = spec
+        self.batch_size = batch_size
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.producer_stats = PipelineStats('parser')
+        self.writer_stats = []
+        self.errors = []
+        self.count = 0
+        self.closed = False
+        self.threads = []
+
+        for index in range(writers):
+            stats = PipelineStats(f"writer-{index + 1}")
+            self.writer_stats.append(stats)
+            thread = threading.Thread(
+                target=self._run_writer,
+                args=(importer.clone(), stats),
+                name=f"{spec.table}-{stats.name}",
+                daemon=True
+            )
+            self.threads.append(thread)
+            thread.start()
+
+    def _run_writer(self, importer, stats):
+        """Laço de uma thread gravadora"""
+        try:
+            importer.connect()
+            with importer.open_writer(self.spec) as writer:
+                while True:
+                    waiting_since = time.perf_counter()
+                    batch = self.queue.get()
+                    stats.blocked_seconds += time.perf_counter() - waiting_since
+
+                    if batch is _STOP or self.errors:
+                        break
+
+                    started_at = time.perf_counter()
+                    writer.write(batch)
+                    stats.busy_seconds += time.perf_counter() - started_at
+                    stats.batches += 1
+                    stats.rows += len(batch)
+        except BaseException as e:
+            # execute_values encerra com sys.exit; na thread o erro é repassado ao produtor
+            self.errors.append(f"{stats.name}: {e!r}")
+        finally:
+            importer.disconnect()
+
+    def _put(self, item):
+        """Coloca um item na fila, interrompendo se alguma thread gravadora falhar"""
+        waiting_since = time.perf_counter()
+        while True:
+            if self.errors and item is not _STOP:
+                raise RuntimeError(f"Falha na gravação em pipeline de {self.spec.table}: {self.errors[0]}")
+            try:
+                self.queue.put(item, timeout=0.5)
+                break
+            except queue.Full:
+                if not any(thread.is_alive() for thread in self.threads):
+                    if item is _STOP:
+                        return
+                    raise RuntimeError(f"Nenhuma thread gravadora ativa para {self.spec.table}")
+        self.producer_stats.blocked_seconds += time.perf_counter() - waiting_since
+
+    def write(self, rows):
+        """
+        Divide as linhas em lotes e os envia para a fila
+
+        A lista recebida passa a pertencer ao gravador e não deve ser reutilizada.
+        """
+        step = self.batch_size or len(rows)
+        for i in range(0, len(rows), step):
+            batch = rows[i:i + step] if len(rows) > step else rows
+            self._put(batch)
+            self.producer_stats.batches += 1
+            self.producer_stats.rows += len(batch)
+
+    def _stop_writers(self):
+        for _ in self.threads:
+            self._put(_STOP)
+        for thread in self.threads:
+            thread.join()
+
+    def close(self):
+        """Aguarda as threads gravarem os lotes pendentes e registra o relatório"""
+        if self.closed:
+            return self.count
+        self.closed = True
+        self._stop_writers()
+
+        if self.errors:
+            raise RuntimeError(f"Falha na gravação em pipeline de {self.spec.table}: {self.errors[0]}")
+
+        self.count = sum(stats.rows for stats in self.writer_stats)
+        self.log_report()
+        return self.count
+
+    def discard(self):
+        """Encerra as threads descartando os lotes ainda na fila"""
+        if self.closed:
+            return
+        self.closed = True
+        self.errors.append('descartado')
+        while True:
+            try:
+                self.queue.get_nowait()
+            except queue.Empty:
+                break
+        self._stop_writers()
+
+    def log_report(self):
+        """Registra tempo ocupado/bloqueado de cada thread para identificar o gargalo"""
+        producer = self.producer_stats
+        logging.info(
+            f"{self.spec.table} pipeline - {producer.name}: {producer.batches} lotes, "
+            f"bloqueado {producer.blocked_seconds:.1f}s aguardando espaço na fila"
+        )
+        writers_blocked = 0.0
+        for stats in self.writer_stats:
+            writers_blocked += stats.blocked_seconds
+            logging.info(
+                f"{self.spec.table} pipeline - {stats.name}: {stats.batches} lotes, {stats.rows} linhas, "
+                f"ocupado {stats.busy_seconds:.1f}s, bloqueado {stats.blocked_seconds:.1f}s aguardando lotes"
+            )
+
+        # Gravadoras ociosas esperando lotes indicam parser lento; parser bloqueado indica banco lento
+        average_writer_blocked = writers_blocked / len(self.writer_stats) if self.writer_stats else 0.0
+        bottleneck = 'banco de dados' if producer.blocked_seconds > average_writer_blocked else 'parsing'
+        logging.info(f"{self.spec.table} pipeline - gargalo provável: {bottleneck}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+        return False
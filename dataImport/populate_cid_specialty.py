@@ -74,29 +74,46 @@ class CidSpecialtyPopulator:
             return {}
     
     def populate_unique_specialties(self, unique_specialties):
-        """Popula a tabela specialties_unique com especialidades únicas do CSV"""
+        """
+        Popula a tabela specialties_unique com especialidades únicas do CSV
+
+        Os nomes vão para uma tabela temporária (mesma coluna e collation de
+        specialties_unique); um único INSERT ... SELECT cadastra os novos e um único
+        JOIN devolve o id de cada nome, em vez de um INSERT e um SELECT por especialidade.
+        """
+        names = [(name,) for name in sorted(unique_specialties)]
+        if not names:
+            return {}
+
+        staging_table = 'specialty_names_staging'
         try:
             with self.connection.cursor() as cursor:
-                specialty_dict = {}
-                
-                for specialty in unique_specialties:
-                    insert_sql = """
-                    INSERT INTO specialties_unique (name, created_at, updated_at) 
-                    VALUES (%s, NOW(), NOW())
-                    ON DUPLICATE KEY UPDATE 
+                cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS {staging_table}")
+                cursor.execute(f"CREATE TEMPORARY TABLE {staging_table} SELECT name FROM specialties_unique LIMIT 0")
+                for i in range(0, len(names), BATCH_SIZE):
+                    cursor.executemany(f"INSERT INTO {staging_table} (name) VALUES (%s)", names[i:i + BATCH_SIZE])
+
+                cursor.execute(f"""
+                    INSERT INTO specialties_unique (name, created_at, updated_at)
+                    SELECT DISTINCT name, NOW(), NOW() FROM {staging_table}
+                    ON DUPLICATE KEY UPDATE
                     updated_at = NOW()
-                    """
-                    cursor.execute(insert_sql, (specialty,))
-                    
-                    cursor.execute("SELECT id FROM specialties_unique WHERE name = %s", (specialty,))
-                    result = cursor.fetchone()
-                    if result:
-                        specialty_dict[specialty] = result['id']
-                
-                self.connection.commit()
-                logging.info(f"Populadas {len(specialty_dict)} especialidades na tabela specialties_unique")
-                return specialty_dict
-                
+                """)
+
+                # O JOIN usa a collation da coluna, então variações de maiúsculas/acentos
+                # de um mesmo nome recebem o mesmo id, como na busca por nome
+                cursor.execute(f"""
+                    SELECT n.name, s.id
+                    FROM {staging_table} n
+                    JOIN specialties_unique s ON s.name = n.name
+                """)
+                specialty_dict = {row['name']: row['id'] for row in cursor.fetchall()}
+                cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS {staging_table}")
+
+            self.connection.commit()
+            logging.info(f"Populadas {len(specialty_dict)} especialidades na tabela specialties_unique")
+            return specialty_dict
+
         except Exception as e:
             logging.error(f"Erro ao popular especialidades únicas: {e}")
             self.connection.rollback()
@@ -111,28 +128,33 @@ class CidSpecialtyPopulator:
             return None
         
         try:
-            df = pd.read_csv(csv_file, usecols=['especialidade', 'cid_codigo'])
+            df = pd.read_csv(csv_file, usecols=['especialidade', 'cid_codigo'], dtype=str)
             logging.info(f"Carregados {len(df)} registros do arquivo CSV")
             return df
         except Exception as e:
             logging.error(f"Erro ao carregar arquivo CSV: {e}")
             return None
     
+    @staticmethod
+    def explode_column(series):
+        """Separa os valores de uma coluna por ';' em uma linha por valor, sem espaços nas pontas"""
+        values = series.dropna().astype(str).str.split(';').explode().str.strip()
+        return values[values != '']
+    
     def process_relationships(self, df, cid_dict, specialty_dict):
         """Processa os relacionamentos e retorna lista única de relacionamentos"""
-        relationships = set()
+        # Produto especialidade x CID de cada linha, montado por explode em vez de laços aninhados
+        pairs = pd.DataFrame({
+            'specialty_id': self.explode_column(df['especialidade']).map(specialty_dict)
+        }).join(
+            self.explode_column(df['cid_codigo']).map(cid_dict).rename('cid_id')
+        )
+        pairs = pairs.dropna().astype('int64').drop_duplicates()
         
-        for _, row in df.iterrows():
-            specialties = [spec.strip() for spec in str(row['especialidade']).split(';')]
-            cids = [cid.strip() for cid in str(row['cid_codigo']).split(';')]
-            
-            for specialty in specialties:
-                for cid in cids:
-                    if specialty in specialty_dict and cid in cid_dict:
-                        relationships.add((cid_dict[cid], specialty_dict[specialty]))
+        relationships = list(zip(pairs['cid_id'].tolist(), pairs['specialty_id'].tolist()))
         
         logging.info(f"Processados {len(relationships)} relacionamentos únicos")
-        return list(relationships)
+        return relationships
     
     def insert_relationships(self, relationships):
         """Insere os relacionamentos na tabela cid_specialty"""
@@ -225,10 +247,7 @@ class CidSpecialtyPopulator:
             if df is None:
                 return False
             
-            all_specialties = set()
-            for _, row in df.iterrows():
-                specialties = [spec.strip() for spec in str(row['especialidade']).split(';')]
-                all_specialties.update(specialties)
+            all_specialties = set(self.explode_column(df['especialidade']).unique())
             
             logging.info(f"Encontradas {len(all_specialties)} especialidades únicas no CSV")
             
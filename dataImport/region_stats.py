@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Agregados por cidade e por estado gravados em region_stats
+
+Cada linha de region_stats é (escopo, região, métrica, dimensão, valor). Os totais
+usam a dimensão vazia; as contagens por gênero, CID e especialidade usam o valor
+da dimensão. Os agregados por estado são a soma dos agregados das suas cidades.
+
+Autor: Sistema de Importação
+Data: Setembro 2025
+"""
+
+from itertools import repeat
+
+import pandas as pd
+
+from config import REGION_STATS_FOLD_ROWS
+
+SCOPE_CITY = 'city'
+SCOPE_STATE = 'state'
+
+# Dimensão das métricas sem detalhamento (totais)
+TOTAL = ''
+
+# Chave de cada contagem
+KEY_COLUMNS = ['region_id', 'metric', 'dimension']
+
+
+class RegionStatsAccumulator:
+    def __init__(self, fold_rows=REGION_STATS_FOLD_ROWS):
+        """
+        Acumula as contagens por cidade bloco a bloco: cada bloco é reduzido a uma
+        contagem por (cidade, métrica, dimensão), e as contagens parciais são
+        somadas aos totais assim que passam de fold_rows linhas ou do tamanho dos
+        totais. A memória fica limitada a cerca de duas vezes o número de chaves
+        distintas mais fold_rows, sem depender do número de linhas lidas.
+
+        Args:
+            fold_rows (int): Linhas parciais acumuladas antes de somá-las aos totais
+        """
+        self.fold_rows = fold_rows
+        self.totals = None
+        self.parts = []
+        self.pending_rows = 0
+
+    @property
+    def retained_rows(self):
+        """Linhas guardadas: totais mais contagens parciais ainda não somadas"""
+        return (0 if self.totals is None else len(self.totals)) + self.pending_rows
+
+    def _fold(self):
+        """Soma as contagens parciais aos totais"""
+        if not self.parts:
+            return
+        frames = self.parts if self.totals is None else [self.totals] + self.parts
+        self.totals = (
+            pd.concat(frames, ignore_index=True)
+            .groupby(KEY_COLUMNS, sort=False)['value'].sum()
+            .reset_index()
+        )
+        self.parts = []
+        self.pending_rows = 0
+
+    def _add(self, metric, cities, dimensions=None, values=None):
+        """Soma values (ou 1 por linha) por cidade e dimensão"""
+        frame = pd.DataFrame({
+            'region_id': cities,
+            'dimension': TOTAL if dimensions is None else dimensions,
+            'value': 1 if values is None else values
+        }).dropna(subset=['region_id', 'dimension'])
+        if frame.empty:
+            return
+        frame['dimension'] = frame['dimension'].astype(str)
+        totals = frame.groupby(['region_id', 'dimension'], sort=False)['value'].sum().reset_index()
+        totals['metric'] = metric
+        self.parts.append(totals)
+        self.pending_rows += len(totals)
+        if self.pending_rows >= max(self.fold_rows, 0 if self.totals is None else len(self.totals)):
+            self._fold()
+
+    def add_patients(self, chunk):
+        """
+        Args:
+            chunk (DataFrame): Colunas city, gender, has_insurance, cid_id
+        """
+        self._add('patients', chunk['city'])
+        insured = chunk[chunk['has_insurance'].fillna(0).astype(bool)]
+        self._add('patients_insured', insured['city'])
+        self._add('patients_gender', chunk['city'], chunk['gender'])
+        self._add('patients_cid', chunk['city'], chunk['cid_id'].astype('Int64'))
+
+    def add_doctors(self, chunk):
+        """
+        Args:
+            chunk (DataFrame): Colunas city (id da cidade), specialty
+        """
+        self._add('doctors', chunk['city'])
+        self._add('doctors_specialty', chunk['city'], chunk['specialty'])
+
+    def add_hospitals(self, chunk):
+        """
+        Args:
+            chunk (DataFrame): Colunas city, total_beds
+        """
+        self._add('hospitals', chunk['city'])
+        self._add('beds', chunk['city'], values=chunk['total_beds'].fillna(0))
+
+    def rows(self, current_time):
+        """
+        Tuplas de REGION_STATS_SPEC com as contagens somadas de todos os blocos
+
+        Returns:
+            list: Tuplas (scope, region_id, metric, dimension, value, created_at, updated_at)
+        """
+        self._fold()
+        if self.totals is None:
+            return []
+        totals = self.totals.sort_values(KEY_COLUMNS, ignore_index=True)
+        return list(zip(
+            repeat(SCOPE_CITY),
+            totals['region_id'].astype('int64').tolist(),
+            totals['metric'].tolist(),
+            totals['dimension'].tolist(),
+            totals['value'].astype('int64').tolist(),
+            repeat(current_time),
+            repeat(current_time)
+        ))
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Lotes de linhas em colunas, com os valores constantes guardados uma vez por lote
+
+As transformações guardam cada coluna do lote em uma lista, em vez de uma
+tupla por linha; colunas com o mesmo valor em todas as linhas (created_at e
+updated_at) são um Constant. Os gravadores formatam cada constante uma única
+vez e montam o VALUES ou a linha do TSV direto das colunas.
+
+Autor: Sistema de Importação
+Data: Setembro 2025
+"""
+
+from itertools import compress, repeat
+
+
+class Constant:
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        """Coluna com o mesmo valor em todas as linhas do lote"""
+        self.value = value
+
+
+class RowBatch:
+    __slots__ = ('columns', 'length')
+
+    def __init__(self, columns, length=None):
+        """
+        Lote de linhas guardado por coluna
+
+        Args:
+            columns (list): Uma entrada por coluna da TableSpec, na ordem de spec.columns:
+                lista com um valor por linha ou Constant
+            length (int): Número de linhas (None = tamanho da primeira coluna que não é Constant)
+        """
+        self.columns = list(columns)
+        if length is None:
+            length = next((len(values) for values in self.columns if not isinstance(values, Constant)), 0)
+        self.length = length
+
+    def __len__(self):
+        return self.length
+
+    def _column_iters(self):
+        return [
+            repeat(values.value, self.length) if isinstance(values, Constant) else values
+            for values in self.columns
+        ]
+
+    def __iter__(self):
+        """Tuplas das linhas, montadas só durante a iteração (modo delta)"""
+        return zip(*self._column_iters())
+
+    def __getitem__(self, index):
+        """Fatia do lote (novo RowBatch) ou tupla de uma linha"""
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self.length)
+            return RowBatch(
+                [values if isinstance(values, Constant) else values[index] for values in self.columns],
+                len(range(start, stop, step))
+            )
+        return tuple(values.value if isinstance(values, Constant) else values[index] for values in self.columns)
+
+    def select(self, mask):
+        """
+        Linhas em que mask é verdadeira
+
+        Args:
+            mask (list): Um booleano por linha
+
+        Returns:
+            RowBatch: Novo lote com as linhas selecionadas
+        """
+        mask = list(mask)
+        return RowBatch(
+            [values if isinstance(values, Constant) else list(compress(values, mask)) for values in self.columns],
+            sum(mask)
+        )
+
+    def formatted(self, formatters):
+        """
+        Valores formatados de cada linha, uma coluna por vez; a constante de uma
+        coluna é formatada uma única vez para o lote inteiro
+
+        Args:
+            formatters (list): Uma função por coluna, do valor para o texto
+
+        Returns:
+            iterator: Tuplas de textos, uma por linha
+        """
+        parts = []
+        for format_value, values in zip(formatters, self.columns):
+            if isinstance(values, Constant):
+                parts.append(repeat(format_value(values.value), self.length))
+            else:
+                parts.append(map(format_value, values))
+        return zip(*parts)
+
+
+def select_rows(rows, mask):
+    """Linhas em que mask é verdadeira, de uma lista de tuplas ou de um RowBatch"""
+    if isinstance(rows, RowBatch):
+        return rows.select(mask)
+    return list(compress(rows, mask))
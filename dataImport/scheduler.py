@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Execução das etapas de importação respeitando as dependências entre elas
+Autor: Sistema de Importação
+Data: Setembro 2025
+"""
+
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+
+class Stage:
+    def __init__(self, name, run, depends_on=()):
+        """
+        Etapa de importação
+
+        Args:
+            name (str): Nome da etapa
+            run (callable): Recebe um DatabaseImporter conectado e executa a etapa
+            depends_on (tuple): Etapas que precisam terminar antes desta
+        """
+        self.name = name
+        self.run = run
+        self.depends_on = tuple(depends_on)
+        self.result = None
+        self.ready_at = None
+        self.started_at = None
+        self.finished_at = None
+
+    @property
+    def seconds(self):
+        return self.finished_at - self.started_at
+
+
+class StageScheduler:
+    def __init__(self, importer_factory, max_parallel=1, metrics=None):
+        """
+        Executa as etapas em paralelo assim que suas dependências terminam
+
+        Cada etapa roda em uma thread com um importador e uma conexão próprios,
+        então no máximo max_parallel conexões ficam abertas ao mesmo tempo.
+
+        Args:
+            importer_factory (callable): Cria um DatabaseImporter sem conexão
+            max_parallel (int): Número máximo de etapas simultâneas
+            metrics (ImportMetrics): Recebe as métricas de cada etapa (None = métricas descartadas)
+        """
+        self.importer_factory = importer_factory
+        self.max_parallel = max(1, max_parallel)
+        self.metrics = metrics
+        self.stages = {}
+
+    def add(self, name, run, depends_on=()):
+        """Registra uma etapa (na ordem de registro quando várias estão prontas)"""
+        if name in self.stages:
+            raise ValueError(f"Etapa duplicada: {name}")
+        self.stages[name] = Stage(name, run, depends_on)
+
+    def _dependencies(self, stage):
+        """Dependências registradas da etapa (etapas sem arquivo de origem não são registradas)"""
+        return [name for name in stage.depends_on if name in self.stages]
+
+    def _check_cycles(self):
+        """Garante que as dependências formam um grafo acíclico"""
+        visiting = set()
+        done = set()
+
+        def visit(name, path):
+            if name in done:
+                return
+            if name in visiting:
+                raise ValueError(f"Dependência circular entre etapas: {' -> '.join(path + [name])}")
+            visiting.add(name)
+            for dependency in self._dependencies(self.stages[name]):
+                visit(dependency, path + [name])
+            visiting.discard(name)
+            done.add(name)
+
+        for name in self.stages:
+            visit(name, [])
+
+    def _run_stage(self, stage):
+        """Executa uma etapa com importador e conexão próprios"""
+        importer = self.importer_factory()
+        if self.metrics:
+            importer.metrics = self.metrics.stage(stage.name)
+        stage.started_at = time.perf_counter()
+        logging.info(f"Etapa {stage.name} iniciada")
+        try:
+            importer.metrics.start()
+            importer.connect()
+            stage.result = stage.run(importer)
+            importer.commit()
+        except SystemExit:
+            # Os métodos do importador encerram o processo em caso de erro;
+            # na thread isso precisa virar exceção para chegar ao agendador
+            raise RuntimeError(f"Falha na etapa {stage.name}")
+        finally:
+            importer.disconnect()
+            importer.metrics.finish()
+            stage.finished_at = time.perf_counter()
+        logging.info(f"Etapa {stage.name} concluída em {stage.seconds:.1f}s")
+        return stage.result
+
+    def run(self):
+        """
+        Executa todas as etapas
+
+        Returns:
+            dict: Nome da etapa -> valor retornado por ela
+        """
+        self._check_cycles()
+        for stage in self.stages.values():
+            for dependency in stage.depends_on:
+                if dependency not in self.stages:
+                    logging.warning(f"Etapa {stage.name}: dependência {dependency} não registrada, ignorada")
+
+        self.started_at = time.perf_counter()
+        pending = dict(self.stages)
+        finished = set()
+        running = {}
+        failure = None
+
+        with ThreadPoolExecutor(max_workers=self.max_parallel, thread_name_prefix='stage') as executor:
+            while pending or running:
+                # Com uma falha, nenhuma etapa nova é iniciada; as em andamento terminam
+                if failure is None:
+                    for name, stage in list(pending.items()):
+                        if all(dependency in finished for dependency in self._dependencies(stage)):
+                            stage.ready_at = time.perf_counter()
+                            running[executor.submit(self._run_stage, stage)] = stage
+                            del pending[name]
+                elif not running:
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    stage = running.pop(future)
+                    try:
+                        future.result()
+                        finished.add(stage.name)
+                    except Exception as e:
+                        logging.error(f"Etapa {stage.name} falhou: {e}")
+                        failure = failure or e
+
+        self.finished_at = time.perf_counter()
+        self.log_report()
+        if failure is not None:
+            raise RuntimeError(f"Importação interrompida: {failure}")
+        return {name: stage.result for name, stage in self.stages.items()}
+
+    def critical_path(self):
+        """
+        Cadeia de dependências que determinou o tempo total: parte da etapa que
+        terminou por último e segue a dependência que terminou mais tarde
+
+        Returns:
+            list: Etapas do caminho crítico, da primeira à última
+        """
+        completed = [stage for stage in self.stages.values() if stage.finished_at is not None]
+        if not completed:
+            return []
+
+        stage = max(completed, key=lambda item: item.finished_at)
+        path = [stage]
+        while True:
+            dependencies = [self.stages[name] for name in self._dependencies(stage)]
+            dependencies = [item for item in dependencies if item.finished_at is not None]
+            if not dependencies:
+                break
+            stage = max(dependencies, key=lambda item: item.finished_at)
+            path.append(stage)
+        return list(reversed(path))
+
+    def log_report(self):
+        """Registra início, espera e duração de cada etapa e o caminho crítico"""
+        total = self.finished_at - self.started_at
+        logging.info(f"{'etapa':<16} {'início':>8} {'espera':>8} {'duração':>8}")
+        for stage in self.stages.values():
+            if stage.started_at is None:
+                logging.info(f"{stage.name:<16} {'não executada':>26}")
+                continue
+            logging.info(
+                f"{stage.name:<16} {stage.started_at - self.started_at:>7.1f}s "
+                f"{stage.started_at - stage.ready_at:>7.1f}s {stage.seconds:>7.1f}s"
+            )
+
+        path = self.critical_path()
+        if path:
+            path_seconds = sum(stage.seconds for stage in path)
+            logging.info(
+                f"Caminho crítico: {' -> '.join(stage.name for stage in path)} "
+                f"({path_seconds:.1f}s de {total:.1f}s totais)"
+            )
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tabelas-sombra da carga com troca atômica
+
+As tabelas lidas pela API são carregadas em cópias vazias (<tabela>_new) com
+INSERT simples e, depois de conferidas, trocadas com as atuais por um único
+RENAME TABLE; as anteriores ficam em <tabela>_old, sem foreign keys, para um
+rollback rápido.
+
+Autor: Sistema de Importação
+Data: Setembro 2025
+"""
+
+import re
+
+from config import TABLE_MUNICIPIOS, TABLE_HOSPITAIS, TABLE_MEDICOS, TABLE_PACIENTES, SHADOW_SUFFIX, SHADOW_OLD_SUFFIX
+
+# Tabelas trocadas juntas, cada tabela depois das que ela referencia. specialties e
+# patient_hospital entram no grupo porque têm foreign keys para hospitals e patients:
+# no InnoDB a foreign key acompanha a tabela renomeada, então elas passariam a
+# apontar para as tabelas _old se ficassem de fora
+SHADOW_TABLES = (TABLE_MUNICIPIOS, TABLE_HOSPITAIS, 'specialties', TABLE_MEDICOS, TABLE_PACIENTES, 'patient_hospital')
+
+_CREATE_TABLE = re.compile(r'^CREATE TABLE `[^`]+`')
+_CONSTRAINT_NAME = re.compile(r'CONSTRAINT `[^`]+` (FOREIGN KEY|CHECK)')
+_REFERENCES = re.compile(r'REFERENCES `([^`]+)`')
+_AUTO_INCREMENT = re.compile(r' AUTO_INCREMENT=\d+')
+
+
+class ShadowTables:
+    def __init__(self, tables=SHADOW_TABLES, suffix=SHADOW_SUFFIX, old_suffix=SHADOW_OLD_SUFFIX):
+        """
+        Nomes e comandos das tabelas-sombra de um grupo de tabelas
+
+        Args:
+            tables (tuple): Tabelas do grupo, cada uma depois das que ela referencia
+            suffix (str): Sufixo das tabelas carregadas
+            old_suffix (str): Sufixo das tabelas substituídas, mantidas para o rollback
+        """
+        self.tables = tuple(tables)
+        self.suffix = suffix
+        self.old_suffix = old_suffix
+
+    def name(self, table):
+        """Tabela que recebe a carga de table (a própria table fora do grupo)"""
+        if table in self.tables:
+            return f"{table}{self.suffix}"
+        return table
+
+    def old_name(self, table):
+        """Tabela que guarda o conteúdo anterior de table depois da troca"""
+        return f"{table}{self.old_suffix}"
+
+    def create_query(self, table, create_statement):
+        """
+        CREATE TABLE da tabela-sombra a partir do SHOW CREATE TABLE da atual
+
+        CREATE TABLE ... LIKE não copia as foreign keys, por isso a definição é
+        reescrita: as referências a tabelas do grupo passam para as sombras, e as
+        constraints ficam sem nome para que o InnoDB gere nomes temporários
+        <tabela>_new_ibfk_N (nomes de constraint são únicos no banco). Depois da
+        troca, DatabaseImporter.restore_foreign_key_names devolve os nomes da
+        migration. O AUTO_INCREMENT recomeça em 1.
+
+        Args:
+            table (str): Tabela atual
+            create_statement (str): Coluna 'Create Table' do SHOW CREATE TABLE
+        """
+        query = _CREATE_TABLE.sub(f"CREATE TABLE `{self.name(table)}`", create_statement)
+        query = _CONSTRAINT_NAME.sub(r'\1', query)
+        query = _REFERENCES.sub(lambda match: f"REFERENCES `{self.name(match.group(1))}`", query)
+        return _AUTO_INCREMENT.sub('', query)
+
+    def swap_query(self):
+        """RENAME TABLE único que troca todas as tabelas do grupo pelas sombras"""
+        pairs = []
+        for table in self.tables:
+            pairs.append(f"{table} TO {self.old_name(table)}")
+            pairs.append(f"{self.name(table)} TO {table}")
+        return f"RENAME TABLE {', '.join(pairs)}"
+
+    def rollback_query(self):
+        """RENAME TABLE único que devolve as tabelas _old (a carga volta para as sombras)"""
+        pairs = []
+        for table in self.tables:
+            pairs.append(f"{table} TO {self.name(table)}")
+            pairs.append(f"{self.old_name(table)} TO {table}")
+        return f"RENAME TABLE {', '.join(pairs)}"
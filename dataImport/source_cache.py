@@ -0,0 +1,501 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cache dos arquivos de origem já interpretados
+
+Cada entrada é nomeada pela fonte e pelo sha256 do conteúdo da origem; enquanto
+a origem não muda, as execuções seguintes leem o cache em vez de interpretar o
+arquivo de novo. Resultados pequenos (a tabela CID-10) são gravados com pickle.
+Os CSVs e o pacientes.xml são gravados em formato colunar: a tabela é dividida
+em partes, e cada parte guarda uma coluna por arquivo .npy. Colunas numéricas
+são vetores NumPy lidos com mmap; colunas de texto são o UTF-8 dos valores
+separados por NUL, decodificados e divididos de uma vez, sem tokenizar o CSV ou
+o XML. As entradas são removidas por idade e, acima do tamanho máximo, da menos
+usada recentemente para a mais usada.
+
+Autor: Sistema de Importação
+Data: Setembro 2025
+"""
+
+import hashlib
+import json
+import logging
+import os
+import pickle
+import re
+import shutil
+import tempfile
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from config import SOURCE_CACHE_MAX_BYTES, SOURCE_CACHE_MAX_AGE_DAYS, SOURCE_CACHE_PART_ROWS
+
+# Versão do formato gravado; mudanças nos parsers devem incrementá-la para invalidar o cache
+CACHE_FORMAT_VERSION = 1
+
+HASH_BLOCK_SIZE = 1 << 20
+
+# Separador dos valores de uma coluna de texto (XML e CSVs de entrada não contêm NUL)
+TEXT_SEPARATOR = '\x00'
+
+TABLE_META = 'tabela.json'
+PART_META = 'parte.json'
+BUILDING_SUFFIX = '.parcial'
+
+# sha256 já calculados neste processo, por (caminho, tamanho, mtime)
+_digests = {}
+_digests_lock = threading.Lock()
+
+
+def file_sha256(file_path):
+    """sha256 do conteúdo inteiro do arquivo (calculado uma vez por processo enquanto o arquivo não muda)"""
+    stat = os.stat(file_path)
+    key = (os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns)
+    with _digests_lock:
+        if key in _digests:
+            return _digests[key]
+
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as handle:
+        for block in iter(lambda: handle.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    with _digests_lock:
+        _digests[key] = digest.hexdigest()
+    return _digests[key]
+
+
+def _entry_size(path):
+    """Bytes ocupados por um arquivo ou diretório do cache"""
+    if not os.path.isdir(path):
+        return os.path.getsize(path)
+    return sum(
+        os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names
+    )
+
+
+def _remove_entry(path):
+    if os.path.isdir(path):
+        shutil.rmtree(path, ignore_errors=True)
+    else:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def _save_part(directory, columns, values):
+    """
+    Grava uma parte da tabela
+
+    Args:
+        directory (str): Diretório da parte
+        columns (list): Nomes das colunas
+        values (list): Valores de cada coluna (Series, vetor NumPy ou lista de str)
+
+    Returns:
+        bool: False se algum texto contém o separador (a parte não é gravada)
+    """
+    os.makedirs(directory, exist_ok=True)
+    kinds = []
+    rows = None
+    for index, column in enumerate(values):
+        nulls = None
+        dtype = None
+        if isinstance(column, pd.Series) and isinstance(column.dtype, pd.api.extensions.ExtensionDtype) \
+                and column.dtype.kind in 'iufb':
+            # Inteiro com nulos (Int64): os valores vão em um vetor NumPy, os nulos na máscara
+            mask = column.isna().to_numpy()
+            if mask.any():
+                nulls = mask
+            data = column.to_numpy(dtype=column.dtype.numpy_dtype, na_value=0)
+            dtype = str(column.dtype)
+            kind = 'array'
+        elif isinstance(column, pd.Series) and column.dtype.kind in 'iufb':
+            data = column.to_numpy()
+            kind = 'array'
+        elif isinstance(column, np.ndarray) and column.dtype.kind in 'iufb':
+            data = column
+            kind = 'array'
+        else:
+            if isinstance(column, pd.Series):
+                mask = column.isna().to_numpy()
+                column = column.tolist()
+                if mask.any():
+                    nulls = mask
+                    column = ['' if null else value for value, null in zip(column, mask.tolist())]
+            text = TEXT_SEPARATOR.join(column)
+            if text.count(TEXT_SEPARATOR) != max(len(column) - 1, 0):
+                return False
+            data = np.frombuffer(text.encode('utf-8'), dtype=np.uint8)
+            kind = 'text'
+        rows = len(column) if kind == 'text' else len(data)
+        np.save(os.path.join(directory, f"{index}.npy"), data)
+        if nulls is not None:
+            np.save(os.path.join(directory, f"{index}.nulos.npy"), nulls)
+        kinds.append({'kind': kind, 'nulls': nulls is not None, 'dtype': dtype})
+
+    with open(os.path.join(directory, PART_META), 'w', encoding='utf-8') as meta_file:
+        json.dump({'columns': list(columns), 'kinds': kinds, 'rows': rows or 0}, meta_file)
+    return True
+
+
+def _load_part(directory):
+    """
+    Lê as colunas de uma parte: vetores com mmap e textos decodificados
+
+    Returns:
+        tuple: (nomes das colunas, lista de colunas, linhas)
+    """
+    with open(os.path.join(directory, PART_META), encoding='utf-8') as meta_file:
+        meta = json.load(meta_file)
+    columns = []
+    for index, info in enumerate(meta['kinds']):
+        data = np.load(os.path.join(directory, f"{index}.npy"), mmap_mode='r')
+        if info['kind'] == 'text':
+            values = data.tobytes().decode('utf-8').split(TEXT_SEPARATOR) if meta['rows'] else []
+            if info['nulls']:
+                nulls = np.load(os.path.join(directory, f"{index}.nulos.npy"))
+                values = np.array(values, dtype=object)
+                values[nulls] = np.nan
+        elif info.get('dtype'):
+            values = pd.array(np.asarray(data), dtype=info['dtype'])
+            if info['nulls']:
+                values[np.load(os.path.join(directory, f"{index}.nulos.npy"))] = pd.NA
+        else:
+            values = data
+        columns.append(values)
+    return meta['columns'], columns, meta['rows']
+
+
+class CachedTable:
+    def __init__(self, directory):
+        """
+        Tabela colunar completa do cache (serializada apenas pelo caminho, então
+        pode ser enviada aos processos trabalhadores)
+
+        Args:
+            directory (str): Diretório da entrada
+        """
+        self.directory = directory
+        with open(os.path.join(directory, TABLE_META), encoding='utf-8') as meta_file:
+            meta = json.load(meta_file)
+        self.columns = meta['columns']
+        self.parts = meta['parts']
+        self.rows = sum(part['rows'] for part in self.parts)
+
+    def __getstate__(self):
+        return {'directory': self.directory}
+
+    def __setstate__(self, state):
+        self.__init__(state['directory'])
+
+    def _iter_parts(self, start=0, stop=None):
+        """Colunas de cada parte com linhas em [start, stop), já recortadas, e a linha inicial"""
+        stop = self.rows if stop is None else stop
+        offset = 0
+        for part in self.parts:
+            part_start, part_stop = max(start - offset, 0), min(stop - offset, part['rows'])
+            if part_start < part_stop:
+                _, columns, _ = _load_part(os.path.join(self.directory, part['name']))
+                if part_start or part_stop < part['rows']:
+                    columns = [column[part_start:part_stop] for column in columns]
+                yield columns, offset + part_start
+            offset += part['rows']
+            if offset >= stop:
+                break
+
+    def iter_records(self, start=0, stop=None):
+        """Tuplas das linhas em [start, stop), na ordem da origem"""
+        for columns, _ in self._iter_parts(start, stop):
+            yield from zip(*columns)
+
+    def iter_frames(self, skip=0):
+        """DataFrames de cada parte (como os blocos do read_csv), a partir da linha skip"""
+        for columns, first_row in self._iter_parts(skip):
+            rows = len(columns[0]) if columns else 0
+            yield pd.DataFrame(
+                dict(zip(self.columns, columns)), index=pd.RangeIndex(first_row, first_row + rows)
+            )
+
+    def row_ranges(self, count):
+        """
+        Divide as linhas em até count faixas contíguas de tamanho parecido
+        (cada faixa lê apenas as partes que a cobrem)
+
+        Returns:
+            list: Tuplas (início, fim)
+        """
+        count = max(1, min(count, self.rows))
+        bounds = [self.rows * index // count for index in range(count + 1)]
+        return list(zip(bounds[:-1], bounds[1:]))
+
+
+class PartWriter:
+    def __init__(self, directory, shard, columns=None, part_rows=SOURCE_CACHE_PART_ROWS):
+        """
+        Grava as partes de uma faixa da tabela em construção
+
+        Args:
+            directory (str): Diretório da tabela em construção
+            shard (int): Índice da faixa (define a ordem das partes na tabela)
+            columns (tuple): Nomes das colunas dos registros de append()
+            part_rows (int): Registros acumulados por parte em append()
+        """
+        self.directory = directory
+        self.shard = shard
+        self.part_rows = part_rows
+        self.columns = columns
+        self.pending = []
+        self.parts = 0
+        self.rows = 0
+        self.failed = False
+
+    def _next_part(self):
+        self.parts += 1
+        return os.path.join(self.directory, f"parte-{self.shard:05d}-{self.parts:06d}")
+
+    def _save(self, columns, values, rows):
+        if self.failed:
+            return
+        if not _save_part(self._next_part(), columns, values):
+            logging.warning(f"Cache de origem: valor com caractere NUL, {self.directory} não será gravado")
+            self.failed = True
+            return
+        self.rows += rows
+
+    def append(self, record):
+        """Acumula um registro (tupla na ordem de columns)"""
+        if self.failed:
+            return
+        self.pending.append(record)
+        if len(self.pending) >= self.part_rows:
+            self.flush()
+
+    def flush(self):
+        """Grava os registros acumulados em uma parte"""
+        if self.pending:
+            self._save(self.columns, [list(values) for values in zip(*self.pending)], len(self.pending))
+            self.pending = []
+
+    def write_frame(self, frame):
+        """Grava um DataFrame (bloco do read_csv) como uma parte"""
+        self._save(list(frame.columns), [frame[column] for column in frame.columns], len(frame))
+
+    def close(self):
+        """Grava o restante e marca a faixa como completa (a origem foi lida até o fim)"""
+        self.flush()
+        if not self.failed:
+            with open(os.path.join(self.directory, f"faixa-{self.shard:05d}.json"), 'w', encoding='utf-8') as done:
+                json.dump({'rows': self.rows}, done)
+
+
+class TableBuilder:
+    def __init__(self, cache, path):
+        """
+        Tabela colunar em construção em um diretório temporário, publicada no
+        commit() com um rename
+
+        Args:
+            cache (SourceCache): Cache de destino
+            path (str): Diretório final da entrada
+        """
+        self.cache = cache
+        self.path = path
+        self.directory = f"{path}{BUILDING_SUFFIX}-{os.getpid()}"
+        shutil.rmtree(self.directory, ignore_errors=True)
+        os.makedirs(self.directory)
+
+    def part_writer(self, shard=0, columns=None):
+        return PartWriter(self.directory, shard, columns)
+
+    def commit(self, shards=1):
+        """
+        Publica a tabela se todas as faixas foram lidas até o fim
+
+        Args:
+            shards (int): Número de faixas gravadas (índices 0 a shards - 1)
+
+        Returns:
+            bool: Se a tabela foi publicada
+        """
+        if not os.path.isdir(self.directory):
+            return False
+        if not all(os.path.exists(os.path.join(self.directory, f"faixa-{shard:05d}.json")) for shard in range(shards)):
+            self.discard()
+            return False
+
+        parts = []
+        columns = None
+        for name in sorted(entry for entry in os.listdir(self.directory) if entry.startswith('parte-')):
+            with open(os.path.join(self.directory, name, PART_META), encoding='utf-8') as meta_file:
+                meta = json.load(meta_file)
+            columns = columns or meta['columns']
+            parts.append({'name': name, 'rows': meta['rows']})
+        with open(os.path.join(self.directory, TABLE_META), 'w', encoding='utf-8') as meta_file:
+            json.dump({'columns': columns or [], 'parts': parts}, meta_file)
+
+        try:
+            os.rename(self.directory, self.path)
+        except OSError:
+            # Outra execução publicou a mesma entrada antes
+            self.discard()
+            return False
+        rows = sum(part['rows'] for part in parts)
+        logging.info(f"Cache de origem gravado: {os.path.basename(self.path)} ({rows} linhas, {len(parts)} partes)")
+        self.cache.published(self.path)
+        return True
+
+    def discard(self):
+        """Remove a tabela em construção (sem efeito depois do commit)"""
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+class SourceCache:
+    def __init__(self, directory, max_bytes=SOURCE_CACHE_MAX_BYTES, max_age_days=SOURCE_CACHE_MAX_AGE_DAYS):
+        """
+        Args:
+            directory (str): Diretório dos arquivos de cache (None = cache desativado)
+            max_bytes (int): Tamanho máximo do diretório
+            max_age_days (float): Entradas não usadas há mais tempo são removidas
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age_days = max_age_days
+
+    def _path(self, name, source_path, suffix=''):
+        name = re.sub(r'[^A-Za-z0-9_.-]+', '_', name)
+        return os.path.join(self.directory, f"{name}-v{CACHE_FORMAT_VERSION}-{file_sha256(source_path)}{suffix}")
+
+    def _touch(self, path):
+        """Marca a entrada como usada agora (ordem de remoção por tamanho)"""
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+    def _remove_stale(self, path):
+        """Remove as versões anteriores do cache da mesma fonte"""
+        name = os.path.basename(path)
+        prefix = re.sub(r'-v\d+-[0-9a-f]{64}(\.pkl)?$', '', name)
+        pattern = re.compile(rf"{re.escape(prefix)}-v\d+-[0-9a-f]{{64}}(\.pkl)?$")
+        for entry in os.listdir(self.directory):
+            if pattern.match(entry) and entry != name:
+                _remove_entry(os.path.join(self.directory, entry))
+
+    def evict(self, keep=None):
+        """
+        Remove as entradas não usadas há mais de max_age_days (inclusive construções
+        abandonadas) e, acima de max_bytes, as menos usadas recentemente
+
+        Args:
+            keep (str): Entrada que nunca é removida (a recém-gravada)
+        """
+        if not self.directory or not os.path.isdir(self.directory):
+            return
+        now = time.time()
+        entries = []
+        for entry in os.listdir(self.directory):
+            path = os.path.join(self.directory, entry)
+            try:
+                used_at = os.path.getmtime(path)
+            except OSError:
+                continue
+            if path != keep and now - used_at > self.max_age_days * 86400:
+                logging.info(f"Cache de origem: {entry} removido por idade")
+                _remove_entry(path)
+            elif BUILDING_SUFFIX not in entry and not entry.endswith('.tmp'):
+                entries.append((used_at, path, _entry_size(path)))
+
+        total = sum(size for _, _, size in entries)
+        for _, path, size in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            logging.info(f"Cache de origem: {os.path.basename(path)} removido por tamanho")
+            _remove_entry(path)
+            total -= size
+
+    def published(self, path):
+        """Nova entrada gravada: remove as versões anteriores da fonte e aplica os limites"""
+        self._remove_stale(path)
+        self.evict(keep=path)
+
+    def get(self, source_path, name, parse):
+        """
+        Retorna o resultado do parsing da origem, lendo do cache (pickle) se a origem não mudou
+
+        Args:
+            source_path (str): Arquivo de origem
+            name (str): Nome da fonte no cache (inclui o que mais influencia o parsing, como a planilha)
+            parse (callable): Interpreta a origem; o resultado precisa ser serializável com pickle
+
+        Returns:
+            object: Resultado de parse()
+        """
+        if not self.directory:
+            return parse()
+
+        path = self._path(name, source_path, '.pkl')
+        try:
+            with open(path, 'rb') as cache_file:
+                value = pickle.load(cache_file)
+            self._touch(path)
+            logging.info(f"{name}: lido do cache {path}")
+            return value
+        except FileNotFoundError:
+            pass
+        except (pickle.UnpicklingError, EOFError, AttributeError, ValueError) as e:
+            logging.warning(f"{name}: cache {path} ilegível ({e}), interpretando a origem")
+
+        value = parse()
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            handle, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(handle, 'wb') as temp_file:
+                pickle.dump(value, temp_file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, path)
+            self.published(path)
+        except OSError as e:
+            logging.warning(f"{name}: não foi possível gravar o cache ({e})")
+        return value
+
+    def table(self, source_path, name):
+        """
+        Tabela colunar da origem, se já estiver no cache
+
+        Returns:
+            CachedTable: Tabela do cache, ou None
+        """
+        if not self.directory:
+            return None
+        path = self._path(name, source_path)
+        if not os.path.exists(os.path.join(path, TABLE_META)):
+            return None
+        try:
+            table = CachedTable(path)
+        except (OSError, ValueError, KeyError) as e:
+            logging.warning(f"{name}: cache {path} ilegível ({e}), interpretando a origem")
+            return None
+        self._touch(path)
+        logging.info(f"{name}: lido do cache de origens ({table.rows} linhas, {len(table.parts)} partes)")
+        return table
+
+    def builder(self, source_path, name):
+        """
+        Inicia a gravação da tabela colunar da origem
+
+        Returns:
+            TableBuilder: Construtor da tabela, ou None se o cache está desativado
+        """
+        if not self.directory:
+            return None
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            return TableBuilder(self, self._path(name, source_path))
+        except OSError as e:
+            logging.warning(f"{name}: não foi possível criar o cache ({e})")
+            return None
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Descrição das tabelas de destino usadas pelo importador
+Autor: Sistema de Importação
+Data: Setembro 2025
+"""
+
+import copy
+from functools import partial
+
+from config import TABLE_ESTADOS, TABLE_HOSPITAIS, TABLE_MEDICOS, TABLE_MUNICIPIOS, TABLE_PACIENTES, TABLE_CID10
+from row_batches import RowBatch
+
+# Colunas preenchidas pelo importador que não fazem parte do conteúdo da linha
+TIMESTAMP_COLUMNS = ('created_at', 'updated_at')
+
+
+class TableSpec:
+    def __init__(self, table, columns, update_columns, geometry_columns=(), key_column=None, region_column=None):
+        """
+        Descreve a tabela de destino de um importador
+
+        Args:
+            table (str): Nome da tabela
+            columns (tuple): Colunas na mesma ordem das tuplas geradas pelo importador
+            update_columns (tuple): Colunas atualizadas no ON DUPLICATE KEY UPDATE
+            geometry_columns (tuple): Colunas recebidas como WKT e convertidas com ST_GeomFromText
+            key_column (str): Chave natural da linha na origem (necessária para o modo delta)
+            region_column (str): Coluna da cidade da linha; no modo delta as cidades das
+                linhas alteradas são registradas para o recálculo de region_stats
+        """
+        self.table = table
+        self.columns = tuple(columns)
+        self.update_columns = tuple(update_columns)
+        self.geometry_columns = tuple(geometry_columns)
+        self.key_column = key_column
+        self.region_column = region_column
+        # Sem upsert as linhas são gravadas com INSERT simples (tabelas-sombra, sempre vazias no início)
+        self.upsert = True
+
+    def insert_only(self, table):
+        """Cópia da especificação que grava em table sem ON DUPLICATE KEY UPDATE"""
+        spec = copy.copy(self)
+        spec.table = table
+        spec.upsert = False
+        return spec
+
+    def key_index(self):
+        """Posição da chave natural nas tuplas"""
+        return self.columns.index(self.key_column)
+
+    def region_index(self):
+        """Posição da coluna da cidade nas tuplas"""
+        return self.columns.index(self.region_column)
+
+    def content_indexes(self):
+        """Posições das colunas que compõem o conteúdo da linha (sem created_at/updated_at)"""
+        return tuple(index for index, column in enumerate(self.columns) if column not in TIMESTAMP_COLUMNS)
+
+    def update_clause(self):
+        """Cláusula ON DUPLICATE KEY UPDATE (vazia nas especificações sem upsert)"""
+        if not self.upsert:
+            return ''
+        assignments = ',\n                '.join(f"{column} = VALUES({column})" for column in self.update_columns)
+        return f"ON DUPLICATE KEY UPDATE\n                {assignments}"
+
+    def insert_prefix(self):
+        """Início do INSERT multi-linha, antes da lista de VALUES"""
+        return f"INSERT INTO {self.table} ({', '.join(self.columns)}) VALUES\n"
+
+    def value_literal(self, column, value, escape):
+        """Literal SQL de um valor da coluna (NULL, escapado ou ST_GeomFromText)"""
+        if value is None or (isinstance(value, float) and value != value):
+            return 'NULL'
+        literal = escape(value)
+        if column in self.geometry_columns:
+            return f"ST_GeomFromText({literal})"
+        return literal
+
+    def values_literal(self, row, escape):
+        """
+        Tupla de VALUES com os valores já escapados
+
+        Args:
+            row (tuple): Linha na ordem de self.columns
+            escape (callable): Converte um valor em literal SQL (connection.escape)
+        """
+        values = [self.value_literal(column, value, escape) for column, value in zip(self.columns, row)]
+        return f"({', '.join(values)})"
+
+    def values_literals(self, rows, escape):
+        """
+        Tuplas de VALUES das linhas; em um RowBatch cada coluna é escapada de uma
+        vez e as constantes (created_at/updated_at) uma única vez por lote
+
+        Args:
+            rows (list | RowBatch): Tuplas na ordem de self.columns ou lote em colunas
+            escape (callable): Converte um valor em literal SQL (connection.escape)
+
+        Returns:
+            iterator: Texto (...) de cada linha
+        """
+        if isinstance(rows, RowBatch):
+            formatters = [partial(self.value_literal, column, escape=escape) for column in self.columns]
+            return (f"({', '.join(values)})" for values in rows.formatted(formatters))
+        return (self.values_literal(row, escape) for row in rows)
+
+    def load_data_query(self, staging_table):
+        """
+        Query LOAD DATA LOCAL INFILE para a tabela de staging
+
+        Colunas geométricas são lidas em variáveis de usuário e convertidas no SET.
+        """
+        targets = []
+        assignments = []
+        for column in self.columns:
+            if column in self.geometry_columns:
+                targets.append(f"@{column}")
+                assignments.append(f"{column} = ST_GeomFromText(@{column})")
+            else:
+                targets.append(column)
+
+        query = f"""
+            LOAD DATA LOCAL INFILE %s
+            INTO TABLE {staging_table}
+            CHARACTER SET utf8mb4
+            FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\'
+            LINES TERMINATED BY '\\n'
+            ({', '.join(targets)})
+        """
+        if assignments:
+            query += f"SET {', '.join(assignments)}"
+        return query
+
+    def create_staging_query(self, staging_table):
+        """Cria a tabela temporária de staging com as mesmas colunas, sem índices"""
+        return f"""
+            CREATE TEMPORARY TABLE {staging_table}
+            SELECT {', '.join(self.columns)} FROM {self.table} LIMIT 0
+        """
+
+    def upsert_from_staging_query(self, staging_table):
+        """Upsert baseado em conjunto da staging para a tabela de destino"""
+        columns = ', '.join(self.columns)
+        return f"""
+            INSERT INTO {self.table} ({columns})
+            SELECT {columns} FROM {staging_table}
+            {self.update_clause()}
+        """
+
+
+ESTADOS_SPEC = TableSpec(
+    TABLE_ESTADOS,
+    columns=('codigo_uf', 'uf', 'name', 'latitude', 'longitude', 'region', 'location', 'created_at', 'updated_at'),
+    update_columns=('uf', 'name', 'latitude', 'longitude', 'region', 'location', 'updated_at'),
+    geometry_columns=('location',),
+    key_column='codigo_uf'
+)
+
+MUNICIPIOS_SPEC = TableSpec(
+    TABLE_MUNICIPIOS,
+    columns=('city_code', 'name', 'latitude', 'longitude', 'location', 'is_capital', 'state_id', 'siafi_id',
+             'area_code', 'time_zone', 'population', 'created_at', 'updated_at'),
+    update_columns=('name', 'latitude', 'longitude', 'location', 'is_capital', 'state_id', 'siafi_id',
+                    'area_code', 'time_zone', 'population', 'updated_at'),
+    geometry_columns=('location',),
+    key_column='city_code'
+)
+
+HOSPITAIS_SPEC = TableSpec(
+    TABLE_HOSPITAIS,
+    columns=('hospital_code', 'name', 'city', 'neighborhood', 'total_beds', 'created_at', 'updated_at'),
+    update_columns=('name', 'city', 'neighborhood', 'total_beds', 'updated_at'),
+    key_column='hospital_code',
+    region_column='city'
+)
+
+ESPECIALIDADES_SPEC = TableSpec(
+    'specialties',
+    columns=('hospital_id', 'name', 'created_at', 'updated_at'),
+    update_columns=('name', 'updated_at')
+)
+
+MEDICOS_SPEC = TableSpec(
+    TABLE_MEDICOS,
+    columns=('doctor_code', 'full_name', 'specialty', 'city', 'created_at', 'updated_at'),
+    update_columns=('full_name', 'specialty', 'city', 'updated_at'),
+    key_column='doctor_code',
+    region_column='city'
+)
+
+PACIENTES_SPEC = TableSpec(
+    TABLE_PACIENTES,
+    columns=('codigo', 'cpf', 'full_name', 'gender', 'city', 'neighborhood', 'has_insurance', 'cid_id',
+             'created_at', 'updated_at'),
+    update_columns=('cpf', 'full_name', 'gender', 'city', 'neighborhood', 'has_insurance', 'cid_id', 'updated_at'),
+    key_column='codigo',
+    region_column='city'
+)
+
+CID10_SPEC = TableSpec(
+    TABLE_CID10,
+    columns=('code', 'name', 'created_at', 'updated_at'),
+    update_columns=('name', 'updated_at')
+)
+
+# Hospitais mais próximos de cada paciente, calculados pela etapa de atribuição
+PATIENT_HOSPITAL_SPEC = TableSpec(
+    'patient_hospital',
+    columns=('patient_id', 'hospital_id', 'distance_km', 'same_city', 'created_at', 'updated_at'),
+    update_columns=('distance_km', 'same_city', 'updated_at')
+)
+
+# Hash do conteúdo de cada linha importada, usado pelo modo delta
+ROW_HASHES_SPEC = TableSpec(
+    'import_row_hashes',
+    columns=('table_name', 'natural_key', 'row_hash'),
+    update_columns=('row_hash',)
+)
+
+# Agregados por cidade e por estado, calculados pela etapa de materialização
+REGION_STATS_SPEC = TableSpec(
+    'region_stats',
+    columns=('scope', 'region_id', 'metric', 'dimension', 'value', 'created_at', 'updated_at'),
+    update_columns=('value', 'updated_at')
+)
+
+# Cidades com linhas alteradas pelo modo delta, ainda não recalculadas em region_stats
+DIRTY_REGIONS_SPEC = TableSpec(
+    'stats_dirty_regions',
+    columns=('table_name', 'region_value'),
+    update_columns=('region_value',)
+)
@@ -0,0 +1,10 @@
+# -*- coding: utf-8 -*-
+"""
+Configuração dos testes do dataImport: os módulos são scripts na raiz do
+diretório, então ela entra no sys.path
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+"""
+Dados de exemplo dos testes (CPFs válidos e pacientes.xml)
+"""
+
+from xml.sax.saxutils import escape
+
+from patient_parsers import PATIENT_FIELDS
+
+
+def valid_cpf(number):
+    """CPF válido com os 9 primeiros dígitos tirados de number"""
+    digits = [int(char) for char in f"{number % 10 ** 9:09d}"]
+    if len(set(digits)) == 1:
+        digits[-1] = (digits[-1] + 1) % 10
+    for position in (9, 10):
+        total = sum(digit * weight for digit, weight in zip(digits, range(position + 1, 1, -1)))
+        digits.append(total * 10 % 11 % 10)
+    return ''.join(map(str, digits))
+
+
+def patient(codigo, cpf, city='3550308', nome=None, genero='M', cid='A00'):
+    """Campos de um <Paciente> na ordem de PATIENT_FIELDS"""
+    return (codigo, cpf, nome or f"Paciente {codigo}", genero, city, 'Centro', 'SIM', cid)
+
+
+def write_patients_xml(path, records):
+    """Grava um pacientes.xml com os registros (campos na ordem de PATIENT_FIELDS)"""
+    with open(path, 'w', encoding='utf-8') as handle:
+        handle.write('<?xml version="1.0" encoding="UTF-8"?>\n<Pacientes>\n')
+        for fields in records:
+            handle.write('  <Paciente>\n')
+            for tag, value in zip(PATIENT_FIELDS, fields):
+                handle.write(f"    <{tag}>{escape(value)}</{tag}>\n")
+            handle.write('  </Paciente>\n')
+        handle.write('</Pacientes>\n')
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+"""
+Testes da busca dos hospitais mais próximos na grade
+"""
+
+import numpy as np
+
+from assignments import BRUTE_FORCE_LIMIT, HospitalGrid, haversine_km
+
+
+def _brute_force(latitudes, longitudes, latitude, longitude, k):
+    distances = haversine_km(latitude, longitude, latitudes, longitudes)
+    order = np.argsort(distances, kind='stable')[:k]
+    return distances[order]
+
+
+def test_grid_matches_brute_force():
+    generator = np.random.default_rng(11)
+    count = BRUTE_FORCE_LIMIT * 4
+    # Hospitais concentrados em alguns polos, como as cidades, e espalhados pelo país
+    centers = generator.uniform((-30.0, -70.0), (0.0, -35.0), size=(8, 2))
+    points = centers[generator.integers(0, len(centers), count)] + generator.normal(0, 0.5, size=(count, 2))
+    points[::10] = generator.uniform((-33.0, -74.0), (5.0, -34.0), size=(len(points[::10]), 2))
+    latitudes, longitudes = points[:, 0], points[:, 1]
+    positions = np.arange(count) * 3
+
+    grid = HospitalGrid(positions, latitudes, longitudes, cell_degrees=1.0)
+
+    queries = generator.uniform((-33.0, -74.0), (5.0, -34.0), size=(50, 2))
+    for latitude, longitude in queries.tolist() + [(-23.55, -46.63), (60.0, 10.0)]:
+        for k in (1, 3, 10):
+            found, distances = grid.nearest(latitude, longitude, k)
+            expected = _brute_force(latitudes, longitudes, latitude, longitude, k)
+            assert len(found) == k
+            np.testing.assert_allclose(distances, expected)
+            np.testing.assert_allclose(
+                haversine_km(latitude, longitude, latitudes[found // 3], longitudes[found // 3]), distances
+            )
+
+
+def test_small_grid_uses_every_hospital():
+    latitudes = np.array([-23.5, -22.9, -15.8])
+    longitudes = np.array([-46.6, -43.2, -47.9])
+
+    grid = HospitalGrid(np.array([10, 20, 30]), latitudes, longitudes, cell_degrees=1.0)
+    found, distances = grid.nearest(-23.0, -43.0, 5)
+
+    assert found.tolist() == [20, 10, 30]
+    assert distances.tolist() == sorted(distances.tolist())
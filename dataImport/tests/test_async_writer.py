@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""
+Testes do gravador assíncrono, com um pool aiomysql simulado em memória
+"""
+
+import asyncio
+import types
+
+import pytest
+
+import async_writer
+from async_writer import AsyncBatchWriter
+from metrics import ImportMetrics
+from table_specs import ESTADOS_SPEC
+
+
+class FakeCursor:
+    def __init__(self, server):
+        self.server = server
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    async def execute(self, statement):
+        self.server.running += 1
+        self.server.max_running = max(self.server.max_running, self.server.running)
+        await asyncio.sleep(0.01)
+        self.server.running -= 1
+        if self.server.fail_on in statement:
+            raise ValueError(f"falha simulada em {statement}")
+        self.server.executed.append(statement)
+        return statement.count(',') + 1
+
+
+class FakeConnection:
+    def __init__(self, server):
+        self.server = server
+
+    def cursor(self):
+        return FakeCursor(self.server)
+
+    async def commit(self):
+        self.server.committed += 1
+
+
+class FakeAcquire:
+    def __init__(self, pool):
+        self.pool = pool
+
+    async def __aenter__(self):
+        self.connection = await self.pool.connections.get()
+        return self.connection
+
+    async def __aexit__(self, *exc_info):
+        self.pool.release(self.connection)
+        return False
+
+
+class FakePool:
+    def __init__(self, server, size):
+        self.connections = asyncio.Queue()
+        for _ in range(size):
+            self.connections.put_nowait(FakeConnection(server))
+
+    def acquire(self):
+        return FakeAcquire(self)
+
+    def release(self, connection):
+        self.connections.put_nowait(connection)
+
+    def close(self):
+        pass
+
+    async def wait_closed(self):
+        pass
+
+
+class FakeServer:
+    def __init__(self, fail_on='\0'):
+        self.fail_on = fail_on
+        self.running = 0
+        self.max_running = 0
+        self.executed = []
+        self.committed = 0
+
+    def module(self):
+        async def create_pool(maxsize, **settings):
+            return FakePool(self, maxsize)
+        return types.SimpleNamespace(create_pool=create_pool)
+
+
+class FakeImporter:
+    host, port, user, password, database = 'localhost', 3306, 'root', '', 'teste'
+    bulk_session = False
+
+    def __init__(self):
+        self.metrics = ImportMetrics().stage('teste')
+
+    def iter_value_statements(self, spec, rows, sizer):
+        """Um statement por linha: 'uf1,uf2,...' com os valores da linha"""
+        for row in rows:
+            yield ','.join(map(str, row)), 1, False
+
+    def max_statement_bytes(self):
+        return 1 << 20
+
+
+@pytest.fixture
+def server(monkeypatch):
+    server = FakeServer()
+    monkeypatch.setattr(async_writer, 'require_aiomysql', server.module)
+    return server
+
+
+def test_write_returns_with_batch_committed(server):
+    with AsyncBatchWriter(FakeImporter(), ESTADOS_SPEC, in_flight=3) as writer:
+        assert writer.commits_on_write
+        writer.write([(index, 'SP') for index in range(8)])
+        assert writer.count == 8
+        assert server.committed == 8
+        writer.write([(index, 'RJ') for index in range(8, 10)])
+        assert server.committed == 10
+
+    assert 1 < server.max_running <= 3
+    assert len(server.executed) == 10
+
+
+def test_failure_keeps_original_exception(server):
+    server.fail_on = 'RJ'
+    writer = AsyncBatchWriter(FakeImporter(), ESTADOS_SPEC, in_flight=2)
+
+    with pytest.raises(RuntimeError) as raised:
+        writer.write([(1, 'SP'), (2, 'RJ'), (3, 'MG')])
+    writer.discard()
+
+    assert isinstance(raised.value.__cause__, ValueError)
+    assert 'falha simulada' in str(raised.value.__cause__)
+    assert raised.value.__cause__.__traceback__ is not None
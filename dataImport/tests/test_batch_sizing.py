@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""
+Testes do ajuste adaptativo de linhas por statement
+"""
+
+from batch_sizing import AdaptiveBatchSizer
+
+
+def _sizer(initial=1000):
+    return AdaptiveBatchSizer(initial=initial, minimum=100, maximum=10000, target_seconds=2.0)
+
+
+def test_grows_while_rate_improves():
+    sizer = _sizer()
+
+    sizer.record(1000, 0.5)
+    assert sizer.size == 1500
+    sizer.record(1500, 0.5)
+    assert sizer.size == 2250
+
+
+def test_reverses_when_rate_drops():
+    sizer = _sizer()
+
+    sizer.record(1000, 0.1)
+    sizer.record(1500, 1.0)
+
+    assert sizer.size == 1000
+    assert not sizer.growing
+
+
+def test_slow_statement_halves_size():
+    sizer = _sizer()
+
+    sizer.record(1000, 3.0)
+
+    assert sizer.size == 500
+
+
+def test_partial_statements_do_not_change_size():
+    sizer = _sizer()
+
+    sizer.record(400, 0.1)
+    sizer.record(1000, 0.1, limited_by_bytes=True)
+
+    assert sizer.size == 1000
+    assert sizer.statements == 2
+    assert sizer.rows == 1400
+
+
+def test_size_is_clamped():
+    assert _sizer(initial=50).size == 100
+    sizer = _sizer(initial=9000)
+    sizer.record(9000, 0.1)
+    assert sizer.size == 10000
+    sizer = _sizer(initial=150)
+    sizer.record(150, 5.0)
+    assert sizer.size == 100
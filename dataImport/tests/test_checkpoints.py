@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""
+Testes dos checkpoints de retomada
+"""
+
+import os
+
+from checkpoints import CheckpointStore, file_fingerprint
+
+
+def _source(tmp_path, content):
+    path = tmp_path / 'pacientes.xml'
+    path.write_bytes(content)
+    return str(path)
+
+
+def test_save_and_load(tmp_path):
+    source = _source(tmp_path, b'<Pacientes/>')
+    store = CheckpointStore(str(tmp_path / 'checkpoints'))
+
+    assert store.load('pacientes.xml', source) is None
+    store.save('pacientes.xml', source, 20000, last_key='P19999')
+    checkpoint = CheckpointStore(str(tmp_path / 'checkpoints')).load('pacientes.xml', source)
+
+    assert checkpoint['records'] == 20000
+    assert checkpoint['last_key'] == 'P19999'
+    assert not checkpoint['completed']
+    assert checkpoint['source'] == os.path.abspath(source)
+
+
+def test_changed_source_discards_checkpoint(tmp_path):
+    source = _source(tmp_path, b'<Pacientes/>')
+    store = CheckpointStore(str(tmp_path / 'checkpoints'))
+    store.save('pacientes.xml', source, 10, completed=True)
+
+    _source(tmp_path, b'<Pacientes></Pacientes>')
+
+    assert CheckpointStore(str(tmp_path / 'checkpoints')).load('pacientes.xml', source) is None
+
+
+def test_keys_with_path_characters_and_clear(tmp_path):
+    source = _source(tmp_path, b'<Pacientes/>')
+    store = CheckpointStore(str(tmp_path / 'checkpoints'))
+    key = 'pacientes.xml-registros-0-100/../x y'
+
+    store.save(key, source, 100)
+
+    assert os.listdir(tmp_path / 'checkpoints') == ['pacientes.xml-registros-0-100_.._x_y.json']
+    assert store.load(key, source)['records'] == 100
+    store.clear(key)
+    store.clear(key)
+    assert store.load(key, source) is None
+
+
+def test_fingerprint_samples_both_ends(tmp_path):
+    head = b'a' * (1 << 20)
+    first = file_fingerprint(_source(tmp_path, head + b'b' * 10 + b'c' * (1 << 20)))
+    middle = file_fingerprint(_source(tmp_path, head + b'x' * 10 + b'c' * (1 << 20)))
+    tail = file_fingerprint(_source(tmp_path, head + b'b' * 10 + b'c' * ((1 << 20) - 1) + b'd'))
+
+    # O meio do arquivo não entra no sha256: só o tamanho e as pontas identificam a versão
+    assert first['sha256'] == middle['sha256']
+    assert first['sha256'] != tail['sha256']
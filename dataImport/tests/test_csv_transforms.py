@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""
+Testes das transformações dos CSVs com cidades em branco
+"""
+
+import io
+
+import numpy as np
+import pandas as pd
+
+from csv_transforms import HOSPITAIS_DTYPES, MEDICOS_DTYPES, transform_hospitais, transform_medicos
+from lookups import SortedLookup
+from source_cache import _save_part, _load_part
+
+HOSPITAIS_CSV = (
+    "codigo,nome,cidade,bairro,especialidades,leitos_totais\n"
+    "H1,Hospital A,3550308,Centro,Cardiologia,10\n"
+    "H2,Hospital B,,Centro,Pediatria,5\n"
+    "H3,Hospital C,9999999,Centro,,2\n"
+)
+
+MEDICOS_CSV = (
+    "codigo,nome_completo,especialidade,cidade\n"
+    "M1,Ana,Cardiologia,3550308\n"
+    "M2,Bruno,Pediatria,\n"
+)
+
+
+def test_hospitals_without_city_are_skipped():
+    df = pd.read_csv(io.StringIO(HOSPITAIS_CSV), dtype=HOSPITAIS_DTYPES)
+    city_lookup = SortedLookup(np.array([3550308]), np.array([7]))
+
+    rows, skipped = transform_hospitais(df, city_lookup, 'agora')
+
+    assert list(rows) == [('H1', 'Hospital A', 7, 'Centro', 10, 'agora', 'agora')]
+    assert skipped == 2
+
+
+def test_doctors_without_city_are_skipped():
+    df = pd.read_csv(io.StringIO(MEDICOS_CSV), dtype=MEDICOS_DTYPES)
+
+    rows, skipped = transform_medicos(df, 'agora')
+
+    assert list(rows) == [('M1', 'Ana', 'Cardiologia', 3550308, 'agora', 'agora')]
+    assert type(rows[0][3]) is int
+    assert skipped == 1
+
+
+def test_source_cache_keeps_blank_city(tmp_path):
+    df = pd.read_csv(io.StringIO(MEDICOS_CSV), dtype=MEDICOS_DTYPES)
+    _save_part(str(tmp_path), list(df.columns), [df[column] for column in df.columns])
+
+    columns, values, rows = _load_part(str(tmp_path))
+    cached = pd.DataFrame(dict(zip(columns, values)))
+
+    assert rows == 2
+    assert str(cached['cidade'].dtype) == 'Int64'
+    assert transform_medicos(cached, 'agora')[1] == 1
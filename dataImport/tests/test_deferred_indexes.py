@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+"""
+Testes da remoção e recriação adiada dos índices, com um banco simulado em memória
+"""
+
+import copy
+import logging
+import os
+import re
+
+import pytest
+
+from deferred_indexes import DeferredIndexes, foreign_key_definition, index_definition
+
+SCHEMA = {
+    'indexes': {
+        'patients_city_index': {'unique': False, 'type': 'BTREE', 'columns': [['city', None]]},
+        'patients_cpf_unique': {'unique': True, 'type': 'BTREE', 'columns': [['cpf', None]]},
+        'patients_name_index': {'unique': False, 'type': 'BTREE', 'columns': [['full_name', 20]]}
+    },
+    'foreign_keys': {
+        'patients_cid_id_foreign': {
+            'columns': ['cid_id'], 'referenced_table': 'cid10', 'referenced_columns': ['id'],
+            'on_delete': 'SET NULL', 'on_update': 'RESTRICT'
+        },
+        'patients_city_foreign': {
+            'columns': ['city'], 'referenced_table': 'cities', 'referenced_columns': ['city_code'],
+            'on_delete': 'RESTRICT', 'on_update': 'RESTRICT'
+        }
+    }
+}
+
+
+class FakeDatabase:
+    """
+    Responde às consultas do DeferredIndexes a partir do esquema em memória
+
+    duplicates: coluna -> [(chave, ocorrências)] dos índices únicos
+    orphans: tabela referenciada -> linhas sem correspondente
+    """
+
+    def __init__(self, has_rows=False, duplicates=None, orphans=None):
+        self.schema = copy.deepcopy(SCHEMA)
+        self.has_rows = has_rows
+        self.duplicates = duplicates or {}
+        self.orphans = orphans or {}
+        self.foreign_key_checks = 1
+        self.alters = []
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def _duplicate_rows(self, query):
+        for column, rows in self.duplicates.items():
+            if f"`{column}` IS NOT NULL" in query:
+                return rows
+        return []
+
+    def execute(self, query, params):
+        if 'information_schema.STATISTICS' in query:
+            return [
+                {'name': name, 'non_unique': int(not index['unique']), 'type': index['type'],
+                 'column_name': column, 'sub_part': sub_part}
+                for name, index in sorted(self.schema['indexes'].items())
+                for column, sub_part in index['columns']
+            ]
+        if 'information_schema.KEY_COLUMN_USAGE' in query:
+            return [
+                {'name': name, 'column_name': column, 'referenced_table': foreign_key['referenced_table'],
+                 'referenced_column': referenced, 'on_delete': foreign_key['on_delete'],
+                 'on_update': foreign_key['on_update']}
+                for name, foreign_key in sorted(self.schema['foreign_keys'].items())
+                for column, referenced in zip(foreign_key['columns'], foreign_key['referenced_columns'])
+            ]
+        if 'AS found' in query:
+            return [{'found': 1}] if self.has_rows else []
+        if ') repeated' in query:
+            return [{'total': len(self._duplicate_rows(query))}]
+        if 'AS k0' in query:
+            return [{'k0': key, 'total': total} for key, total in self._duplicate_rows(query)]
+        if 'LEFT JOIN' in query:
+            referenced = re.search(r'LEFT JOIN `([^`]+)`', query).group(1)
+            return [{'total': self.orphans.get(referenced, 0)}]
+        if '@@foreign_key_checks' in query:
+            return [{'checks': self.foreign_key_checks}]
+        if query.startswith('SET foreign_key_checks'):
+            self.foreign_key_checks = int(query.rsplit('=', 1)[1])
+            return []
+        if query.startswith('ALTER TABLE'):
+            self.alters.append(query)
+            for name in re.findall(r'DROP INDEX `([^`]+)`', query):
+                del self.schema['indexes'][name]
+            for name in re.findall(r'DROP FOREIGN KEY `([^`]+)`', query):
+                del self.schema['foreign_keys'][name]
+            for name in re.findall(r'ADD (?:UNIQUE )?INDEX `([^`]+)`', query):
+                self.schema['indexes'][name] = copy.deepcopy(SCHEMA['indexes'][name])
+            for name in re.findall(r'ADD CONSTRAINT `([^`]+)`', query):
+                assert self.foreign_key_checks == 0
+                self.schema['foreign_keys'][name] = copy.deepcopy(SCHEMA['foreign_keys'][name])
+            return []
+        raise AssertionError(f"consulta inesperada: {query}")
+
+
+class FakeCursor:
+    def __init__(self, database):
+        self.database = database
+        self.rows = []
+
+    def execute(self, query, params=None):
+        self.rows = self.database.execute(query.strip(), params)
+
+    def fetchall(self):
+        return self.rows
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+class FakeImporter:
+    def __init__(self, database, resume=False):
+        self.connection = database
+        self.resume = resume
+
+
+def _dropped(tmp_path, **database_options):
+    """Banco simulado com os índices já removidos por DeferredIndexes.drop"""
+    database = FakeDatabase(**database_options)
+    has_rows = database.has_rows
+    database.has_rows = False
+    deferred = DeferredIndexes(FakeImporter(database), 'patients', str(tmp_path))
+    assert deferred.drop()
+    database.has_rows = has_rows
+    return database, deferred
+
+
+def test_definitions():
+    assert index_definition('patients_name_index', SCHEMA['indexes']['patients_name_index']) == (
+        'ADD INDEX `patients_name_index` (`full_name`(20))'
+    )
+    assert index_definition('patients_cpf_unique', SCHEMA['indexes']['patients_cpf_unique']) == (
+        'ADD UNIQUE INDEX `patients_cpf_unique` (`cpf`)'
+    )
+    assert index_definition('location', {'unique': False, 'type': 'SPATIAL', 'columns': [['location', None]]}) == (
+        'ADD SPATIAL INDEX `location` (`location`)'
+    )
+    assert foreign_key_definition('patients_cid_id_foreign', SCHEMA['foreign_keys']['patients_cid_id_foreign']) == (
+        'ADD CONSTRAINT `patients_cid_id_foreign` FOREIGN KEY (`cid_id`) REFERENCES `cid10` (`id`) '
+        'ON DELETE SET NULL ON UPDATE RESTRICT'
+    )
+
+
+def test_drop_and_rebuild(tmp_path):
+    database, deferred = _dropped(tmp_path)
+
+    assert database.schema == {'indexes': {}, 'foreign_keys': {}}
+    assert os.path.exists(deferred.state_path)
+
+    deferred.rebuild()
+
+    assert database.schema == SCHEMA
+    assert database.foreign_key_checks == 1
+    assert not os.path.exists(deferred.state_path)
+    # Todos os índices em um único ALTER, e as foreign keys em outro
+    assert len(database.alters) == 4
+    assert database.alters[2].count('ADD ') == 3
+    assert database.alters[2].endswith(', ALGORITHM=INPLACE')
+
+
+def test_table_with_rows_keeps_indexes(tmp_path):
+    database = FakeDatabase(has_rows=True)
+
+    assert not DeferredIndexes(FakeImporter(database), 'patients', str(tmp_path)).drop()
+    assert database.alters == []
+    assert os.listdir(tmp_path) == []
+
+
+def test_pending_schema_with_rows_requires_resume(tmp_path):
+    database, _ = _dropped(tmp_path, has_rows=True)
+
+    with pytest.raises(SystemExit):
+        DeferredIndexes(FakeImporter(database), 'patients', str(tmp_path)).drop()
+
+    resumed = DeferredIndexes(FakeImporter(database, resume=True), 'patients', str(tmp_path))
+    assert resumed.drop()
+    assert resumed.schema == SCHEMA
+
+
+def test_unique_index_with_duplicates_stays_pending(tmp_path, caplog):
+    database, deferred = _dropped(tmp_path, duplicates={'cpf': [('12345678909', 3), ('98765432100', 2)]})
+
+    with caplog.at_level(logging.ERROR), pytest.raises(SystemExit):
+        deferred.rebuild()
+
+    # O restante é recriado: a tabela continua consultável
+    assert sorted(database.schema['indexes']) == ['patients_city_index', 'patients_name_index']
+    assert sorted(database.schema['foreign_keys']) == sorted(SCHEMA['foreign_keys'])
+    assert os.path.exists(deferred.state_path)
+    messages = '\n'.join(record.getMessage() for record in caplog.records)
+    assert 'patients_cpf_unique: 2 chaves repetidas' in messages
+    assert '12345678909 (3x)' in messages
+
+    # Depois de corrigidas as linhas, a nova execução recria só o que falta
+    database.duplicates = {}
+    resumed = DeferredIndexes(FakeImporter(database, resume=True), 'patients', str(tmp_path))
+    assert resumed.drop()
+    database.alters = []
+    resumed.rebuild()
+
+    assert database.schema == SCHEMA
+    assert database.alters == ['ALTER TABLE patients ADD UNIQUE INDEX `patients_cpf_unique` (`cpf`), ALGORITHM=INPLACE']
+    assert not os.path.exists(deferred.state_path)
+
+
+def test_foreign_key_with_orphans_stays_pending(tmp_path, caplog):
+    database, deferred = _dropped(tmp_path, orphans={'cities': 4})
+
+    with caplog.at_level(logging.ERROR), pytest.raises(SystemExit):
+        deferred.rebuild()
+
+    assert database.schema['indexes'] == SCHEMA['indexes']
+    assert list(database.schema['foreign_keys']) == ['patients_cid_id_foreign']
+    assert database.foreign_key_checks == 1
+    assert 'patients_city_foreign: 4 linhas sem correspondente em cities' in caplog.text
+
+
+def test_verify_reports_differences(tmp_path, caplog):
+    database, deferred = _dropped(tmp_path)
+    deferred.rebuild()
+    database.schema['indexes']['patients_city_index']['columns'] = [['city', None], ['neighborhood', None]]
+
+    with caplog.at_level(logging.ERROR), pytest.raises(SystemExit):
+        deferred.verify()
+
+    assert 'indexes patients_city_index' in caplog.text
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""
+Testes da importação incremental (hashes de conteúdo e cidades alteradas)
+"""
+
+import logging
+from datetime import datetime
+
+import pytest
+
+from delta import DeltaWriter, log_delta_report, region_value, row_hash
+from table_specs import DIRTY_REGIONS_SPEC, HOSPITAIS_SPEC, ROW_HASHES_SPEC
+
+
+class FakeImporter:
+    """Guarda os hashes, as cidades gravadas e as cidades marcadas em memória"""
+
+    def __init__(self):
+        self.hashes = {}
+        self.cities = {}
+        self.dirty_regions = []
+        self.commits = 0
+
+    def load_row_hashes(self, spec, keys):
+        return {key: self.hashes[key] for key in keys if key in self.hashes}
+
+    def load_row_regions(self, spec, keys):
+        return [self.cities[key] for key in keys if key in self.cities]
+
+    def execute_values(self, spec, rows, sizer):
+        if spec is ROW_HASHES_SPEC:
+            self.hashes.update((key, digest) for _, key, digest in rows)
+        elif spec is DIRTY_REGIONS_SPEC:
+            self.dirty_regions.extend(rows)
+
+    def commit(self):
+        self.commits += 1
+
+
+class FakeWriter:
+    def __init__(self, importer, commits_on_write=True):
+        self.importer = importer
+        self.commits_on_write = commits_on_write
+        self.count = 0
+        self.written = []
+        self.discarded = False
+
+    def write(self, rows):
+        self.written.extend(rows)
+        self.count += len(rows)
+        self.importer.cities.update((row[0], row[2]) for row in rows)
+
+    def close(self):
+        return self.count
+
+    def discard(self):
+        self.discarded = True
+
+
+def _hospital(code, city, beds=10, stamp=datetime(2025, 9, 1)):
+    return (code, f"Hospital {code}", city, 'Centro', beds, stamp, stamp)
+
+
+def test_row_hash_ignores_timestamps():
+    indexes = HOSPITAIS_SPEC.content_indexes()
+
+    first = row_hash(_hospital('H1', 3550308), indexes)
+
+    assert first == row_hash(_hospital('H1', 3550308, stamp=datetime(2026, 1, 1)), indexes)
+    assert first != row_hash(_hospital('H1', 3550308, beds=11), indexes)
+
+
+def test_region_value():
+    assert region_value(None) is None
+    assert region_value(float('nan')) is None
+    assert region_value(3550308.0) == '3550308'
+    assert region_value('3304557') == '3304557'
+
+
+def test_only_new_or_changed_rows_are_written():
+    importer = FakeImporter()
+    with DeltaWriter(importer, FakeWriter(importer), HOSPITAIS_SPEC) as first:
+        first.write([_hospital('H1', 3550308), _hospital('H2', 3304557)])
+    assert first.summary() == {'inserted': 2, 'updated': 0, 'unchanged': 0}
+    importer.dirty_regions = []
+
+    writer = FakeWriter(importer)
+    with DeltaWriter(importer, writer, HOSPITAIS_SPEC) as delta:
+        delta.write([
+            _hospital('H1', 3550308, stamp=datetime(2026, 1, 1)),
+            _hospital('H2', 5300108),
+            _hospital('H3', 3106200)
+        ])
+
+    assert delta.summary() == {'inserted': 1, 'updated': 1, 'unchanged': 1}
+    assert [row[0] for row in writer.written] == ['H2', 'H3']
+    # H2 mudou de cidade: a cidade anterior também precisa ser recalculada
+    assert importer.dirty_regions == [('hospitals', '3106200'), ('hospitals', '3304557'), ('hospitals', '5300108')]
+    assert len(importer.hashes) == 3
+
+
+def test_repeated_key_in_batch_counts_as_new():
+    importer = FakeImporter()
+
+    with DeltaWriter(importer, FakeWriter(importer), HOSPITAIS_SPEC) as delta:
+        delta.write([_hospital('H1', 3550308), _hospital('H1', 3550308, beds=20)])
+
+    assert delta.summary() == {'inserted': 2, 'updated': 0, 'unchanged': 0}
+
+
+def test_hashes_wait_for_writer_confirmation():
+    importer = FakeImporter()
+
+    delta = DeltaWriter(importer, FakeWriter(importer, commits_on_write=False), HOSPITAIS_SPEC)
+    delta.write([_hospital('H1', 3550308)])
+    assert importer.hashes == {}
+    delta.close()
+
+    assert list(importer.hashes) == ['H1']
+    assert importer.commits == 1
+
+
+def test_discard_drops_pending_hashes():
+    importer = FakeImporter()
+    writer = FakeWriter(importer, commits_on_write=False)
+
+    with pytest.raises(ValueError):
+        with DeltaWriter(importer, writer, HOSPITAIS_SPEC) as delta:
+            delta.write([_hospital('H1', 3550308)])
+            raise ValueError('falha simulada')
+
+    assert writer.discarded
+    assert importer.hashes == {}
+    assert importer.dirty_regions == []
+
+
+def test_delta_report(caplog):
+    summary = {'inserted': 3, 'updated': 2, 'unchanged': 5, 'known': 10}
+
+    with caplog.at_level(logging.INFO):
+        log_delta_report('hospitals', summary)
+        log_delta_report('hospitals', summary, complete=False)
+
+    messages = [record.getMessage() for record in caplog.records]
+    assert messages[0] == (
+        'hospitals delta: 3 inseridos, 2 atualizados, 5 inalterados, 3 ausentes da origem (mantidos no banco)'
+    )
+    assert 'ausentes' not in messages[1]
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""
+Testes da ordenação externa dos registros
+"""
+
+import logging
+import os
+import random
+from operator import itemgetter
+
+from external_sort import CollationKey, sorted_records
+
+
+def _records(count, keys):
+    generator = random.Random(7)
+    return [(f"P{generator.randrange(keys):05d}", index) for index in range(count)]
+
+
+def test_in_memory_sort_is_stable():
+    records = _records(100, 20)
+
+    assert list(sorted_records(records, itemgetter(0), run_records=1000)) == sorted(records, key=itemgetter(0))
+
+
+def test_spilled_runs_are_merged(tmp_path):
+    records = _records(1000, 50)
+
+    result = list(sorted_records(records, itemgetter(0), run_records=64, spill_dir=str(tmp_path), fan_in=3))
+
+    # sorted() é estável: com chaves repetidas os registros seguem a ordem de leitura
+    assert result == sorted(records, key=itemgetter(0))
+    assert os.listdir(tmp_path) == []
+
+
+def test_empty_source():
+    assert list(sorted_records(iter([]), itemgetter(0))) == []
+
+
+def test_collation_key_ignores_case():
+    records = [('b2', 0), ('A10', 1), ('a1', 2), ('B1', 3), ('9', 4)]
+
+    result = list(sorted_records(records, CollationKey(0)))
+
+    assert [codigo for codigo, _ in result] == ['9', 'a1', 'A10', 'B1', 'b2']
+
+
+def test_collation_key_warns_once(caplog):
+    key = CollationKey(0, 'pacientes.xml')
+
+    with caplog.at_level(logging.WARNING):
+        key(('P-1',))
+        key(('P-2',))
+        key(('Ç1',))
+
+    assert len(caplog.records) == 1
+    assert 'P-1' in caplog.records[0].getMessage()
@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+"""
+Testes dos mapeamentos compactos código -> id
+"""
+
+import pickle
+
+import numpy as np
+
+from lookups import MISSING, SortedLookup
+
+
+def test_integer_keys():
+    lookup = SortedLookup([3550308, 1100015, 5300108], [30, 10, 50])
+
+    assert lookup.resolve([1100015, 5300108, 42, 3550308]).tolist() == [10, 50, MISSING, 30]
+    assert lookup.get(3550308) == 30
+    assert lookup.get(42) is None
+    assert len(lookup) == 3
+
+
+def test_text_keys_are_not_truncated():
+    lookup = SortedLookup(['A00', 'B20', 'Ç10'], [1, 2, 3])
+
+    assert lookup.resolve(['B20', 'Ç10', 'A001', 'A0', '']).tolist() == [2, 3, MISSING, MISSING, MISSING]
+
+
+def test_empty_lookup():
+    lookup = SortedLookup(np.array([], dtype=np.int64), [])
+
+    assert lookup.resolve([1, 2]).tolist() == [MISSING, MISSING]
+
+
+def test_shared_lookup_is_pickled_by_path(tmp_path):
+    lookup = SortedLookup(['H1', 'H2'], [7, 8])
+
+    shared = lookup.share(str(tmp_path), 'hospitais')
+    copy = pickle.loads(pickle.dumps(shared))
+
+    assert isinstance(copy.keys, np.memmap)
+    assert copy.resolve(['H2', 'H1', 'H3']).tolist() == [8, 7, MISSING]
+    assert len(pickle.dumps(shared)) < 200
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""
+Testes das métricas da importação (contagens e formato do Prometheus)
+"""
+
+from metrics import ImportMetrics, PROMETHEUS_FAMILIES, ROWS_PARSED, ROWS_REJECTED, split_affected
+
+HISTOGRAM_SUFFIXES = ('_bucket', '_sum', '_count')
+
+
+def _family(line):
+    """Família de uma linha do arquivo (comentário HELP/TYPE ou amostra)"""
+    if line.startswith('#'):
+        return line.split()[2]
+    name = line.split('{')[0]
+    for suffix in HISTOGRAM_SUFFIXES:
+        if name.endswith(suffix) and name[:-len(suffix)] == 'import_statement_seconds':
+            return name[:-len(suffix)]
+    return name
+
+
+def _two_stages():
+    metrics = ImportMetrics()
+    for name, rows in (('municipios', 50), ('pacientes', 2500)):
+        stage = metrics.stage(name)
+        stage.count(ROWS_PARSED, rows)
+        stage.count(ROWS_REJECTED, 1)
+        stage.record_statement('cities', rows, rows, 0.02)
+        stage.record_statement('cities', rows, rows * 2, 3.0)
+    return metrics
+
+
+def test_each_family_is_contiguous():
+    lines = _two_stages().prometheus_text().splitlines()
+
+    families = [_family(line) for line in lines]
+    order = [family for index, family in enumerate(families) if index == 0 or family != families[index - 1]]
+    assert order == [family for family, _, _ in PROMETHEUS_FAMILIES]
+
+    for family, kind, _ in PROMETHEUS_FAMILIES:
+        block = [line for line in lines if _family(line) == family]
+        assert block[0].startswith(f'# HELP {family} ')
+        assert block[1] == f'# TYPE {family} {kind}'
+        if family != 'import_gc_collections_total':
+            # As coletas do GC só têm amostras nas gerações em que houve coleta
+            assert any('stage="municipios"' in line for line in block[2:])
+            assert any('stage="pacientes"' in line for line in block[2:])
+
+
+def test_sample_values():
+    lines = _two_stages().prometheus_text().splitlines()
+
+    assert 'import_rows_total{stage="pacientes",kind="parsed"} 2500' in lines
+    assert 'import_table_rows_total{stage="pacientes",table="cities",kind="inserted"} 2500' in lines
+    assert 'import_table_rows_total{stage="pacientes",table="cities",kind="updated"} 2500' in lines
+    assert 'import_statement_seconds_bucket{stage="pacientes",le="+Inf"} 2' in lines
+    assert 'import_statement_seconds_count{stage="municipios"} 2' in lines
+    buckets = [int(line.split()[-1]) for line in lines
+               if line.startswith('import_statement_seconds_bucket{stage="municipios"')]
+    assert buckets == sorted(buckets)
+
+
+def test_split_affected():
+    assert split_affected(10, 10) == (10, 0)
+    assert split_affected(10, 14) == (6, 4)
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""
+Testes da gravação em pipeline com threads gravadoras
+"""
+
+import sys
+import threading
+
+import pytest
+
+from pipeline import PipelinedWriter
+from table_specs import ESTADOS_SPEC
+
+
+class FakeServer:
+    """Guarda os lotes gravados por todas as threads"""
+
+    def __init__(self, fail_on=None):
+        self.lock = threading.Lock()
+        self.batches = []
+        self.connections = 0
+        self.fail_on = fail_on
+
+
+class FakeBatchWriter:
+    def __init__(self, server):
+        self.server = server
+
+    def write(self, rows):
+        if self.server.fail_on in rows:
+            # Como execute_values, o gravador encerra o processo em caso de erro
+            sys.exit(1)
+        with self.server.lock:
+            self.server.batches.append(list(rows))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+class FakeImporter:
+    def __init__(self, server):
+        self.server = server
+
+    def clone(self):
+        return FakeImporter(self.server)
+
+    def connect(self):
+        with self.server.lock:
+            self.server.connections += 1
+
+    def disconnect(self):
+        with self.server.lock:
+            self.server.connections -= 1
+
+    def open_writer(self, spec):
+        return FakeBatchWriter(self.server)
+
+
+def test_rows_are_split_into_batches():
+    server = FakeServer()
+    rows = list(range(25))
+
+    with PipelinedWriter(FakeImporter(server), ESTADOS_SPEC, batch_size=10, writers=3) as writer:
+        writer.write(rows[:12])
+        writer.write(rows[12:])
+
+    assert writer.count == 25
+    assert sorted(len(batch) for batch in server.batches) == [2, 3, 10, 10]
+    assert sorted(row for batch in server.batches for row in batch) == rows
+    assert server.connections == 0
+
+
+def test_writer_failure_reaches_producer():
+    server = FakeServer(fail_on=3)
+    writer = PipelinedWriter(FakeImporter(server), ESTADOS_SPEC, batch_size=2, writers=1, queue_size=1)
+
+    with pytest.raises(RuntimeError, match='writer-1: SystemExit'):
+        for start in range(0, 100, 2):
+            writer.write([start, start + 1])
+        writer.close()
+    writer.discard()
+
+    assert server.connections == 0
+    assert [0, 1] in server.batches
+    assert len(server.batches) < 50
+
+
+def test_discard_drops_queued_batches():
+    server = FakeServer()
+    writer = PipelinedWriter(FakeImporter(server), ESTADOS_SPEC, batch_size=None, writers=2)
+
+    with pytest.raises(ValueError):
+        with writer:
+            writer.write([1, 2, 3])
+            raise ValueError('falha simulada no parser')
+
+    assert writer.closed
+    assert server.connections == 0
+    assert all(batch == [1, 2, 3] for batch in server.batches)
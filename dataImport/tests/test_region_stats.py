@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""
+Testes dos agregados por cidade
+"""
+
+import numpy as np
+import pandas as pd
+
+from region_stats import RegionStatsAccumulator, SCOPE_CITY, TOTAL
+
+
+def _patients(generator, rows, cities, cids):
+    return pd.DataFrame({
+        'city': generator.integers(1, cities + 1, rows),
+        'gender': generator.choice(['M', 'F'], rows),
+        'has_insurance': generator.integers(0, 2, rows),
+        'cid_id': generator.integers(1, cids + 1, rows).astype(float)
+    })
+
+
+def test_chunks_are_folded_into_bounded_totals():
+    generator = np.random.default_rng(3)
+    accumulator = RegionStatsAccumulator(fold_rows=2000)
+    chunks = [_patients(generator, 10000, 100, 50) for _ in range(50)]
+
+    retained = []
+    for chunk in chunks:
+        accumulator.add_patients(chunk)
+        retained.append(accumulator.retained_rows)
+    rows = accumulator.rows('agora')
+
+    # 100 cidades: total, com convênio, 2 gêneros e até 50 CIDs
+    assert len(rows) <= 100 * (1 + 1 + 2 + 50)
+    # Totais, mais as parciais abaixo do limite de soma, mais a contagem de um bloco
+    assert max(retained) <= 2 * len(rows) + 2000 + 10000
+
+    patients = pd.concat(chunks, ignore_index=True)
+    values = {(city, metric, dimension): value for _, city, metric, dimension, value, _, _ in rows}
+    by_city = patients.groupby('city').size()
+    assert all(values[(city, 'patients', TOTAL)] == count for city, count in by_city.items())
+    by_cid = patients.groupby(['city', 'cid_id']).size()
+    assert all(values[(city, 'patients_cid', str(int(cid)))] == count for (city, cid), count in by_cid.items())
+    insured = patients[patients['has_insurance'] == 1].groupby('city').size()
+    assert all(values[(city, 'patients_insured', TOTAL)] == count for city, count in insured.items())
+    assert sum(value for (_, metric, _), value in values.items() if metric == 'patients_gender') == len(patients)
+
+
+def test_rows_are_sorted_and_typed():
+    accumulator = RegionStatsAccumulator(fold_rows=1)
+    accumulator.add_hospitals(pd.DataFrame({'city': [2, 1, 2], 'total_beds': [10, None, 5]}))
+    accumulator.add_doctors(pd.DataFrame({'city': [1, None], 'specialty': ['Cardiologia', 'Pediatria']}))
+
+    rows = accumulator.rows('agora')
+
+    assert rows == [
+        (SCOPE_CITY, 1, 'beds', TOTAL, 0, 'agora', 'agora'),
+        (SCOPE_CITY, 1, 'doctors', TOTAL, 1, 'agora', 'agora'),
+        (SCOPE_CITY, 1, 'doctors_specialty', 'Cardiologia', 1, 'agora', 'agora'),
+        (SCOPE_CITY, 1, 'hospitals', TOTAL, 1, 'agora', 'agora'),
+        (SCOPE_CITY, 2, 'beds', TOTAL, 15, 'agora', 'agora'),
+        (SCOPE_CITY, 2, 'hospitals', TOTAL, 2, 'agora', 'agora'),
+    ]
+    assert all(type(row[1]) is int and type(row[4]) is int for row in rows)
+
+
+def test_empty_accumulator():
+    assert RegionStatsAccumulator().rows('agora') == []
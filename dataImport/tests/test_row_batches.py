@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""
+Testes dos lotes de linhas em colunas
+"""
+
+from row_batches import Constant, RowBatch, select_rows
+
+
+def _batch():
+    return RowBatch([['a', 'b', 'c'], [1, 2, 3], Constant('agora')])
+
+
+def test_rows_and_length():
+    batch = _batch()
+
+    assert len(batch) == 3
+    assert list(batch) == [('a', 1, 'agora'), ('b', 2, 'agora'), ('c', 3, 'agora')]
+    assert batch[1] == ('b', 2, 'agora')
+
+
+def test_constant_only_batch_needs_length():
+    assert len(RowBatch([Constant(1)])) == 0
+    assert list(RowBatch([Constant(1)], length=2)) == [(1,), (1,)]
+
+
+def test_slice_keeps_constants():
+    part = _batch()[1:]
+
+    assert isinstance(part, RowBatch)
+    assert isinstance(part.columns[2], Constant)
+    assert list(part) == [('b', 2, 'agora'), ('c', 3, 'agora')]
+    assert len(_batch()[::2]) == 2
+
+
+def test_select():
+    batch = _batch()
+
+    selected = batch.select([True, False, True])
+
+    assert list(selected) == [('a', 1, 'agora'), ('c', 3, 'agora')]
+    assert list(select_rows(batch, [False, True, False])) == [('b', 2, 'agora')]
+    assert select_rows([('x',), ('y',)], [False, True]) == [('y',)]
+
+
+def test_formatted_formats_constant_once():
+    calls = []
+
+    def format_constant(value):
+        calls.append(value)
+        return f"'{value}'"
+
+    rows = list(_batch().formatted([str.upper, str, format_constant]))
+
+    assert rows == [('A', '1', "'agora'"), ('B', '2', "'agora'"), ('C', '3', "'agora'")]
+    assert calls == ['agora']
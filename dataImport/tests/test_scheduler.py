@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""
+Testes do agendador das etapas de importação
+"""
+
+import sys
+import threading
+import time
+
+import pytest
+
+from metrics import ImportMetrics
+from scheduler import StageScheduler
+
+
+class FakeImporter:
+    def __init__(self, connections):
+        self.connections = connections
+        self.committed = False
+
+    def connect(self):
+        self.connections.append(self)
+
+    def commit(self):
+        self.committed = True
+
+    def disconnect(self):
+        self.connections.remove(self)
+
+
+class Recorder:
+    """Registra a ordem de início e fim das etapas e as conexões abertas ao mesmo tempo"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.events = []
+        self.connections = []
+        self.max_connections = 0
+
+    def factory(self):
+        return FakeImporter(self.connections)
+
+    def stage(self, name, seconds=0.01, result=None):
+        def run(importer):
+            with self.lock:
+                self.events.append(('start', name))
+                self.max_connections = max(self.max_connections, len(self.connections))
+            time.sleep(seconds)
+            with self.lock:
+                self.events.append(('end', name))
+            return result
+        return run
+
+
+def test_dependencies_finish_before_dependents():
+    recorder = Recorder()
+    scheduler = StageScheduler(recorder.factory, max_parallel=3, metrics=ImportMetrics())
+    scheduler.add('estados', recorder.stage('estados', result=27))
+    scheduler.add('municipios', recorder.stage('municipios'), depends_on=('estados',))
+    scheduler.add('cid10', recorder.stage('cid10', 0.05))
+    scheduler.add('pacientes', recorder.stage('pacientes'), depends_on=('municipios', 'cid10', 'sem_origem'))
+
+    results = scheduler.run()
+
+    assert results['estados'] == 27
+    position = {event: index for index, event in enumerate(recorder.events)}
+    assert position[('end', 'estados')] < position[('start', 'municipios')]
+    assert position[('end', 'municipios')] < position[('start', 'pacientes')]
+    assert position[('end', 'cid10')] < position[('start', 'pacientes')]
+    # estados e cid10 não dependem de nada e começam juntos
+    assert position[('start', 'cid10')] < position[('end', 'estados')]
+    assert recorder.max_connections <= 3
+    assert recorder.connections == []
+    # cid10 demora mais que estados + municipios: é ele que segura pacientes
+    assert [stage.name for stage in scheduler.critical_path()] == ['cid10', 'pacientes']
+
+
+def test_max_parallel_limits_connections():
+    recorder = Recorder()
+    scheduler = StageScheduler(recorder.factory, max_parallel=1, metrics=ImportMetrics())
+    for name in ('a', 'b', 'c'):
+        scheduler.add(name, recorder.stage(name))
+
+    scheduler.run()
+
+    assert recorder.max_connections == 1
+    assert [event for event, _ in recorder.events] == ['start', 'end'] * 3
+
+
+def test_failure_stops_new_stages():
+    recorder = Recorder()
+
+    def fail(importer):
+        # Os métodos do importador encerram o processo em caso de erro
+        sys.exit(1)
+
+    scheduler = StageScheduler(recorder.factory, max_parallel=2, metrics=ImportMetrics())
+    scheduler.add('estados', fail)
+    scheduler.add('municipios', recorder.stage('municipios'), depends_on=('estados',))
+
+    with pytest.raises(RuntimeError, match='Falha na etapa estados'):
+        scheduler.run()
+
+    assert recorder.events == []
+    assert recorder.connections == []
+
+
+def test_cycles_and_duplicates_are_rejected():
+    scheduler = StageScheduler(Recorder().factory, metrics=ImportMetrics())
+    scheduler.add('a', None, depends_on=('b',))
+    scheduler.add('b', None, depends_on=('a',))
+
+    with pytest.raises(ValueError, match='a -> b -> a'):
+        scheduler.run()
+    with pytest.raises(ValueError, match='duplicada'):
+        scheduler.add('a', None)
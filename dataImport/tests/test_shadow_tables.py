@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""
+Testes dos nomes e comandos das tabelas-sombra
+"""
+
+from shadow_tables import ShadowTables
+
+HOSPITALS_DDL = """CREATE TABLE `hospitals` (
+  `id` bigint unsigned NOT NULL AUTO_INCREMENT,
+  `hospital_code` varchar(20) NOT NULL,
+  `city` int DEFAULT NULL,
+  `state_id` bigint unsigned NOT NULL,
+  PRIMARY KEY (`id`),
+  KEY `hospitals_city_foreign` (`city`),
+  CONSTRAINT `hospitals_city_foreign` FOREIGN KEY (`city`) REFERENCES `cities` (`city_code`),
+  CONSTRAINT `hospitals_state_id_foreign` FOREIGN KEY (`state_id`) REFERENCES `states` (`id`),
+  CONSTRAINT `hospitals_beds_check` CHECK ((`total_beds` >= 0))
+) ENGINE=InnoDB AUTO_INCREMENT=5321 DEFAULT CHARSET=utf8mb4"""
+
+
+def test_names():
+    shadow = ShadowTables()
+
+    assert shadow.name('hospitals') == 'hospitals_new'
+    assert shadow.name('states') == 'states'
+    assert shadow.old_name('hospitals') == 'hospitals_old'
+
+
+def test_create_query_rewrites_definition():
+    query = ShadowTables().create_query('hospitals', HOSPITALS_DDL)
+
+    assert query.startswith('CREATE TABLE `hospitals_new` (')
+    # Referências a tabelas do grupo vão para as sombras; as demais continuam
+    assert 'REFERENCES `cities_new` (`city_code`)' in query
+    assert 'REFERENCES `states` (`id`)' in query
+    # Constraints sem nome: o InnoDB gera nomes temporários
+    assert '  FOREIGN KEY (`city`) REFERENCES' in query
+    assert '  CHECK ((`total_beds` >= 0))' in query
+    assert 'CONSTRAINT' not in query
+    # O nome do índice não é de constraint e continua igual
+    assert 'KEY `hospitals_city_foreign` (`city`)' in query
+    assert 'AUTO_INCREMENT=' not in query
+    assert '`id` bigint unsigned NOT NULL AUTO_INCREMENT,' in query
+
+
+def test_swap_and_rollback_queries():
+    shadow = ShadowTables(('cities', 'hospitals'))
+
+    assert shadow.swap_query() == (
+        'RENAME TABLE cities TO cities_old, cities_new TO cities, '
+        'hospitals TO hospitals_old, hospitals_new TO hospitals'
+    )
+    assert shadow.rollback_query() == (
+        'RENAME TABLE cities TO cities_new, cities_old TO cities, '
+        'hospitals TO hospitals_new, hospitals_old TO hospitals'
+    )
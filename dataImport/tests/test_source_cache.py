@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""
+Testes do cache de origens (tabelas colunares e resultados com pickle)
+"""
+
+import os
+
+import pandas as pd
+
+from patient_parsers import PATIENT_FIELDS
+from source_cache import SourceCache
+
+from samples import valid_cpf, patient
+
+
+def _source(tmp_path, content='origem'):
+    path = tmp_path / 'origem.txt'
+    path.write_text(content, encoding='utf-8')
+    return str(path)
+
+
+def test_records_round_trip(tmp_path):
+    cache = SourceCache(str(tmp_path / 'cache'))
+    source = _source(tmp_path)
+    records = [patient(f"P{index}", valid_cpf(index + 1), nome=f"Ana {index}") for index in range(25)]
+    records[3] = records[3][:5] + ('',) + records[3][6:]
+
+    assert cache.table(source, 'pacientes.xml') is None
+    builder = cache.builder(source, 'pacientes.xml')
+    part = builder.part_writer(0, PATIENT_FIELDS)
+    part.part_rows = 10
+    for record in records:
+        part.append(record)
+    part.close()
+    assert builder.commit()
+
+    table = cache.table(source, 'pacientes.xml')
+    assert table.rows == 25
+    assert len(table.parts) == 3
+    assert list(table.iter_records()) == records
+    assert list(table.iter_records(8, 12)) == records[8:12]
+    assert table.row_ranges(2) == [(0, 12), (12, 25)]
+
+
+def test_frames_round_trip(tmp_path):
+    cache = SourceCache(str(tmp_path / 'cache'))
+    source = _source(tmp_path)
+    frames = [
+        pd.DataFrame({'codigo': ['H1', 'H2'], 'nome': ['A', None], 'leitos': [10, 20]}),
+        pd.DataFrame({'codigo': ['H3'], 'nome': ['C'], 'leitos': [30]}, index=[2])
+    ]
+
+    builder = cache.builder(source, 'hospitais.csv')
+    part = builder.part_writer()
+    for frame in frames:
+        part.write_frame(frame)
+    part.close()
+    builder.commit()
+
+    cached = list(cache.table(source, 'hospitais.csv').iter_frames(1))
+    assert cached[0]['codigo'].tolist() == ['H2']
+    assert pd.isna(cached[0]['nome'].iloc[0])
+    assert cached[1].index.tolist() == [2]
+    assert cached[1]['leitos'].tolist() == [30]
+
+
+def test_incomplete_table_is_not_published(tmp_path):
+    cache = SourceCache(str(tmp_path / 'cache'))
+    source = _source(tmp_path)
+
+    builder = cache.builder(source, 'pacientes.xml')
+    part = builder.part_writer(0, PATIENT_FIELDS)
+    part.append(patient('P1', valid_cpf(1)))
+    part.flush()
+
+    assert not builder.commit()
+    assert cache.table(source, 'pacientes.xml') is None
+
+
+def test_pickled_value_is_read_until_source_changes(tmp_path):
+    cache = SourceCache(str(tmp_path / 'cache'))
+    source = _source(tmp_path)
+    calls = []
+
+    def parse():
+        calls.append(1)
+        return {'A00': 1}
+
+    assert cache.get(source, 'cid10', parse) == {'A00': 1}
+    assert cache.get(source, 'cid10', parse) == {'A00': 1}
+    assert len(calls) == 1
+
+    _source(tmp_path, 'origem alterada')
+    cache.get(source, 'cid10', parse)
+    assert len(calls) == 2
+    assert len([name for name in os.listdir(tmp_path / 'cache') if name.startswith('cid10')]) == 1
+
+
+def test_disabled_cache(tmp_path):
+    cache = SourceCache(None)
+    source = _source(tmp_path)
+
+    assert cache.get(source, 'cid10', lambda: 1) == 1
+    assert cache.table(source, 'pacientes.xml') is None
+    assert cache.builder(source, 'pacientes.xml') is None
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""
+Testes da validação e da deduplicação dos pacientes
+"""
+
+import numpy as np
+
+import main
+from lookups import SortedLookup
+from validation import (
+    PatientValidator, CompactKeySet, cpf_is_valid, find_duplicates, patient_keys,
+    DUPLICATE_NONE, DUPLICATE_CODIGO, DUPLICATE_CPF, REJECT_DUPLICATE_CPF, REJECT_CPF
+)
+from xml_shards import find_shard_ranges
+
+from samples import valid_cpf, patient, write_patients_xml
+
+
+def test_cpf_is_valid():
+    assert cpf_is_valid('52998224725')
+    assert cpf_is_valid(valid_cpf(123456789))
+    assert not cpf_is_valid('52998224724')
+    assert not cpf_is_valid('11111111111')
+    assert not cpf_is_valid('5299822472')
+    assert not cpf_is_valid('5299822472a')
+
+
+def test_compact_key_set_marks_repeated_keys():
+    keys = CompactKeySet(capacity=4)
+    assert keys.add(np.array([5, 7, 5, 9])).tolist() == [False, False, True, False]
+    assert keys.add(np.array([9, 11])).tolist() == [True, False]
+    assert len(keys) == 4
+
+
+def test_compact_key_set_grows_past_capacity():
+    keys = CompactKeySet(capacity=4)
+    values = np.arange(0, 10000, 7, dtype=np.int64)
+    assert not keys.add(values).any()
+    assert keys.add(values).all()
+    assert len(keys) == len(values)
+    assert len(keys.table) >= 2 * len(values)
+
+
+def test_validator_keeps_first_codigo_and_cpf(tmp_path):
+    validator = PatientValidator(str(tmp_path / 'rejeitados.csv'))
+    cpf = valid_cpf(1)
+    batch = [patient('P1', cpf), patient('P2', valid_cpf(2)), patient('P3', cpf), patient('P1', valid_cpf(3))]
+    assert validator.unique(batch).tolist() == [True, True, False, False]
+    assert validator.unique([patient('P4', valid_cpf(2))]).tolist() == [False]
+    assert validator.check(patient('P5', '12345678900')) == REJECT_CPF
+    validator.close()
+    assert validator.rejected[REJECT_DUPLICATE_CPF] == 2
+
+
+def test_find_duplicates_across_shards():
+    first = patient_keys([patient('P1', valid_cpf(1)), patient('P2', valid_cpf(2))])
+    second = patient_keys([patient('P3', valid_cpf(1)), patient('P2', valid_cpf(4)), patient('P5', valid_cpf(5))])
+    duplicates = find_duplicates([first, second])
+    assert duplicates[0].tolist() == [DUPLICATE_NONE, DUPLICATE_NONE]
+    assert duplicates[1].tolist() == [DUPLICATE_CPF, DUPLICATE_CODIGO, DUPLICATE_NONE]
+
+
+def test_same_cpf_in_two_shards_is_rejected(tmp_path):
+    """O mesmo CPF em duas faixas do --workers: só o registro da primeira faixa é mantido"""
+    repeated = valid_cpf(42)
+    records = [patient(f"P{index}", valid_cpf(100 + index)) for index in range(40)]
+    records[3] = patient('P3', repeated)
+    records[35] = patient('P35', repeated)
+    records[36] = patient('P36', valid_cpf(7), city='9999999')
+    xml_path = str(tmp_path / 'pacientes.xml')
+    write_patients_xml(xml_path, records)
+
+    shards = find_shard_ranges(xml_path, 2)
+    assert len(shards) == 2
+    city_lookup = SortedLookup(np.array([3550308], dtype=np.int64), np.array([1], dtype=np.int64))
+    config = {'xml_parser': 'etree', 'sort_patients': False}
+    main._init_xml_worker(config, city_lookup, None, None, None)
+    shard_keys = [
+        main._collect_shard_keys(index, xml_path, start, end)[1:] for index, (start, end) in enumerate(shards)
+    ]
+    # O registro de cidade desconhecida não chega à deduplicação
+    assert sum(len(codigos) for codigos, _ in shard_keys) == 39
+
+    duplicates = find_duplicates(shard_keys)
+    assert np.count_nonzero(duplicates[0]) == 0
+    assert duplicates[1].tolist().count(DUPLICATE_CPF) == 1
+
+    # A faixa que tem a repetição rejeita o registro mesmo sem ter visto o primeiro
+    second = [
+        fields for fields in main._iter_shard_records(xml_path, *shards[1], 'etree') if fields[4] == '3550308'
+    ]
+    validator = PatientValidator(str(tmp_path / 'faixa-1.csv'), duplicates=duplicates[1])
+    keep = validator.unique(second)
+    validator.close()
+    assert [fields[0] for fields, kept in zip(second, keep.tolist()) if not kept] == ['P35']
+    assert validator.rejected[REJECT_DUPLICATE_CPF] == 1
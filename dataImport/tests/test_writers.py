@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+"""
+Testes da formatação das linhas do TSV do LOAD DATA
+"""
+
+from datetime import datetime
+
+from writers import tsv_field
+
+
+def test_nulls():
+    assert tsv_field(None) == '\\N'
+    assert tsv_field(float('nan')) == '\\N'
+
+
+def test_scalars():
+    assert tsv_field(True) == '1'
+    assert tsv_field(False) == '0'
+    assert tsv_field(42) == '42'
+    assert tsv_field(-23.5505) == '-23.5505'
+    assert tsv_field(datetime(2025, 9, 1, 8, 30, 5, 123)) == '2025-09-01 08:30:05'
+
+
+def test_text_is_escaped():
+    assert tsv_field('São Paulo') == 'São Paulo'
+    assert tsv_field('a\tb\nc\rd') == 'a\\tb\\nc\\rd'
+    assert tsv_field('C:\\dados') == 'C:\\\\dados'
+    assert tsv_field('\\N') == '\\\\N'
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""
+Testes da divisão do pacientes.xml em faixas
+"""
+
+from patient_parsers import iter_patient_records
+from xml_shards import ShardReader, find_shard_ranges
+
+from samples import valid_cpf, patient, write_patients_xml
+
+
+def _records(count):
+    return [patient(f"P{index:04d}", valid_cpf(index + 1), nome=f"José & Maria {index}") for index in range(count)]
+
+
+def test_shards_cover_every_record_once(tmp_path):
+    xml_path = str(tmp_path / 'pacientes.xml')
+    records = _records(50)
+    write_patients_xml(xml_path, records)
+
+    shards = find_shard_ranges(xml_path, 4)
+    assert len(shards) == 4
+    assert all(end == next_start for (_, end), (next_start, _) in zip(shards, shards[1:]))
+
+    with open(xml_path, 'rb') as handle:
+        data = handle.read()
+    assert all(data[start:start + len(b'<Paciente>')] == b'<Paciente>' for start, _ in shards)
+
+    read = []
+    for start, end in shards:
+        with ShardReader(xml_path, start, end) as reader:
+            read.extend(iter_patient_records(reader, 'etree'))
+    assert read == records
+
+
+def test_more_shards_than_records(tmp_path):
+    xml_path = str(tmp_path / 'pacientes.xml')
+    write_patients_xml(xml_path, _records(2))
+
+    shards = find_shard_ranges(xml_path, 8)
+
+    assert len(shards) == 2
+    assert all(end > start for start, end in shards)
+
+
+def test_shard_reader_small_reads(tmp_path):
+    xml_path = str(tmp_path / 'pacientes.xml')
+    records = _records(3)
+    write_patients_xml(xml_path, records)
+    (start, end), = find_shard_ranges(xml_path, 1)
+
+    with ShardReader(xml_path, start, end) as reader:
+        chunks = []
+        while True:
+            chunk = reader.read(7)
+            if not chunk:
+                break
+            assert len(chunk) <= 7
+            chunks.append(chunk)
+    document = b''.join(chunks)
+
+    with open(xml_path, 'rb') as handle:
+        handle.seek(start)
+        body = handle.read(end - start)
+    assert document == b'<Pacientes>' + body + b'</Pacientes>'
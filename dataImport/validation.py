@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Validação e deduplicação dos pacientes antes da gravação
+
+Registros com campos obrigatórios vazios, CPF inválido (tamanho ou dígitos
+verificadores) ou gênero fora do domínio são rejeitados; entre registros com o
+mesmo codigo ou o mesmo CPF, só o primeiro do arquivo é mantido. Os rejeitados
+vão para um CSV com o motivo, e o banco recebe apenas lotes válidos e sem chaves
+repetidas.
+
+Autor: Sistema de Importação
+Data: Setembro 2025
+"""
+
+import csv
+import hashlib
+import logging
+import os
+from collections import Counter
+
+import numpy as np
+
+from config import PATIENT_GENDERS
+from patient_parsers import PATIENT_FIELDS
+
+# Motivos gravados na coluna motivo do arquivo de rejeitados
+REJECT_REQUIRED = 'campo_obrigatorio_vazio'
+REJECT_CPF = 'cpf_invalido'
+REJECT_GENDER = 'genero_invalido'
+REJECT_CITY = 'cidade_desconhecida'
+REJECT_DUPLICATE_CODIGO = 'codigo_duplicado'
+REJECT_DUPLICATE_CPF = 'cpf_duplicado'
+
+REJECT_COLUMNS = PATIENT_FIELDS + ('motivo',)
+
+# Resultado da deduplicação feita antes das faixas (find_duplicates), por registro
+DUPLICATE_NONE = 0
+DUPLICATE_CODIGO = 1
+DUPLICATE_CPF = 2
+
+# Posição vazia da tabela de hash (as chaves são sempre não negativas)
+EMPTY = -1
+
+# Constante da multiplicação de Fibonacci usada para espalhar as chaves
+FIBONACCI_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+
+
+def cpf_is_valid(cpf):
+    """CPF com 11 dígitos, não repetidos, e dígitos verificadores corretos"""
+    if len(cpf) != 11 or not cpf.isascii() or not cpf.isdigit() or cpf == cpf[0] * 11:
+        return False
+    digits = [ord(char) - 48 for char in cpf]
+    for position in (9, 10):
+        total = sum(digit * weight for digit, weight in zip(digits, range(position + 1, 1, -1)))
+        if total * 10 % 11 % 10 != digits[position]:
+            return False
+    return True
+
+
+def codigo_key(codigo):
+    """Chave inteira de 63 bits do codigo (colisão improvável: ~n²/2^64)"""
+    digest = hashlib.blake2b(codigo.encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'little') >> 1
+
+
+def invalid_reason(fields, genders=PATIENT_GENDERS):
+    """
+    Valida os campos de um registro
+
+    Args:
+        fields (tuple): Campos na ordem de PATIENT_FIELDS
+        genders (frozenset): Valores aceitos em Genero
+
+    Returns:
+        str: Motivo da rejeição, ou None se o registro é válido
+    """
+    codigo, cpf, nome, genero = fields[:4]
+    if not codigo or not cpf or not nome:
+        return REJECT_REQUIRED
+    if not cpf_is_valid(cpf):
+        return REJECT_CPF
+    if genero not in genders:
+        return REJECT_GENDER
+    return None
+
+
+def patient_keys(fields_list):
+    """
+    Chaves de deduplicação de registros já validados
+
+    Returns:
+        tuple: (hash de 63 bits de cada codigo, CPF numérico de cada registro), vetores int64
+    """
+    count = len(fields_list)
+    codigos = np.fromiter((codigo_key(fields[0]) for fields in fields_list), np.int64, count)
+    cpfs = np.fromiter((int(fields[1]) for fields in fields_list), np.int64, count)
+    return codigos, cpfs
+
+
+class CompactKeySet:
+    def __init__(self, capacity=1 << 16):
+        """
+        Conjunto de inteiros não negativos em um vetor int64 com endereçamento
+        aberto (sondagem linear), ocupando 16 a 32 bytes por chave, contra mais de
+        100 bytes de cada string em um set do Python
+
+        As chaves são inseridas em lote, com operações vetorizadas do NumPy.
+
+        Args:
+            capacity (int): Capacidade inicial (potência de 2)
+        """
+        self.table = np.full(capacity, EMPTY, dtype=np.int64)
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def nbytes(self):
+        return self.table.nbytes
+
+    def _slots(self, keys):
+        """Posição inicial de cada chave (bits altos da multiplicação de Fibonacci)"""
+        shift = np.uint64(64 - (len(self.table).bit_length() - 1))
+        return ((keys.astype(np.uint64) * FIBONACCI_MULTIPLIER) >> shift).astype(np.int64)
+
+    def _reserve(self, extra):
+        """Dobra a capacidade até que a ocupação fique abaixo de 50%"""
+        capacity = len(self.table)
+        while (self.count + extra) * 2 > capacity:
+            capacity *= 2
+        if capacity != len(self.table):
+            keys = self.table[self.table != EMPTY]
+            self.table = np.full(capacity, EMPTY, dtype=np.int64)
+            self.count = 0
+            self.add(keys)
+
+    def add(self, keys):
+        """
+        Insere as chaves
+
+        Args:
+            keys (ndarray): Chaves int64 não negativas
+
+        Returns:
+            ndarray: Máscara das chaves que já estavam no conjunto ou que apareceram
+                antes no próprio lote (a primeira ocorrência é inserida)
+        """
+        keys = np.asarray(keys, dtype=np.int64)
+        self._reserve(len(keys))
+        mask = len(self.table) - 1
+        duplicate = np.zeros(len(keys), dtype=bool)
+        slots = self._slots(keys)
+        pending = np.arange(len(keys))
+        placed = np.zeros(len(keys), dtype=bool)
+
+        # Cada volta examina a posição atual de todas as chaves pendentes. Chaves iguais
+        # percorrem as mesmas posições juntas, e a de menor índice ocupa a posição vazia.
+        while len(pending):
+            current = self.table[slots[pending]]
+            found = current == keys[pending]
+            duplicate[pending[found]] = True
+
+            empty = current == EMPTY
+            claimants = pending[empty]
+            _, first = np.unique(slots[claimants], return_index=True)
+            winners = claimants[first]
+            self.table[slots[winners]] = keys[winners]
+            self.count += len(winners)
+
+            occupied = pending[~found & ~empty]
+            slots[occupied] = (slots[occupied] + 1) & mask
+            # Quem perdeu a disputa fica na mesma posição e a reexamina na próxima volta
+            placed[winners] = True
+            pending = pending[~found & ~placed[pending]]
+
+        return duplicate
+
+
+def find_duplicates(shard_keys):
+    """
+    Deduplica as chaves de todas as faixas do arquivo, na ordem do arquivo: só a
+    primeira ocorrência de cada codigo e de cada CPF é mantida (um registro
+    repetido também reserva as suas chaves, como em PatientValidator.unique)
+
+    Args:
+        shard_keys (list): (codigos, cpfs) de cada faixa, na ordem das faixas, com os
+            registros na ordem em que a faixa os deduplica
+
+    Returns:
+        list: Vetor int8 de cada faixa com DUPLICATE_NONE, DUPLICATE_CODIGO ou DUPLICATE_CPF
+            por registro
+    """
+    codigos = CompactKeySet()
+    cpfs = CompactKeySet()
+    duplicates = []
+    for shard_codigos, shard_cpfs in shard_keys:
+        duplicate_codigo = codigos.add(shard_codigos)
+        duplicate_cpf = cpfs.add(shard_cpfs)
+        duplicates.append(np.where(
+            duplicate_codigo, DUPLICATE_CODIGO, np.where(duplicate_cpf, DUPLICATE_CPF, DUPLICATE_NONE)
+        ).astype(np.int8))
+    memory = (codigos.nbytes + cpfs.nbytes) / (1024 * 1024)
+    repeated = sum(int(np.count_nonzero(shard)) for shard in duplicates)
+    logging.info(
+        f"Validação: {len(cpfs)} CPFs distintos em {len(duplicates)} faixas, {repeated} registros repetidos "
+        f"(índice de deduplicação com {memory:.1f} MB)"
+    )
+    return duplicates
+
+
+class PatientValidator:
+    def __init__(self, reject_path, append=False, genders=PATIENT_GENDERS, duplicates=None):
+        """
+        Valida e deduplica os registros <Paciente> de uma fonte
+
+        Args:
+            reject_path (str): CSV dos registros rejeitados (criado no primeiro rejeitado)
+            append (bool): Mantém os rejeitados já gravados (retomada); senão o arquivo é recriado
+            genders (tuple): Valores aceitos em Genero
+            duplicates (ndarray): Resultado de find_duplicates para a faixa, um por registro
+                passado a unique(), na mesma ordem (None = deduplicação só dentro da fonte)
+        """
+        self.reject_path = reject_path
+        self.genders = frozenset(genders)
+        self.duplicates = duplicates
+        self.position = 0
+        if duplicates is None:
+            self.codigos = CompactKeySet()
+            self.cpfs = CompactKeySet()
+        self.rejected = Counter()
+        self.file = None
+        self.writer = None
+        if not append and os.path.exists(reject_path):
+            os.remove(reject_path)
+
+    def check(self, fields):
+        """
+        Valida os campos de um registro
+
+        Args:
+            fields (tuple): Campos na ordem de PATIENT_FIELDS
+
+        Returns:
+            str: Motivo da rejeição, ou None se o registro é válido
+        """
+        return invalid_reason(fields, self.genders)
+
+    def reject(self, fields, reason):
+        """Grava o registro no arquivo de rejeitados"""
+        if self.writer is None:
+            os.makedirs(os.path.dirname(self.reject_path) or '.', exist_ok=True)
+            write_header = not os.path.exists(self.reject_path) or os.path.getsize(self.reject_path) == 0
+            self.file = open(self.reject_path, 'a', encoding='utf-8', newline='')
+            self.writer = csv.writer(self.file)
+            if write_header:
+                self.writer.writerow(REJECT_COLUMNS)
+        self.writer.writerow(tuple(fields) + (reason,))
+        self.rejected[reason] += 1
+
+    def unique(self, fields_list, reject=True):
+        """
+        Marca os registros do lote cujo codigo e CPF aparecem pela primeira vez no
+        arquivo; os demais são rejeitados (um registro rejeitado também reserva as
+        suas chaves). Com duplicates, o resultado vem da deduplicação do arquivo
+        inteiro, feita antes das faixas.
+
+        Args:
+            fields_list (list): Campos de registros já validados por check()
+            reject (bool): Grava os repetidos no arquivo de rejeitados
+                (False para registros já confirmados em uma execução anterior)
+
+        Returns:
+            ndarray: Máscara dos registros mantidos
+        """
+        if not fields_list:
+            return np.zeros(0, dtype=bool)
+        if self.duplicates is not None:
+            end = self.position + len(fields_list)
+            if end > len(self.duplicates):
+                raise RuntimeError(
+                    f"{self.reject_path}: a faixa tem mais registros do que os deduplicados antes da importação"
+                )
+            duplicate = self.duplicates[self.position:end]
+            self.position = end
+            duplicate_codigo = duplicate == DUPLICATE_CODIGO
+            duplicate_cpf = duplicate == DUPLICATE_CPF
+        else:
+            codigos, cpfs = patient_keys(fields_list)
+            duplicate_codigo = self.codigos.add(codigos)
+            duplicate_cpf = self.cpfs.add(cpfs)
+
+        keep = ~(duplicate_codigo | duplicate_cpf)
+        if reject:
+            for index in np.flatnonzero(~keep).tolist():
+                reason = REJECT_DUPLICATE_CODIGO if duplicate_codigo[index] else REJECT_DUPLICATE_CPF
+                self.reject(fields_list[index], reason)
+        return keep
+
+    def close(self):
+        """Fecha o arquivo de rejeitados e registra as contagens por motivo"""
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+            self.writer = None
+        if self.rejected:
+            counts = ', '.join(f"{count} {reason}" for reason, count in self.rejected.most_common())
+            logging.info(f"Validação: {sum(self.rejected.values())} registros rejeitados ({counts}) em {self.reject_path}")
+        if self.duplicates is None:
+            memory = (self.codigos.nbytes + self.cpfs.nbytes) / (1024 * 1024)
+            logging.info(f"Validação: {len(self.cpfs)} CPFs distintos, índice de deduplicação com {memory:.1f} MB")
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Estratégias de gravação das linhas transformadas no banco MySQL
+Autor: Sistema de Importação
+Data: Setembro 2025
+"""
+
+import logging
+import os
+import tempfile
+from datetime import datetime
+
+from batch_sizing import AdaptiveBatchSizer
+from row_batches import RowBatch
+
+LOAD_MODE_BATCH = 'batch'
+LOAD_MODE_BULK = 'bulk'
+LOAD_MODES = (LOAD_MODE_BATCH, LOAD_MODE_BULK)
+
+_TSV_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'})
+
+
+def tsv_field(value):
+    """Formata um valor no formato aceito pelo LOAD DATA (ESCAPED BY '\\')"""
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    if isinstance(value, float) and value != value:
+        return '\\N'
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    return str(value).translate(_TSV_ESCAPES)
+
+
+class BatchWriter:
+    # Indica se as linhas já estão confirmadas no banco quando write() retorna
+    commits_on_write = True
+
+    def __init__(self, importer, spec, batch_size=None):
+        """
+        Grava as linhas com INSERT ... VALUES (...),(...) ON DUPLICATE KEY UPDATE
+        multi-linha, limitado em bytes e com o número de linhas ajustado pelas
+        medições de cada statement
+
+        Args:
+            importer (DatabaseImporter): Importador com a conexão aberta
+            spec (TableSpec): Tabela de destino
+            batch_size (int): Linhas do primeiro statement (None = BATCH_SIZE)
+        """
+        self.importer = importer
+        self.spec = spec
+        self.batch_size = batch_size
+        self.sizer = AdaptiveBatchSizer(batch_size)
+        self.count = 0
+        # Com commits a cada N lotes (ou por tabela), as linhas só são confirmadas no close()
+        self.commits_on_write = importer.commit_every == 1
+
+    def write(self, rows):
+        """Grava imediatamente as linhas recebidas"""
+        self.count += self.importer.execute_values(self.spec, rows, self.sizer)
+
+    def close(self):
+        """Confirma os lotes ainda pendentes e registra os tamanhos de lote escolhidos"""
+        self.importer.commit()
+        self.sizer.log_report(self.spec.table, self.importer.max_statement_bytes())
+        return self.count
+
+    def discard(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+        return False
+
+
+class BulkLoadWriter(BatchWriter):
+    commits_on_write = False
+
+    def __init__(self, importer, spec, batch_size=None):
+        """
+        Acumula as linhas em um arquivo TSV temporário e carrega tudo no close()
+        com LOAD DATA LOCAL INFILE + upsert baseado em conjunto
+        """
+        super().__init__(importer, spec, batch_size)
+        self.commits_on_write = False
+        handle, self.path = tempfile.mkstemp(prefix=f"{spec.table}_", suffix='.tsv')
+        self.file = os.fdopen(handle, 'w', encoding='utf-8', newline='\n')
+        self.pending = 0
+
+    def write(self, rows):
+        """Escreve as linhas no arquivo TSV (de um RowBatch, coluna a coluna)"""
+        if isinstance(rows, RowBatch):
+            lines = ['\t'.join(values) + '\n' for values in rows.formatted([tsv_field] * len(rows.columns))]
+        else:
+            lines = ['\t'.join([tsv_field(value) for value in row]) + '\n' for row in rows]
+        self.file.writelines(lines)
+        self.pending += len(lines)
+
+    def close(self):
+        """Carrega o arquivo na tabela de destino e remove o temporário"""
+        if self.file is None:
+            return self.count
+        try:
+            self.file.close()
+            if self.pending:
+                self.count += self.importer.bulk_load(self.spec, self.path)
+                logging.info(f"{self.spec.table}: {self.pending} linhas carregadas via LOAD DATA")
+        finally:
+            self.file = None
+            self.pending = 0
+            os.remove(self.path)
+        return self.count
+
+    def discard(self):
+        """Descarta o arquivo temporário sem carregar"""
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+            os.remove(self.path)
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Divisão do pacientes.xml em faixas de bytes alinhadas em <Paciente>
+Autor: Sistema de Importação
+Data: Setembro 2025
+"""
+
+import os
+import re
+
+BLOCK_SIZE = 1 << 20
+
+_RECORD_START = re.compile(rb'<Paciente[\s>]')
+_RECORD_END = b'</Paciente>'
+
+
+def _find_record_start(handle, offset, limit):
+    """Retorna o offset do primeiro <Paciente> a partir de offset (ou limit se não houver)"""
+    handle.seek(offset)
+    position = offset
+    carry = b''
+    while position < limit:
+        block = handle.read(min(BLOCK_SIZE, limit - position))
+        if not block:
+            break
+        data = carry + block
+        match = _RECORD_START.search(data)
+        if match:
+            return position - len(carry) + match.start()
+        # Mantém o final do bloco para encontrar tags que cruzam a fronteira
+        carry = data[-len(b'<Paciente '):]
+        position += len(block)
+    return limit
+
+
+def _find_last_record_end(handle, file_size):
+    """Retorna o offset logo após o último </Paciente> do arquivo"""
+    position = file_size
+    carry = b''
+    while position > 0:
+        start = max(0, position - BLOCK_SIZE)
+        handle.seek(start)
+        data = handle.read(position - start) + carry
+        index = data.rfind(_RECORD_END)
+        if index != -1:
+            return start + index + len(_RECORD_END)
+        carry = data[:len(_RECORD_END)]
+        position = start
+    return 0
+
+
+def find_shard_ranges(xml_file_path, shards):
+    """
+    Divide o arquivo em faixas de bytes que começam em um <Paciente>
+
+    Args:
+        xml_file_path (str): Caminho do pacientes.xml
+        shards (int): Número desejado de faixas
+
+    Returns:
+        list: Lista de tuplas (inicio, fim); faixas vazias são descartadas
+    """
+    file_size = os.path.getsize(xml_file_path)
+
+    with open(xml_file_path, 'rb') as handle:
+        end = _find_last_record_end(handle, file_size)
+        first = _find_record_start(handle, 0, end)
+
+        boundaries = [first]
+        step = max(1, (end - first) // max(1, shards))
+        for index in range(1, shards):
+            boundary = _find_record_start(handle, max(first + step * index, boundaries[-1]), end)
+            boundaries.append(boundary)
+        boundaries.append(end)
+
+    return [(start, stop) for start, stop in zip(boundaries, boundaries[1:]) if stop > start]
+
+
+class ShardReader:
+    def __init__(self, xml_file_path, start, end, root_tag='Pacientes'):
+        """
+        Lê uma faixa de bytes do XML como um documento completo,
+        envolvendo os <Paciente> da faixa com o elemento raiz
+
+        Args:
+            xml_file_path (str): Caminho do pacientes.xml
+            start (int): Offset inicial (início de um <Paciente>)
+            end (int): Offset final (exclusivo)
+            root_tag (str): Elemento raiz usado para envolver a faixa
+        """
+        self.handle = open(xml_file_path, 'rb')
+        self.handle.seek(start)
+        self.remaining = end - start
+        self.prefix = f"<{root_tag}>".encode('utf-8')
+        self.suffix = f"</{root_tag}>".encode('utf-8')
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = self.remaining + len(self.prefix) + len(self.suffix)
+
+        chunk = b''
+        if self.prefix:
+            chunk, self.prefix = self.prefix[:size], self.prefix[size:]
+            size -= len(chunk)
+
+        if size > 0 and self.remaining > 0:
+            data = self.handle.read(min(size, self.remaining))
+            self.remaining -= len(data)
+            if not data:
+                self.remaining = 0
+            chunk += data
+            size -= len(data)
+
+        if size > 0 and self.remaining == 0 and self.suffix:
+            tail, self.suffix = self.suffix[:size], self.suffix[size:]
+            chunk += tail
+
+        return chunk
+
+    def close(self):
+        self.handle.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False